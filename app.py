@@ -1,32 +1,57 @@
 # KrishiNirnay AI - Main application
 # Enterprise-grade agricultural intelligence platform
 
+import json
 import os
 from pathlib import Path
 
-from flask import Flask, request, jsonify, send_from_directory, render_template
+from flask import Flask, Response, request, jsonify, stream_with_context
 
 from config import (
     SUPPORTED_LANGUAGES,
     LANGUAGE_CODES,
-    DEFAULT_LANGUAGE,
-    LOCALES_DIR,
+    TRANSLATION_MODULES,
+    LOCALE_WARMUP,
+    LOCALE_RELOAD_INTERVAL,
+    MANDI_SYNC_INTERVAL,
+    WEATHER_PREFETCH_CELLS,
+    WEATHER_PREFETCH_INTERVAL,
 )
 from translations import (
+    build_translation_index,
+    start_locale_watcher,
+    translation_stats,
     get_translation,
     get_chatbot_template,
     translate_pest,
     translate_treatment,
     translate_crop,
 )
+from instrumentation import init_instrumentation, instrumentation_stats, render_prometheus
 from language_middleware import get_request_language
-from services.weather import fetch_weather
+from locale_bundles import build_locale_bundles, locale_response, locale_versions
+from page_cache import build_page_cache, page_cache_stats, page_response
+from response_cache import cached_json, response_cache_stats
+from services.weather import coordinate, fetch_weather, weather_cache_stats
+from services.weather_prefetch import prefetch_stats, start_prefetch_scheduler
 from services.mandi import fetch_mandi
-from services.schemes import get_schemes
-from services.soil import get_soil_advisory
+from services.mandi_store import start_background_sync, store_status
+from services.mandi_trends import get_trends
+from services.schemes import SCHEMES_VERSION, get_schemes
+from services.soil import SOIL_ADVISORY_VERSION, get_soil_advisory
+from services.soil_data import data_version, fertilizer_table, soil_data_stats
 from services.satellite import get_satellite_info
+from services.cache_backends import cache_backend_stats
+from services.events import events_stats
+from services.sync import DEFAULT_MODULES, build_bundle, compress, encode_bundle, negotiate_format, parse_follows, sync_stats
+from services.ndvi_raster import MAX_WINDOW, get_raster, ndvi_at, ndvi_pixel, ndvi_png, ndvi_stats
 from services.advisory import get_advisory
+from services.agro_indices import MAX_INDEX_POINTS, get_agro_indices
 from services.chatbot_engine import get_chatbot_reply
+from services.chatbot_batch import MAX_BATCH_ITEMS, parse_items, iter_batch_replies
+from services.dashboard import get_dashboard, localize_weather, localize_mandi, localize_satellite
+from services.upstream import upstream_stats
+from services.regions import MAX_BATCH_POINTS, fill_region, region_stats, resolve_region, resolve_regions
 
 app = Flask(
     __name__,
@@ -34,6 +59,25 @@ app = Flask(
     template_folder='templates',
 )
 app.config.from_object('config')
+# Stage timings per request (Server-Timing header, /metrics) and sampled cProfile capture
+init_instrumentation(app)
+
+# Flatten all locale JSON into the translation lookup index before serving, so the
+# first request in a rare language doesn't pay disk I/O; then watch for translator edits
+if LOCALE_WARMUP:
+    build_translation_index()
+    build_locale_bundles()
+if LOCALE_RELOAD_INTERVAL > 0:
+    start_locale_watcher(LOCALE_RELOAD_INTERVAL)
+
+# Keep the local mandi store current (only when a data.gov.in key is configured); every worker
+# starts the loop but a lease in the store lets only one of them sync at a time
+if MANDI_SYNC_INTERVAL > 0 and os.environ.get('DATA_GOV_IN_API_KEY', '').strip():
+    start_background_sync(MANDI_SYNC_INTERVAL)
+
+# Keep registered and frequently requested grid cells warm in the forecast cache
+if WEATHER_PREFETCH_INTERVAL > 0:
+    start_prefetch_scheduler(WEATHER_PREFETCH_INTERVAL, WEATHER_PREFETCH_CELLS)
 
 # Store translation helpers on app for use in templates
 @app.context_processor
@@ -42,23 +86,28 @@ def inject_i18n():
     return {
         'supported_languages': SUPPORTED_LANGUAGES,
         'current_language': lang,
+        'locale_versions': locale_versions(),
         't': lambda key, module='common', **kwargs: get_translation(lang, module, key, **kwargs),
     }
 
 
+# HTML pages only vary by language: served pre-rendered per language (compressed, ETag + 304)
+PAGES = {'/': 'index.html', '/dashboard': 'dashboard.html', '/chatbot': 'chatbot.html'}
+
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return page_response('index.html')
 
 
 @app.route('/dashboard')
 def dashboard():
-    return render_template('dashboard.html')
+    return page_response('dashboard.html')
 
 
 @app.route('/chatbot')
 def chatbot_page():
-    return render_template('chatbot.html')
+    return page_response('chatbot.html')
 
 
 # API: Update user language preference (persist to DB in production)
@@ -76,21 +125,36 @@ def update_language():
 @app.route('/api/chatbot/message', methods=['POST'])
 def chatbot_message():
     data = request.get_json() or {}
-    user_lang = request.headers.get('Accept-Language', 'hi')[:2]
-    if user_lang not in LANGUAGE_CODES:
-        user_lang = DEFAULT_LANGUAGE
+    user_lang = get_request_language()
     message = (data.get('message') or '').strip()
     reply = get_chatbot_reply(message, user_lang)
     return jsonify({'reply': reply, 'language': user_lang})
 
 
+# API: Chatbot batch for SMS/IVR gateways. Body: {"items": [{message, lang, lat, lon}, ...]}
+# Streams NDJSON, one {"index", "intent", "reply", "language"} line per item as soon as it is ready.
+@app.route('/api/chatbot/batch', methods=['POST'])
+def chatbot_batch():
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a list of items'}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({'error': f'At most {MAX_BATCH_ITEMS} items per batch'}), 400
+    parsed = parse_items(items, default_lang=get_request_language())
+
+    def generate():
+        for result in iter_batch_replies(parsed):
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 # API: Chatbot analyze image (example with translated response)
 @app.route('/api/chatbot/analyze-image', methods=['POST'])
 def chatbot_analyze_image():
     data = request.get_json() or {}
-    user_lang = request.headers.get('Accept-Language', 'hi')[:2]
-    if user_lang not in LANGUAGE_CODES:
-        user_lang = DEFAULT_LANGUAGE
+    user_lang = get_request_language()
 
     # Placeholder: real implementation would call pest detection model
     pest_name_en = data.get('pest_name_en') or 'Pink Bollworm'
@@ -111,86 +175,322 @@ def chatbot_analyze_image():
 @app.route('/api/weather')
 def api_weather():
     lang = get_request_language()
-    if lang not in LANGUAGE_CODES:
-        lang = DEFAULT_LANGUAGE
-    lat = request.args.get('lat', type=float)
-    lon = request.args.get('lon', type=float)
+    lat = request.args.get('lat', type=coordinate)
+    lon = request.args.get('lon', type=coordinate)
     data = fetch_weather(lat=lat, lon=lon)
-    if data.get('current'):
-        # Translate condition key for frontend (sunny/cloudy/rainy/stormy)
-        cond = data['current'].get('condition', '')
-        data['current']['condition_label'] = get_translation(lang, 'common', f'weather.conditions.{cond}')
-    return jsonify(data)
+    # Translate condition key for frontend (sunny/cloudy/rainy/stormy)
+    return jsonify(localize_weather(data, lang))
+
+
+# Agro-weather indices (GDD, spray window, heat stress, irrigation need) for one point via
+# ?lat=&lon=&crop=, or for many via POST {"points": [{"lat":..,"lon":..}, ...], "crop": ..}
+@app.route('/api/weather/indices', methods=['GET', 'POST'])
+def api_weather_indices():
+    if request.method == 'GET':
+        points = [(request.args.get('lat', type=coordinate), request.args.get('lon', type=coordinate))]
+        crop = request.args.get('crop')
+    else:
+        data = request.get_json(silent=True) or {}
+        raw = data.get('points') if isinstance(data, dict) else None
+        if not isinstance(raw, list) or not raw:
+            return jsonify({'error': 'Expected a non-empty list of points'}), 400
+        if len(raw) > MAX_INDEX_POINTS:
+            return jsonify({'error': f'At most {MAX_INDEX_POINTS} points per request'}), 400
+        try:
+            points = [(coordinate(p['lat']), coordinate(p['lon'])) for p in raw]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each point needs numeric lat and lon'}), 400
+        crop = data.get('crop')
+    results = get_agro_indices(points, crop=crop)
+    if request.method == 'GET':
+        return jsonify(results[0])
+    return jsonify({'results': results})
 
 
 @app.route('/api/mandi')
 def api_mandi():
     lang = get_request_language()
-    if lang not in LANGUAGE_CODES:
-        lang = DEFAULT_LANGUAGE
     limit = request.args.get('limit', default=15, type=int)
     limit = min(max(limit, 1), 50)
-    out = fetch_mandi(limit=limit)
-    prices = out.get('prices', [])
-    for p in prices:
-        p['commodity_local'] = translate_crop(p.get('commodity', ''), lang)
-    out['prices'] = prices
-    return jsonify(out)
+    out = fetch_mandi(
+        limit=limit,
+        commodity=request.args.get('commodity', '').strip() or None,
+        state=request.args.get('state', '').strip() or None,
+        market=request.args.get('market', '').strip() or None,
+        date_from=request.args.get('from', '').strip() or None,
+        date_to=request.args.get('to', '').strip() or None,
+    )
+    return jsonify(localize_mandi(out, lang))
+
+
+# Price trends per commodity/market: rolling mean, week-over-week change, spread, arbitrage
+@app.route('/api/mandi/trends')
+def api_mandi_trends():
+    lang = get_request_language()
+    days = min(max(request.args.get('days', default=30, type=int), 14), 365)
+    window = min(max(request.args.get('window', default=7, type=int), 1), days)
+    limit = min(max(request.args.get('limit', default=20, type=int), 1), 200)
+    out = get_trends(
+        commodity=request.args.get('commodity', '').strip() or None,
+        state=request.args.get('state', '').strip() or None,
+        days=days, window=window, limit=limit,
+    )
+    # Cached result is shared; build localized copies
+    series = [
+        dict(s, commodity_local=translate_crop(s['commodity'], lang),
+             trend_label=get_translation(lang, 'common', f"market.{s['trend']}"))
+        for s in out['series']
+    ]
+    arbitrage = [dict(a, commodity_local=translate_crop(a['commodity'], lang)) for a in out['arbitrage']]
+    return jsonify(dict(out, series=series, arbitrage=arbitrage))
+
+
+# Response cache keys: everything that determines the body of the cached read-only endpoints below
+def _region_args():
+    return fill_region(request.args.get('state'), request.args.get('district'),
+                       request.args.get('lat', type=coordinate), request.args.get('lon', type=coordinate))
+
+
+def _schemes_key():
+    return [get_request_language(), SCHEMES_VERSION]
+
+
+def _soil_key():
+    state, district = _region_args()
+    return [get_request_language(), request.args.get('state', ''), state, district, request.args.get('block'),
+            request.args.get('crop'), SOIL_ADVISORY_VERSION, data_version(state)]
+
+
+def _satellite_key():
+    state, district = _region_args()
+    return [get_request_language(), state, district,
+            ndvi_pixel(request.args.get('lat', type=coordinate), request.args.get('lon', type=coordinate))]
 
 
 @app.route('/api/schemes')
+@cached_json('schemes', _schemes_key)
 def api_schemes():
     lang = get_request_language()
-    if lang not in LANGUAGE_CODES:
-        lang = DEFAULT_LANGUAGE
     schemes = get_schemes(lang=lang if lang != 'en' else 'en')
     return jsonify({'schemes': schemes})
 
 
 @app.route('/api/soil')
+@cached_json('soil', _soil_key)
 def api_soil():
     lang = get_request_language()
-    if lang not in LANGUAGE_CODES:
-        lang = DEFAULT_LANGUAGE
     state = request.args.get('state', '')
     district = request.args.get('district', '')
-    return jsonify(get_soil_advisory(state=state, district=district, lang=lang))
+    lat = request.args.get('lat', type=coordinate)
+    lon = request.args.get('lon', type=coordinate)
+    return jsonify(get_soil_advisory(state=state, district=district, lang=lang, lat=lat, lon=lon,
+                                     block=request.args.get('block'), crop=request.args.get('crop')))
+
+
+# Fertilizer plan (urea/DAP/MOP kg/ha and amendments) for every block of a state or district
+@app.route('/api/soil/fertilizer')
+def api_soil_fertilizer():
+    state, district = fill_region(request.args.get('state'), request.args.get('district'),
+                                  request.args.get('lat', type=coordinate), request.args.get('lon', type=coordinate))
+    if not state:
+        return jsonify({'error': 'state (or lat and lon) is required'}), 400
+    crop = request.args.get('crop')
+    rows = fertilizer_table(state, crop=crop, district=district)
+    if rows is None:
+        return jsonify({'error': f'No soil data for {state}'}), 404
+    return jsonify({'state': state, 'district': district, 'crop': (crop or 'default').strip().lower(),
+                    'rows': rows})
 
 
 @app.route('/api/satellite')
+@cached_json('satellite', _satellite_key)
 def api_satellite():
     lang = get_request_language()
-    if lang not in LANGUAGE_CODES:
-        lang = DEFAULT_LANGUAGE
-    lat = request.args.get('lat', type=float)
-    lon = request.args.get('lon', type=float)
+    lat = request.args.get('lat', type=coordinate)
+    lon = request.args.get('lon', type=coordinate)
     state = request.args.get('state', '')
     info = get_satellite_info(lat=lat, lon=lon, state=state)
-    key = 'description_hi' if lang == 'hi' else 'description_en'
-    info['description'] = info.get(key, info['description_en'])
-    return jsonify(info)
+    return jsonify(localize_satellite(info, lang))
+
+
+# NDVI at a point (GET ?lat=&lon=) or mean/min/max over a field polygon (POST {"polygon": GeoJSON
+# Polygon geometry or a [[lon, lat], ...] ring})
+@app.route('/api/satellite/ndvi', methods=['GET', 'POST'])
+def api_satellite_ndvi():
+    raster = get_raster()
+    if raster is None:
+        return jsonify({'error': 'No NDVI raster configured'}), 404
+    if request.method == 'GET':
+        lat = request.args.get('lat', type=coordinate)
+        lon = request.args.get('lon', type=coordinate)
+        if lat is None or lon is None:
+            return jsonify({'error': 'lat and lon are required'}), 400
+        return jsonify({'ndvi': ndvi_at(lat, lon)})
+    data = request.get_json(silent=True) or {}
+    polygon = data.get('polygon') if isinstance(data, dict) else None
+    if isinstance(polygon, dict):
+        polygon = polygon.get('coordinates')
+    elif isinstance(polygon, list) and polygon and isinstance(polygon[0], (list, tuple)) \
+            and polygon[0] and not isinstance(polygon[0][0], (list, tuple)):
+        polygon = [polygon]
+    try:
+        rings = [[(coordinate(x), coordinate(y)) for x, y, *_ in ring] for ring in polygon]
+        if not rings or any(len(ring) < 3 for ring in rings):
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Expected a polygon as a GeoJSON Polygon or a list of [lon, lat]'}), 400
+    try:
+        stats = raster.zonal_stats(rings)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'zonal': stats, 'date': raster.date})
+
+
+# Small NDVI image (PNG) centred on a point, ?lat=&lon=&size= pixels per side
+@app.route('/api/satellite/ndvi.png')
+def api_satellite_ndvi_png():
+    raster = get_raster()
+    lat = request.args.get('lat', type=coordinate)
+    lon = request.args.get('lon', type=coordinate)
+    if raster is None or lat is None or lon is None or raster.pixel(lat, lon) is None:
+        return jsonify({'error': 'No NDVI data for this location'}), 404
+    size = min(max(request.args.get('size', default=64, type=int), 1), MAX_WINDOW)
+    row, col = raster.pixel(lat, lon)
+    data = raster.window(row - size // 2, col - size // 2, size, size)
+    resp = Response(ndvi_png(data), mimetype='image/png')
+    resp.headers['Cache-Control'] = 'public, max-age=3600'
+    return resp
 
 
 @app.route('/api/advisory')
 def api_advisory():
     lang = get_request_language()
-    if lang not in LANGUAGE_CODES:
-        lang = DEFAULT_LANGUAGE
-    lat = request.args.get('lat', type=float)
-    lon = request.args.get('lon', type=float)
+    lat = request.args.get('lat', type=coordinate)
+    lon = request.args.get('lon', type=coordinate)
     state = request.args.get('state', '')
-    return jsonify(get_advisory(lang=lang, lat=lat, lon=lon, state=state))
+    crop = request.args.get('crop')
+    return jsonify(get_advisory(lang=lang, lat=lat, lon=lon, state=state, crop=crop))
+
+
+# All dashboard cards in one round trip; sections that miss their deadline carry {"error": ...}
+@app.route('/api/dashboard')
+def api_dashboard():
+    lang = get_request_language()
+    lat = request.args.get('lat', type=coordinate)
+    lon = request.args.get('lon', type=coordinate)
+    state = request.args.get('state', '')
+    limit = request.args.get('limit', default=10, type=int)
+    limit = min(max(limit, 1), 50)
+    return jsonify(get_dashboard(lang=lang, lat=lat, lon=lon, state=state, mandi_limit=limit))
+
+
+# State/district for a point via ?lat=&lon=, or for many via POST {"points": [{"lat":..,"lon":..}, ...]}
+# Points outside every region (sea, neighbouring countries) resolve to null
+@app.route('/api/region', methods=['GET', 'POST'])
+def api_region():
+    if request.method == 'GET':
+        lat = request.args.get('lat', type=coordinate)
+        lon = request.args.get('lon', type=coordinate)
+        if lat is None or lon is None:
+            return jsonify({'error': 'lat and lon are required'}), 400
+        return jsonify({'region': resolve_region(lat, lon)})
+    data = request.get_json(silent=True) or {}
+    raw = data.get('points') if isinstance(data, dict) else None
+    if not isinstance(raw, list) or not raw:
+        return jsonify({'error': 'Expected a non-empty list of points'}), 400
+    if len(raw) > MAX_BATCH_POINTS:
+        return jsonify({'error': f'At most {MAX_BATCH_POINTS} points per request'}), 400
+    try:
+        points = [(coordinate(p['lat']), coordinate(p['lon'])) for p in raw]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Each point needs numeric lat and lon'}), 400
+    return jsonify({'regions': resolve_regions(points)})
+
+
+# API: Offline-first sync bundle for low-bandwidth clients. Body: {"lat", "lon", "follows": [{commodity,
+# state?, market?}], "modules": [...], "versions": <"versions" of the previous bundle>}. Only sections that
+# changed since those versions are sent; MessagePack/CBOR when the client accepts them, compressed.
+@app.route('/api/sync', methods=['POST'])
+def api_sync():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    try:
+        follows = parse_follows(data.get('follows') or [])
+        lat = coordinate(data['lat']) if data.get('lat') is not None else None
+        lon = coordinate(data['lon']) if data.get('lon') is not None else None
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    modules = data.get('modules')
+    if modules is None:
+        modules = DEFAULT_MODULES
+    elif not isinstance(modules, list) or not all(isinstance(m, str) for m in modules):
+        return jsonify({'error': 'modules must be a list of module names'}), 400
+    bundle = build_bundle(get_request_language(), lat=lat, lon=lon, follows=follows, modules=modules,
+                          versions=data.get('versions'))
+    fmt = negotiate_format(request.accept_mimetypes, request.args.get('format'))
+    body, mimetype = encode_bundle(bundle, fmt)
+    accept = request.accept_encodings
+    body, encoding = compress(body, accept_br=bool(accept['br']), accept_gzip=bool(accept['gzip']))
+    headers = {'Cache-Control': 'no-store', 'Vary': 'Accept, Accept-Encoding, Accept-Language'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, mimetype=mimetype, headers=headers)
+
+
+# Cache counters (hit/miss/stale), mandi store freshness, locale memory/load times, upstream health,
+# the region index, loaded soil tables, the NDVI tile cache, the response cache, pre-rendered pages,
+# per-stage request timings and sync bundles
+@app.route('/api/stats')
+def api_stats():
+    return jsonify({
+        'weather_cache': weather_cache_stats(),
+        'weather_prefetch': prefetch_stats(),
+        'mandi_store': store_status(),
+        'translations': translation_stats(),
+        'upstreams': upstream_stats(),
+        'regions': region_stats(),
+        'soil_data': soil_data_stats(),
+        'ndvi': ndvi_stats(),
+        'response_cache': response_cache_stats(),
+        'pages': page_cache_stats(),
+        'instrumentation': instrumentation_stats(),
+        'sync': sync_stats(),
+        'events': events_stats(),
+        'shared_cache': cache_backend_stats(),
+    })
+
 
+# Prometheus scrape endpoint: request/stage/upstream latency histograms, upstream events, cache counters
+@app.route('/metrics')
+def metrics_endpoint():
+    caches = {
+        'weather': weather_cache_stats(),
+        'response': response_cache_stats(),
+        'pages': page_cache_stats(),
+    }
+    return Response(render_prometheus(caches), mimetype='text/plain; version=0.0.4')
 
-# Serve locale JSON files for frontend i18n
+
+# Serve locale JSON files for frontend i18n (pre-compressed in memory, ETag + 304)
 @app.route('/locales/<lang>/<module>.json')
 def serve_locale(lang, module):
-    if lang not in LANGUAGE_CODES or module not in ['common', 'dashboard', 'chatbot', 'advisory', 'schemes', 'errors', 'validation']:
+    if lang not in LANGUAGE_CODES or module not in TRANSLATION_MODULES:
         return jsonify({}), 404
-    path = LOCALES_DIR / lang / f'{module}.json'
-    if not path.is_file():
+    return locale_response(lang, module)
+
+
+# All modules of one language in a single response; immutable when requested as ?v=<version>
+@app.route('/locales/<lang>.json')
+def serve_locale_bundle(lang):
+    if lang not in LANGUAGE_CODES:
         return jsonify({}), 404
-    return send_from_directory(path.parent, f'{module}.json', mimetype='application/json')
+    return locale_response(lang)
+
+
+# Render every page in every language at boot (with warmup); otherwise each renders on first hit
+if LOCALE_WARMUP:
+    build_page_cache(app, PAGES)
 
 
 if __name__ == '__main__':
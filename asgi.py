@@ -0,0 +1,198 @@
+# KrishiNirnay AI - ASGI entry point (async serving mode)
+# Run: uvicorn asgi:app --workers 2
+# Upstream-bound routes (weather, mandi, advisory) are served natively async so an in-flight
+# Open-Meteo call no longer pins a worker thread; every other route is delegated to the Flask app.
+# The native routes record request metrics (/metrics) and Server-Timing like the Flask ones.
+# The synchronous WSGI entry point (app:app) keeps working unchanged.
+
+import asyncio
+import json
+import time
+import urllib.parse
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app as flask_app
+from config import METRICS_ENABLED
+from instrumentation import server_timing
+from language_middleware import resolve_language
+from services import metrics
+from services.advisory import get_advisory
+from services.dashboard import localize_weather, localize_mandi
+from services.events import CLOSE, SSE_RETRY_MS, broker, encode_event, parse_subscription
+from services.http_async import aclose
+from services.mandi import fetch_mandi_async
+from services.weather import coordinate, fetch_weather_async
+
+_wsgi_app = WsgiToAsgi(flask_app)
+
+
+class _Request:
+    __slots__ = ('args', 'headers')
+
+    def __init__(self, scope):
+        self.args = {k: v[0] for k, v in urllib.parse.parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+
+    @property
+    def language(self):
+        return resolve_language(self.args.get('lang', ''), self.headers.get('accept-language', ''))
+
+    def coordinate_arg(self, name):
+        try:
+            return coordinate(self.args[name])
+        except (KeyError, ValueError):
+            return None
+
+    def int_arg(self, name, default):
+        try:
+            return int(self.args[name])
+        except (KeyError, ValueError):
+            return default
+
+    def str_arg(self, name):
+        return (self.args.get(name) or '').strip() or None
+
+
+async def api_weather(req):
+    data = await fetch_weather_async(lat=req.coordinate_arg('lat'), lon=req.coordinate_arg('lon'))
+    return localize_weather(data, req.language)
+
+
+async def api_mandi(req):
+    limit = min(max(req.int_arg('limit', 15), 1), 50)
+    out = await fetch_mandi_async(
+        limit=limit,
+        commodity=req.str_arg('commodity'),
+        state=req.str_arg('state'),
+        market=req.str_arg('market'),
+        date_from=req.str_arg('from'),
+        date_to=req.str_arg('to'),
+    )
+    return localize_mandi(out, req.language)
+
+
+async def api_advisory(req):
+    lat, lon = req.coordinate_arg('lat'), req.coordinate_arg('lon')
+    weather = await fetch_weather_async(lat=lat, lon=lon)
+    return await asyncio.to_thread(get_advisory, lang=req.language, lat=lat, lon=lon,
+                                   state=req.args.get('state', ''), weather=weather, crop=req.args.get('crop'))
+
+
+ASYNC_ROUTES = {
+    '/api/weather': api_weather,
+    '/api/mandi': api_mandi,
+    '/api/advisory': api_advisory,
+}
+
+
+def _begin():
+    """Start a native route's request metrics (None with METRICS_ENABLED=0)."""
+    return (metrics.begin_request(), time.perf_counter()) if METRICS_ENABLED else None
+
+
+def _end(started, path, status):
+    """Record the request begun with _begin; returns Server-Timing headers to send (none when off)."""
+    if started is None:
+        return []
+    token, t0 = started
+    elapsed = time.perf_counter() - t0
+    stages = metrics.end_request(token, path, status, elapsed)
+    return [(b'server-timing', server_timing(stages, elapsed).encode('latin-1'))]
+
+
+async def _send_json_error(send, status, message, headers=()):
+    body = json.dumps({'error': message}).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                            *headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _wait_disconnect(receive, sub):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            sub.put(CLOSE)
+            return
+
+
+async def sse_events(scope, receive, send):
+    """GET /api/events?commodities=Wheat,Onion&markets=..&states=..&lat=..&lon=.. as a text/event-stream.
+
+    One coroutine per connection (no thread), fed by services.events.broker. The request's metrics
+    cover opening the stream, not the connection's lifetime.
+    """
+    started = _begin()
+    req = _Request(scope)
+    try:
+        commodities, markets, states, cell = parse_subscription(req.args)
+    except ValueError as e:
+        await _send_json_error(send, 400, str(e), _end(started, '/api/events', 400))
+        return
+    sub = broker.subscribe(req.language, commodities, markets, states, cell)
+    if sub is None:
+        await _send_json_error(send, 503, 'Too many event stream clients', _end(started, '/api/events', 503))
+        return
+    timing = _end(started, '/api/events', 200)
+    watcher = asyncio.ensure_future(_wait_disconnect(receive, sub))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'),
+                        (b'x-accel-buffering', b'no'), *timing],
+        })
+        hello = {'commodities': commodities, 'markets': markets, 'states': states,
+                 'cell': list(cell) if cell else None, 'language': req.language}
+        await send({'type': 'http.response.body', 'more_body': True,
+                    'body': f'retry: {SSE_RETRY_MS}\n\n'.encode() + encode_event('subscribed', hello)})
+        while True:
+            frame = await sub.queue.get()
+            if frame is CLOSE:
+                break
+            await send({'type': 'http.response.body', 'body': frame, 'more_body': True})
+    except OSError:
+        pass  # client went away mid-write
+    finally:
+        broker.unsubscribe(sub)
+        watcher.cancel()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] == 'http' and scope.get('path') == '/api/events' and scope.get('method') == 'GET':
+        await sse_events(scope, receive, send)
+        return
+    handler = ASYNC_ROUTES.get(scope.get('path')) if scope['type'] == 'http' else None
+    if handler is None or scope.get('method') not in ('GET', 'HEAD'):
+        await _wsgi_app(scope, receive, send)
+        return
+    started = _begin()
+    try:
+        payload = await handler(_Request(scope))
+        # Same serializer settings as Flask's jsonify (and its 'json' stage)
+        body = (flask_app.json.dumps(payload) + '\n').encode('utf-8')
+    except Exception:
+        _end(started, scope['path'], 500)
+        raise
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                    *_end(started, scope['path'], 200)],
+    })
+    await send({'type': 'http.response.body', 'body': body if scope['method'] == 'GET' else b''})
@@ -0,0 +1 @@
+# KrishiNirnay AI - Benchmarks, load tests and local upstream stand-ins
@@ -0,0 +1,81 @@
+# Benchmark: bulk advisory pipeline (services.bulk_advisory) vs calling get_advisory per farmer
+# Farmers are scattered around district headquarters (data/regions/district_hq.csv) with a language
+# and crop mix; about a third leave state blank. Open-Meteo is the local stand-in. Reports
+# farmers/sec, forecasts fetched and peak RSS of the parent.
+# Usage: python -m benchmarks.bench_bulk_advisory [--farmers N] [--baseline N] [--workers N]
+
+import argparse
+import csv
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+from benchmarks.load_suite import _districts
+from tests.standins import start_open_meteo
+
+LANGS = ['hi', 'hi', 'hi', 'mr', 'bn', 'te', 'ta', 'gu', 'kn', 'pa', 'or', 'ml', 'en']
+CROPS = ['wheat', 'paddy', 'cotton', 'soybean', 'maize', 'chickpea', '']
+
+
+def _write_farmers(path, n, seed=11):
+    rng = random.Random(seed)
+    districts = _districts()
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('id', 'lat', 'lon', 'state', 'lang', 'crop'))
+        for i in range(n):
+            state, _, lat, lon = rng.choice(districts)
+            lat, lon = round(lat + rng.uniform(-0.15, 0.15), 5), round(lon + rng.uniform(-0.15, 0.15), 5)
+            writer.writerow((f'F{i:07d}', lat, lon, state if rng.random() > 0.33 else '',
+                             rng.choice(LANGS), rng.choice(CROPS)))
+
+
+def _baseline(path, n):
+    """get_advisory once per farmer (what the campaign script did), forecasts already cached."""
+    from services.advisory import get_advisory
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = [r for _, r in zip(range(n), csv.DictReader(f))]
+    for r in rows:  # warm the forecast cache so only per-farmer work is timed
+        get_advisory(lang=r['lang'], lat=float(r['lat']), lon=float(r['lon']), state=r['state'], crop=r['crop'] or None)
+    start = time.perf_counter()
+    for r in rows:
+        get_advisory(lang=r['lang'], lat=float(r['lat']), lon=float(r['lon']), state=r['state'], crop=r['crop'] or None)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--farmers', type=int, default=300000)
+    parser.add_argument('--baseline', type=int, default=3000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    meteo, base = start_open_meteo()
+    os.environ['OPEN_METEO_BASE'] = base   # inherited by the pool workers
+    from services import bulk_advisory, weather
+    weather.OPEN_METEO_BASE = base
+
+    directory = tempfile.mkdtemp(prefix='bench-bulk-')
+    try:
+        farmers = os.path.join(directory, 'farmers.csv')
+        _write_farmers(farmers, args.farmers)
+        print(f"baseline (get_advisory per farmer): {_baseline(farmers, args.baseline):8,.0f} farmers/s")
+        weather._forecast_cache.clear()
+        before = meteo.locations
+        # The stand-in has no rate limit to respect
+        stats = bulk_advisory.run(farmers, os.path.join(directory, 'advisories.csv'), workers=args.workers,
+                                  rate_per_minute=1e9)
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"pipeline ({args.workers} workers)             : {stats['farmers_per_sec']:8,.0f} farmers/s "
+              f"({stats['farmers']:,} farmers in {stats['seconds']:.1f} s)")
+        print(f"  cells {stats['cells']:,}, Open-Meteo locations fetched {meteo.locations - before:,}, "
+              f"messages rendered {stats['messages']:,}, skipped {stats['skipped']}, parent peak RSS {rss_mb:.0f} MB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# Benchmark: shared cache backends (services.cache_backends)
+# 1. Per backend (memory, shm, resp against the in-process stand-in server): get / set of a
+#    forecast-sized value, and 200 keys fetched one by one vs one get_many (MGET / pipelining).
+# 2. Worker warm-up: fresh processes, one after the other, each with the same CACHE_BACKEND, boot the
+#    translation index and fetch forecasts for the same cells and the same mandi queries. With a
+#    shared backend only the first worker goes to Open-Meteo, compiles locales or queries SQLite.
+# Usage: python -m benchmarks.bench_cache_backends [--cells N] [--workers N]
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from services.cache_backends import MemoryBackend, RespBackend, SharedDirBackend
+from tests.standins import start_open_meteo, start_resp_server
+
+
+def _per_op_us(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def _micro(backends, ops):
+    from services.weather import _normalize_forecast
+    from tests.standins import _forecast_payload
+    value = pickle.dumps(_normalize_forecast(_forecast_payload(28.6, 77.2, seed=1), 28.6, 77.2), protocol=5)
+    keys = [f"bench:{i}" for i in range(200)]
+    print(f"value: {len(value):,} B pickled forecast")
+    print(f"{'backend':8} {'set us':>9} {'get us':>9} {'200 gets ms':>12} {'get_many ms':>12}")
+    for name, backend in backends:
+        backend.set_many([(k, value) for k in keys], 60)
+        set_us = _per_op_us(lambda: backend.set("bench:x", value, 60), ops)
+        get_us = _per_op_us(lambda: backend.get("bench:x"), ops)
+        loop_ms = _per_op_us(lambda: [backend.get(k) for k in keys], 20) / 1000
+        bulk_ms = _per_op_us(lambda: backend.get_many(keys), 20) / 1000
+        assert all(v == value for v in backend.get_many(keys))
+        print(f"{name:8} {set_us:9.1f} {get_us:9.1f} {loop_ms:12.2f} {bulk_ms:12.2f}")
+        backend.clear()
+
+
+def _child(cells):
+    """One worker's warm-up; prints what it had to compute itself."""
+    started = time.perf_counter()
+    from translations import build_translation_index, translation_stats
+    from services.cache_backends import cache_backend_stats
+    from services.mandi import fetch_mandi
+    from services.weather import fetch_weather, weather_cache_stats
+    imported = time.perf_counter()
+    build_translation_index()
+    compiled = sum(st["source"] == "compiled" for st in translation_stats().values())
+    for i in range(cells):
+        fetch_weather(20.0 + i * 0.1, 78.0)
+    for commodity in (None, "Wheat", "Onion"):
+        fetch_mandi(limit=50, commodity=commodity)
+    stats = cache_backend_stats()["namespaces"]
+    print(json.dumps({
+        "warmup_ms": round((time.perf_counter() - imported) * 1000, 1),
+        "import_ms": round((imported - started) * 1000, 1),
+        "compiled_langs": compiled,
+        "forecast_shared_hits": weather_cache_stats()["shared_hits"],
+        "mandi_hits": stats["mandi"]["hits"],
+    }))
+
+
+def _warmup(kind, url, directory, base, cells, workers):
+    env = dict(os.environ, CACHE_BACKEND=kind, CACHE_URL=url, CACHE_DIR=directory, CACHE_PREFIX="bench:",
+               OPEN_METEO_BASE=base, LOCALE_RELOAD_INTERVAL="0", MANDI_SYNC_INTERVAL="0")
+    out = []
+    for _ in range(workers):
+        result = subprocess.run([sys.executable, "-m", "benchmarks.bench_cache_backends", "--child", str(cells)],
+                                env=env, capture_output=True, text=True, check=True).stdout
+        out.append(json.loads(result.strip().splitlines()[-1]))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--cells", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child)
+        return
+
+    resp_server, url = start_resp_server()
+    directory = tempfile.mkdtemp(prefix="bench-cache-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    try:
+        _micro([("memory", MemoryBackend(256 * 1024 * 1024)), ("shm", SharedDirBackend(directory, 256 * 1024 * 1024)),
+                ("resp", RespBackend(url, prefix="bench:"))], args.ops)
+        print()
+        meteo, base = start_open_meteo()
+        for kind in ("memory", "shm", "resp"):
+            before = meteo.locations
+            results = _warmup(kind, url, directory, base, args.cells, args.workers)
+            print(f"{kind}: Open-Meteo locations fetched {meteo.locations - before} for {args.workers} workers")
+            for i, r in enumerate(results):
+                print(f"  worker {i}: warm-up {r['warmup_ms']:7.1f} ms, languages compiled {r['compiled_langs']:2}, "
+                      f"forecasts from shared tier {r['forecast_shared_hits']:3}, mandi hits {r['mandi_hits']}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        resp_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Benchmark: SSE fan-out of services.events.broker
+# N subscribers on one event loop (spread over languages and commodities); a background thread
+# publishes price moves the way the mandi poller does. Reports subscribe memory per client and the
+# publish -> last-client-has-it latency for the matching subset.
+# Usage: python -m benchmarks.bench_events [--clients N] [--events N]
+
+import argparse
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from config import LANGUAGE_CODES
+
+COMMODITIES = ['Wheat', 'Rice', 'Onion', 'Potato', 'Tomato', 'Cotton', 'Maize', 'Soyabean']
+
+
+async def _run(clients, events):
+    from services.events import broker
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subs = [broker.subscribe(LANGUAGE_CODES[i % len(LANGUAGE_CODES)], [COMMODITIES[i % len(COMMODITIES)]])
+            for i in range(clients)]
+    per_client = (tracemalloc.get_traced_memory()[0] - before) / clients
+    tracemalloc.stop()
+    print(f"clients           : {clients:,} ({per_client:,.0f} B each, queues empty)")
+
+    latencies = []
+    for n in range(events):
+        commodity = COMMODITIES[n % len(COMMODITIES)]
+        targets = [s for s in subs if commodity.lower() in s.commodities]
+        move = {'commodity': commodity, 'state': 'Punjab', 'market': 'Khanna', 'arrival_date': '2026-10-17',
+                'modal_price': 2500, 'prev_date': '2026-10-16', 'prev_price': 2300, 'change_pct': 8.7}
+        start = time.perf_counter()
+        publisher = threading.Thread(target=broker.publish_price_move, args=(move,))
+        publisher.start()
+        for sub in targets:
+            await sub.queue.get()
+        latencies.append(time.perf_counter() - start)
+        publisher.join()
+    for sub in subs:
+        broker.unsubscribe(sub)
+    latencies.sort()
+    matched = clients // len(COMMODITIES)
+    print(f"fan-out           : {matched:,} clients per event, {events} events")
+    print(f"latency p50 / max : {latencies[len(latencies) // 2] * 1000:8.2f} / {latencies[-1] * 1000:8.2f} ms")
+    print(f"per delivery      : {latencies[len(latencies) // 2] / matched * 1e6:8.2f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=50000)
+    parser.add_argument('--events', type=int, default=40)
+    args = parser.parse_args()
+    asyncio.run(_run(args.clients, args.events))
+
+
+if __name__ == '__main__':
+    main()
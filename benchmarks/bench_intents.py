@@ -0,0 +1,76 @@
+# Benchmark: chatbot intent classification messages/sec, legacy keyword chain vs Aho-Corasick matcher
+# Usage: python -m benchmarks.bench_intents [--messages N]
+
+import argparse
+import random
+import time
+
+from services.intent_matcher import classify_intent
+
+# Realistic farmer messages: Hinglish, Devanagari, regional scripts and plain English
+CORPUS = [
+    "aaj mausam kaisa rahega?", "मौसम कैसा है आज", "kal barish hogi kya", "गेहूं का भाव क्या है",
+    "wheat price in khanna mandi", "pm kisan ki kist kab aayegi", "फसल बीमा योजना के बारे में बताओ",
+    "mitti ki jaanch kahan hoti hai", "मेरी फसल में कीट लग गए हैं", "cotton me pink bollworm ka ilaj",
+    "hello", "नमस्ते जी", "what is the soil health card", "how to apply for kcc loan",
+    "আজকের আবহাওয়া কেমন", "ধানের দাম কত", "ফসলে পোকা লেগেছে", "నేటి వాతావరణం ఎలా ఉంది",
+    "పత్తి ధర ఎంత", "పంటకు పురుగు పట్టింది", "இன்று மழை வருமா", "நெல் விலை என்ன", "மண் பரிசோதனை",
+    "આજે હવામાન કેવું છે", "કપાસનો ભાવ શું છે", "ಇಂದಿನ ಹವಾಮಾನ", "ರಾಗಿ ಬೆಲೆ ಎಷ್ಟು", "ଆଜି ପାଣିପାଗ କେମିତି",
+    "ଧାନ ଦର କେତେ", "ഇന്ന് മഴ പെയ്യുമോ", "നെല്ലിന്റെ വില", "ਅੱਜ ਮੌਸਮ ਕਿਵੇਂ ਰਹੇਗਾ", "ਕਣਕ ਦਾ ਭਾਅ",
+    "আজি বতৰ কেনেকুৱা", "ᱡᱚᱦᱟᱨ", "kharif sowing time chitchat", "my white cotton leaves curl",
+    "बाजारभाव सांगा", "पाऊस कधी येणार", "تٕہ موسم کیُتھ", "thanks",
+]
+
+
+def legacy_classify(message):
+    """The pre-matcher chatbot chain: re-normalize per check, substring scan per keyword, first hit wins."""
+    def norm(msg):
+        return (msg or "").strip().lower()
+
+    def matches(msg, *keywords):
+        m = norm(msg)
+        return any(k in m for k in keywords)
+
+    msg = norm(message)
+    if not msg:
+        return None
+    if matches(msg, "hi", "hello", "namaste", "hey", "help", "start", "kaise", "कैसे", "नमस्ते"):
+        return "greeting"
+    if matches(msg, "weather", "mausam", "मौसम", "तापमान", "temperature", "barish", "बारिश", "rain"):
+        return "weather"
+    if matches(msg, "mandi", "bhav", "भाव", "price", "कीमत", "market", "मंडी"):
+        return "mandi"
+    if matches(msg, "scheme", "yojana", "योजना", "pm kisan", "kcc", "bima", "बीमा", "insurance"):
+        return "schemes"
+    if matches(msg, "soil", "mitti", "मिट्टी", "मृदा", "soil health", "npk"):
+        return "soil"
+    if matches(msg, "pest", "keet", "कीट", "disease", "रोग", "crop", "fasal", "फसल", "photo", "फोटो"):
+        return "pest"
+    return None
+
+
+def _rate(fn, messages):
+    start = time.perf_counter()
+    for m in messages:
+        fn(m)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    messages = [rng.choice(CORPUS) for _ in range(args.messages)]
+    legacy = _rate(legacy_classify, messages)
+    matcher = _rate(classify_intent, messages)
+    print(f"legacy chain : {legacy:>12,.0f} msgs/s")
+    print(f"aho-corasick : {matcher:>12,.0f} msgs/s")
+
+    recognized = [sum(1 for m in CORPUS if fn(m)) for fn in (legacy_classify, classify_intent)]
+    print(f"recognized intents in corpus ({len(CORPUS)} messages): legacy {recognized[0]}, matcher {recognized[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Benchmark: overhead of the request instrumentation (services.metrics / instrumentation.py)
+# 1. Micro: cost of one stage() and of the @timed get_translation wrapper, enabled vs disabled.
+# 2. End to end: requests/sec for local-only endpoints (no upstream calls) in fresh processes with
+#    METRICS_ENABLED=0 and =1, alternating runs to even out noise.
+# Usage: python -m benchmarks.bench_metrics [--calls N] [--requests N] [--rounds N]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PATHS = ['/api/schemes?lang=ta', '/api/mandi?lang=hi', '/dashboard?lang=bn', '/api/soil?state=Punjab&lang=pa']
+
+
+def _per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def _micro(calls):
+    from services import metrics
+    from translations import build_translation_index, get_translation
+
+    build_translation_index(['hi'])
+
+    def bare():
+        pass
+
+    def staged():
+        with metrics.stage('bench'):
+            pass
+
+    raw = get_translation.__wrapped__ if hasattr(get_translation, '__wrapped__') else get_translation
+    token = metrics.begin_request()
+    base = _per_call_ns(bare, calls)
+    enabled = _per_call_ns(staged, calls)
+    translated = _per_call_ns(lambda: get_translation('hi', 'common', 'app_name'), calls)
+    untimed = _per_call_ns(lambda: raw('hi', 'common', 'app_name'), calls)
+    metrics.METRICS_ENABLED = False
+    disabled = _per_call_ns(staged, calls)
+    metrics.METRICS_ENABLED = True
+    metrics.end_request(token, 'bench', 200, 0.0)
+    print(f"stage() enabled   : {enabled - base:8.0f} ns/call")
+    print(f"stage() disabled  : {disabled - base:8.0f} ns/call")
+    print(f"get_translation   : {untimed:8.0f} ns untimed, {translated:8.0f} ns timed "
+          "(disabled: the undecorated function)")
+
+
+def _child(requests):
+    from app import app
+    client = app.test_client()
+    for path in PATHS:
+        client.get(path)
+    start = time.perf_counter()
+    for i in range(requests):
+        client.get(PATHS[i % len(PATHS)]).get_data()
+    print(json.dumps({'req_per_s': requests / (time.perf_counter() - start)}))
+
+
+def _end_to_end(requests, rounds):
+    results = {'0': [], '1': []}
+    for _ in range(rounds):
+        for enabled in ('0', '1'):
+            env = dict(os.environ, METRICS_ENABLED=enabled, LOCALE_RELOAD_INTERVAL='0', MANDI_SYNC_INTERVAL='0')
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_metrics', '--child', str(requests)],
+                                 env=env, capture_output=True, text=True, check=True).stdout
+            results[enabled].append(json.loads(out.strip().splitlines()[-1])['req_per_s'])
+    off, on = max(results['0']), max(results['1'])
+    print(f"requests disabled : {off:8,.0f} req/s (best of {rounds})")
+    print(f"requests enabled  : {on:8,.0f} req/s ({on / off - 1:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=500000)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child)
+        return
+    _micro(args.calls)
+    _end_to_end(args.requests, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Benchmark: NDVI point and zonal queries on a country-scale tiled raster
+# Writes a synthetic India-extent NDVI raster (int16, scale 1e-4, ~1 km pixels) to a temp dir, then
+# measures point queries/sec with a cold and a warm tile cache, zonal statistics for a field and a
+# district-sized polygon, and how much of the raster the tile cache ends up holding.
+# Usage: python -m benchmarks.bench_ndvi [--pixel 0.01] [--queries 100000] [--cache-mb 32]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+
+def _synthetic_ndvi(height, width, seed=3):
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 6 * np.pi, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 8 * np.pi, width, dtype=np.float32)[None, :]
+    ndvi = 0.35 + 0.25 * np.sin(y) * np.cos(x) + rng.normal(0, 0.05, (height, width)).astype(np.float32)
+    raw = np.clip(ndvi, -0.2, 1.0) * 10000
+    raw[rng.random((height, width)) < 0.02] = -3000  # clouds / water flagged as nodata
+    return raw.astype(np.int16)
+
+
+def _square(lat, lon, half):
+    return [[(lon - half, lat - half), (lon + half, lat - half), (lon + half, lat + half), (lon - half, lat + half)]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pixel", type=float, default=0.01, help="pixel size in degrees")
+    parser.add_argument("--queries", type=int, default=100000)
+    parser.add_argument("--cache-mb", type=float, default=32)
+    args = parser.parse_args()
+
+    west, east, south, north = 68.0, 98.0, 6.0, 38.0
+    width, height = int((east - west) / args.pixel), int((north - south) / args.pixel)
+    root = tempfile.mkdtemp(prefix="ndvi-bench-")
+    header = os.path.join(root, "ndvi.json")
+    start = time.perf_counter()
+    from services.ndvi_raster import NdviRaster, write_tiled_raster
+    write_tiled_raster(header, _synthetic_ndvi(height, width), west, north, args.pixel, args.pixel,
+                       scale=1e-4, nodata=-3000, date="synthetic")
+    size_mb = os.path.getsize(os.path.join(root, "ndvi.bin")) / 2 ** 20
+    print(f"raster         : {width} x {height} px, {size_mb:.0f} MB on disk "
+          f"(written in {time.perf_counter() - start:.1f} s)")
+
+    raster = NdviRaster(header, cache_bytes=int(args.cache_mb * 2 ** 20))
+    rng = random.Random(1)
+    points = [(rng.uniform(8, 35), rng.uniform(69, 97)) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    for lat, lon in points:
+        raster.value(lat, lon)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for lat, lon in points:
+        raster.value(lat, lon)
+    warm = time.perf_counter() - start
+    stats = raster.stats()
+    print(f"points (cold)  : {args.queries / cold:10,.0f} /s  ({stats['misses']} tile reads)")
+    print(f"points (warm)  : {args.queries / warm:10,.0f} /s")
+    print(f"tile cache     : {stats['bytes'] / 2 ** 20:.1f} MB in {stats['entries']} tiles "
+          f"of {raster.tiles_y * raster.tiles_x} ({stats['evictions']} evictions)")
+
+    # Clustered traffic (one region, as a state's farmers would produce) stays within a few tiles
+    local = [(rng.uniform(26, 28), rng.uniform(79, 81)) for _ in range(args.queries)]
+    start = time.perf_counter()
+    for lat, lon in local:
+        raster.value(lat, lon)
+    print(f"points (local) : {args.queries / (time.perf_counter() - start):10,.0f} /s")
+
+    for name, half, n in (("field 2 km", 0.01, 2000), ("district 100 km", 0.5, 50)):
+        start = time.perf_counter()
+        for i in range(n):
+            lat, lon = points[i]
+            raster.zonal_stats(_square(lat, lon, half))
+        print(f"zonal {name:<15}: {(time.perf_counter() - start) / n * 1000:8.2f} ms/polygon")
+
+
+if __name__ == "__main__":
+    main()
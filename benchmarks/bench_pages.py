@@ -0,0 +1,54 @@
+# Benchmark: /dashboard requests/sec, Jinja render per request vs the pre-rendered page cache
+# Requests cycle through all languages (half via ?lang=, half via Accept-Language) with gzip accepted,
+# as browsers send it. Both paths go through the full Flask test client (routing, context processor).
+# Usage: python -m benchmarks.bench_pages [--requests N]
+
+import argparse
+import time
+
+from flask import render_template
+
+
+def _run(client, path, requests, langs):
+    start = time.perf_counter()
+    for i in range(requests):
+        lang = langs[i % len(langs)]
+        if i % 2:
+            resp = client.get(path, query_string={"lang": lang}, headers={"Accept-Encoding": "gzip, deflate, br"})
+        else:
+            resp = client.get(path, headers={"Accept-Language": lang, "Accept-Encoding": "gzip, deflate, br"})
+        resp.get_data()
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+
+    from app import app
+    from config import LANGUAGE_CODES
+    from page_cache import page_cache_stats
+
+    # The pre-cache view, registered under another path for comparison
+    app.add_url_rule("/_bench/dashboard", "bench_dashboard_render", lambda: render_template("dashboard.html"))
+    client = app.test_client()
+    _run(client, "/dashboard", len(LANGUAGE_CODES) * 2, LANGUAGE_CODES)  # first hit per language renders
+
+    render = _run(client, "/_bench/dashboard", args.requests, LANGUAGE_CODES)
+    cached = _run(client, "/dashboard", args.requests, LANGUAGE_CODES)
+    resp = client.get("/dashboard")
+    revalidate_start = time.perf_counter()
+    for _ in range(args.requests):
+        client.get("/dashboard", headers={"If-None-Match": resp.headers["ETag"]})
+    revalidate = args.requests / (time.perf_counter() - revalidate_start)
+
+    stats = page_cache_stats()
+    print(f"render per request : {render:8,.0f} req/s")
+    print(f"pre-rendered       : {cached:8,.0f} req/s  ({cached / render:.1f}x)")
+    print(f"304 revalidation   : {revalidate:8,.0f} req/s")
+    print(f"page cache         : {stats['pages']} pages, {stats['bytes'] / 1024:.0f} KB with encodings")
+
+
+if __name__ == "__main__":
+    main()
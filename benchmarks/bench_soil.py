@@ -0,0 +1,79 @@
+# Benchmark: soil data engine on synthetic Soil Health Card tables
+# Writes one CSV per state (districts x blocks) to a temp dir, then measures lazy state loads, block
+# lookups, the vectorized whole-state fertilizer table against a per-block loop, and the memory cap.
+# Usage: python -m benchmarks.bench_soil [--states 36] [--districts 40] [--blocks 15] [--cap-mb 2]
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+
+def _write_states(root, states, districts, blocks, seed=7):
+    rng = random.Random(seed)
+    names = [f"State {s:02d}" for s in range(states)]
+    for name in names:
+        path = os.path.join(root, name.lower().replace(" ", "_") + ".csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["district", "block", "samples", "n", "p", "k", "ph", "oc", "zn", "fe", "mn", "cu", "b"])
+            for d in range(districts):
+                for b in range(blocks):
+                    w.writerow([f"District {d}", f"Block {b}", rng.randint(50, 5000),
+                                round(rng.uniform(150, 650), 1), round(rng.uniform(4, 40), 1),
+                                round(rng.uniform(80, 400), 1), round(rng.uniform(4.5, 9.2), 2),
+                                round(rng.uniform(0.2, 1.2), 2), round(rng.uniform(0.2, 1.5), 2),
+                                round(rng.uniform(2, 20), 2), round(rng.uniform(1, 10), 2),
+                                round(rng.uniform(0.1, 2), 2), "" if rng.random() < 0.1 else round(rng.uniform(0.2, 1.5), 2)])
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--states", type=int, default=36)
+    parser.add_argument("--districts", type=int, default=40)
+    parser.add_argument("--blocks", type=int, default=15)
+    parser.add_argument("--cap-mb", type=float, default=2.0)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="soil-bench-")
+    states = _write_states(root, args.states, args.districts, args.blocks)
+    os.environ["SOIL_DATA_DIR"] = root
+    os.environ["SOIL_DATA_MAX_MB"] = str(args.cap_mb)
+    from services import soil_data
+
+    start = time.perf_counter()
+    for state in states:
+        soil_data.get_state_table(state)
+    load = time.perf_counter() - start
+    stats = soil_data.soil_data_stats()
+    print(f"cold load      : {load / len(states) * 1000:7.1f} ms/state "
+          f"({args.districts * args.blocks} blocks each)")
+    print(f"memory cap     : {stats['bytes'] / 2 ** 20:.2f} MB held in {stats['entries']} states "
+          f"(cap {args.cap_mb} MB, {stats['evictions']} evicted)")
+
+    state = states[-1]
+    table = soil_data.get_state_table(state)
+    n = 20000
+    start = time.perf_counter()
+    for i in range(n):
+        table.lookup(f"District {i % args.districts}", f"Block {i % args.blocks}")
+    print(f"block lookup   : {(time.perf_counter() - start) / n * 1e6:7.2f} us")
+
+    start = time.perf_counter()
+    for i in range(2000):
+        soil_data.soil_report(state, f"District {i % args.districts}", f"Block {i % args.blocks}", "wheat")
+    per_report = (time.perf_counter() - start) / 2000
+    print(f"soil_report    : {per_report * 1e6:7.1f} us")
+
+    start = time.perf_counter()
+    rows = soil_data.fertilizer_table(state, crop="wheat")
+    vectorized = time.perf_counter() - start
+    print(f"state table    : {vectorized * 1000:7.2f} ms for {len(rows)} blocks "
+          f"(per-block soil_report loop: {per_report * len(rows) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Micro-benchmark: get_translation lookups/sec, legacy nested-dict walk vs compiled flat index
+# Usage: python -m benchmarks.bench_translations [--rounds N]
+
+import argparse
+import time
+
+import translations
+from config import LANGUAGE_CODES, DEFAULT_LANGUAGE, TRANSLATION_MODULES
+
+
+def legacy_get_translation(lang, module, key, **interpolations):
+    """The pre-index implementation: split the key, walk nested dicts, str.replace per kwarg."""
+    if lang not in LANGUAGE_CODES:
+        lang = DEFAULT_LANGUAGE
+    data = translations._load_module(lang, module)
+    if not data:
+        data = translations._load_module(DEFAULT_LANGUAGE, module)
+    value = data
+    for k in key.split('.'):
+        value = (value or {}).get(k)
+        if value is None:
+            return key
+    if not isinstance(value, str):
+        return key
+    for k, v in interpolations.items():
+        value = value.replace('{' + k + '}', str(v))
+    return value
+
+
+def _workload(lang):
+    """Every key of every module for one language, plus one interpolated key (as templates use it)."""
+    calls = []
+    for module in TRANSLATION_MODULES:
+        flat = {}
+        translations._flatten(translations._load_module(lang, module), '', flat)
+        calls.extend((module, key, {}) for key in flat)
+    calls.append(('dashboard', 'welcome', {'name': 'Ramesh'}))
+    return calls
+
+
+def _rate(fn, lang, calls, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for module, key, kwargs in calls:
+            fn(lang, module, key, **kwargs)
+    elapsed = time.perf_counter() - start
+    return rounds * len(calls) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    translations.build_translation_index()
+    print(f"{'lang':<5} {'keys':>5} {'legacy/s':>12} {'indexed/s':>12} {'speedup':>8}")
+    totals = [0.0, 0.0]
+    for lang in LANGUAGE_CODES:
+        calls = _workload(lang)
+        legacy = _rate(legacy_get_translation, lang, calls, args.rounds)
+        indexed = _rate(translations.get_translation, lang, calls, args.rounds)
+        totals[0] += legacy
+        totals[1] += indexed
+        print(f"{lang:<5} {len(calls):>5} {legacy:>12,.0f} {indexed:>12,.0f} {indexed / legacy:>7.1f}x")
+    n = len(LANGUAGE_CODES)
+    print(f"{'mean':<5} {'':>5} {totals[0] / n:>12,.0f} {totals[1] / n:>12,.0f} {totals[1] / totals[0]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
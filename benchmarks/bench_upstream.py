@@ -0,0 +1,86 @@
+# Benchmark: shared upstream client (services.upstream) vs one urlopen per call, against local stand-ins
+# Scenarios: keep-alive throughput, a hung upstream (breaker short-circuit), a flaky upstream (retries).
+# Usage: python -m benchmarks.bench_upstream [--calls N]
+
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+
+from services.upstream import CircuitBreaker, Upstream, UpstreamError
+from tests.standins import start_open_meteo
+
+
+def _urlopen_json(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read().decode())
+
+
+def _run(fn, calls):
+    """(elapsed seconds, successes) for `calls` sequential calls of fn(i)."""
+    ok = 0
+    start = time.perf_counter()
+    for i in range(calls):
+        try:
+            fn(i)
+            ok += 1
+        except (OSError, ValueError):
+            pass
+    return time.perf_counter() - start, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+    server, base = start_open_meteo()
+
+    def url(i):
+        return f"{base}/forecast?latitude={20 + i % 50}&longitude=78"
+
+    # 1. Healthy upstream: connection reuse
+    client = Upstream("bench-keepalive", timeout=5)
+    for name, fn in (("urlopen per call", lambda i: _urlopen_json(url(i), 5)),
+                     ("pooled keep-alive", lambda i: client.get_json(url(i)))):
+        elapsed, ok = _run(fn, args.calls)
+        print(f"healthy  {name:<18} {args.calls / elapsed:>8,.0f} calls/s  ({ok}/{args.calls} ok)")
+    stats = client.stats()
+    print(f"         connections opened {stats['connections_opened']}, reused {stats['connections_reused']}")
+
+    # 2. Hung upstream (replies slower than the timeout): every urlopen waits out the timeout,
+    #    the breaker trips after 5 failures and the rest fail immediately
+    server.latency = 1.0
+    calls = 30
+    client = Upstream("bench-outage", timeout=0.25, retries=0,
+                      breaker=CircuitBreaker(failure_threshold=5, reset_after=60))
+    for name, fn in (("urlopen per call", lambda i: _urlopen_json(url(i), 0.25)),
+                     ("circuit breaker", lambda i: client.get_json(url(i)))):
+        elapsed, ok = _run(fn, calls)
+        print(f"outage   {name:<18} {elapsed / calls * 1000:>8.1f} ms/call  ({ok}/{calls} ok)")
+    stats = client.stats()
+    print(f"         breaker {stats['breaker']['state']}, short-circuited {stats['short_circuited']}")
+
+    # 3. Flaky upstream (30% HTTP 500): jittered retries within the retry budget
+    server.latency = 0.0
+    server.error_rate = 0.3
+    calls = 200
+    no_retry = Upstream("bench-flaky-noretry", timeout=5, retries=0,
+                        breaker=CircuitBreaker(failure_threshold=10 ** 6))
+    retrying = Upstream("bench-flaky-retry", timeout=5, retries=2,
+                        breaker=CircuitBreaker(failure_threshold=10 ** 6))
+    for name, c in (("no retries", no_retry), ("retry budget", retrying)):
+        elapsed, ok = _run(lambda i, c=c: c.get_json(url(i)), calls)
+        print(f"flaky    {name:<18} {ok / calls:>8.1%} success  ({c.stats()['retries']} retries, "
+              f"{c.stats()['retry_budget_exhausted']} budget-exhausted)")
+
+    latency = retrying.stats()["latency_seconds"]
+    print(f"         attempt latency p50 {latency['p50'] * 1000:.2f} ms, p99 {latency['p99'] * 1000:.2f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except (UpstreamError, urllib.error.URLError) as e:
+        raise SystemExit(f"stand-in unreachable: {e}")
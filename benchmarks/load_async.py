@@ -0,0 +1,76 @@
+# Load test: concurrent request capacity of the sync (WSGI) vs async (ASGI) serving modes
+# against a slow local Open-Meteo stand-in, with a fixed worker count.
+# Usage: python -m benchmarks.load_async [--latency 0.2] [--requests 400] [--workers 8] [--concurrency 200]
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.standins import start_open_meteo
+
+
+def _run_sync(flask_app, n, workers):
+    """Flask app behind `workers` threads (like gunicorn --threads): each request pins a thread."""
+    client = flask_app.test_client()
+
+    def one(i):
+        r = client.get(f'/api/weather?lat={8 + (i % 2000) * 0.011:.3f}&lon={70 + i // 2000 * 0.5:.3f}')
+        return r.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        codes = list(pool.map(one, range(n)))
+    return time.perf_counter() - start, codes
+
+
+async def _run_async(asgi_app, n, concurrency):
+    """ASGI app on a single event loop (one worker process); `concurrency` requests in flight."""
+    import httpx
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def one(i):
+            async with sem:
+                r = await client.get(f'/api/weather?lat={8 + (i % 2000) * 0.011:.3f}&lon={90 + i // 2000 * 0.5:.3f}')
+                return r.status_code
+        start = time.perf_counter()
+        codes = await asyncio.gather(*(one(i) for i in range(n)))
+    return time.perf_counter() - start, codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.2, help='upstream latency in seconds')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=8, help='sync worker threads')
+    parser.add_argument('--concurrency', type=int, default=200, help='async in-flight requests')
+    parser.add_argument('--out', help='write results JSON here')
+    args = parser.parse_args()
+
+    server, base = start_open_meteo(latency=args.latency)
+    # Every request must reach the upstream: distinct grid cells and no cache reuse
+    os.environ.update({'OPEN_METEO_BASE': base, 'WEATHER_CACHE_TTL': '0', 'WEATHER_CACHE_STALE': '0',
+                       'LOCALE_RELOAD_INTERVAL': '0', 'WEATHER_CACHE_GRID': '0.01'})
+    from app import app as flask_app
+    import asgi
+
+    results = {'upstream_latency_s': args.latency, 'requests': args.requests}
+    elapsed, codes = _run_sync(flask_app, args.requests, args.workers)
+    results['sync'] = {'workers': args.workers, 'seconds': round(elapsed, 3),
+                       'req_per_s': round(args.requests / elapsed, 1), 'ok': codes.count(200)}
+    elapsed, codes = asyncio.run(_run_async(asgi.app, args.requests, args.concurrency))
+    results['async'] = {'event_loops': 1, 'concurrency': args.concurrency, 'seconds': round(elapsed, 3),
+                        'req_per_s': round(args.requests / elapsed, 1), 'ok': codes.count(200)}
+    results['upstream_hits'] = server.hits
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+# Load-test suite: the main API endpoints and page routes under a realistic multilingual traffic mix
+# Local stand-ins replace Open-Meteo and data.gov.in (configurable latency / error profiles), the mandi
+# store is synced from the stand-in into a temp database, and `--workers` processes (like gunicorn
+# workers) each import the app and drive it with `--threads` concurrent clients through the Flask test
+# client. Latency is measured inside the worker, so it excludes HTTP parsing and the network.
+#
+# Reports throughput, p50/p95/p99/max latency and error counts per endpoint, and RSS per worker; the
+# full result is written as JSON (default benchmarks/results/load-<commit>-<time>.json) and can be
+# compared with an earlier run via --compare.
+# Usage: python -m benchmarks.load_suite [--profile normal] [--requests 4000] [--workers 2] [--threads 8]
+#                                        [--out FILE] [--compare OLD.json]
+
+import argparse
+import csv
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_intents import CORPUS
+from tests.standins import start_data_gov_in, start_open_meteo
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# Upstream behaviour: (Open-Meteo latency s, Open-Meteo error rate, data.gov.in latency s, error rate)
+PROFILES = {
+    'fast': (0.0, 0.0, 0.0, 0.0),
+    'normal': (0.05, 0.0, 0.1, 0.0),
+    'slow': (0.4, 0.0, 1.0, 0.0),
+    'flaky': (0.1, 0.2, 0.2, 0.2),
+}
+
+# Share of requests per endpoint
+MIX = [
+    ('weather', 30),
+    ('mandi', 20),
+    ('advisory', 15),
+    ('chatbot', 15),
+    ('page', 20),
+]
+# Rough share of users per language (speaker population, plus English)
+LANGUAGE_WEIGHTS = {
+    'hi': 40, 'bn': 8, 'te': 7, 'mr': 7, 'ta': 6, 'gu': 5, 'kn': 4, 'or': 3, 'ml': 3, 'pa': 3,
+    'as': 1, 'mai': 1, 'sat': 0.5, 'ks': 0.5, 'en': 11,
+}
+PAGES = ['/', '/dashboard', '/chatbot']
+COMMODITIES = ['Wheat', 'Rice', 'Cotton', 'Soybean', 'Onion', 'Tomato', 'Maize', 'Chickpea', 'Mustard', 'Potato']
+CROPS = [None, 'wheat', 'rice', 'cotton', 'maize', 'soybean']
+
+
+def _districts():
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'regions', 'district_hq.csv')
+    with open(path, encoding='utf-8') as f:
+        return [(r['state'], r['district'], float(r['lat']), float(r['lon']))
+                for r in csv.DictReader(line for line in f if not line.startswith('#'))]
+
+
+def _mandi_records(districts, days=30, seed=5):
+    """Portal-format records: a few markets per state, every commodity, the last `days` days."""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    markets = rng.sample(districts, min(60, len(districts)))
+    out = []
+    for state, district, _, _ in markets:
+        for commodity in COMMODITIES:
+            base = rng.uniform(1500, 7000)
+            for d in range(days):
+                modal = round(base * (1 + rng.gauss(0, 0.03)))
+                out.append({'state': state, 'district': district, 'market': district, 'commodity': commodity,
+                            'variety': 'Other', 'grade': 'FAQ',
+                            'arrival_date': (today - datetime.timedelta(days=d)).strftime('%d/%m/%Y'),
+                            'min_price': modal - 100, 'max_price': modal + 100, 'modal_price': modal})
+    return out
+
+
+def _accept_language(rng, lang):
+    """Browser-style header: the user's language first, often with English or Hindi as fallbacks."""
+    locale = {'mai': 'mai', 'sat': 'sat', 'en': 'en-IN'}.get(lang, f'{lang}-IN')
+    extra = rng.choice(['', ',en;q=0.8', ',hi;q=0.7,en;q=0.5', f',{lang};q=0.9,en-US;q=0.6'])
+    return locale + extra
+
+
+def make_plan(n, seed, districts):
+    """n request specs (name, method, path, query, headers, json) for one worker."""
+    rng = random.Random(seed)
+    names = [name for name, _ in MIX]
+    weights = [w for _, w in MIX]
+    langs = list(LANGUAGE_WEIGHTS)
+    lang_weights = list(LANGUAGE_WEIGHTS.values())
+    plan = []
+    for _ in range(n):
+        name = rng.choices(names, weights)[0]
+        lang = rng.choices(langs, lang_weights)[0]
+        state, _, lat, lon = rng.choice(districts)
+        # Farms around the district HQ
+        lat, lon = round(lat + rng.uniform(-0.3, 0.3), 4), round(lon + rng.uniform(-0.3, 0.3), 4)
+        query, headers, body, method = {}, {'Accept-Encoding': 'gzip, deflate, br'}, None, 'GET'
+        if rng.random() < 0.5:
+            query['lang'] = lang
+        else:
+            headers['Accept-Language'] = _accept_language(rng, lang)
+        if name == 'weather':
+            path = '/api/weather'
+            query.update(lat=lat, lon=lon)
+        elif name == 'mandi':
+            path = '/api/mandi'
+            if rng.random() < 0.6:
+                query['commodity'] = rng.choice(COMMODITIES)
+            if rng.random() < 0.5:
+                query['state'] = state
+        elif name == 'advisory':
+            path = '/api/advisory'
+            query.update(lat=lat, lon=lon, state=state)
+            crop = rng.choice(CROPS)
+            if crop:
+                query['crop'] = crop
+        elif name == 'chatbot':
+            path, method = '/api/chatbot/message', 'POST'
+            body = {'message': rng.choice(CORPUS)}
+        else:
+            path = rng.choice(PAGES)
+        plan.append((name, method, path, query, headers, body))
+    return plan
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker(worker_id, env, plan, threads, warmup, start_barrier, results):
+    os.environ.update(env)
+    from app import app
+    client = app.test_client()
+    rss_start = _rss_mb()
+
+    def one(spec):
+        name, method, path, query, headers, body = spec
+        t0 = time.perf_counter()
+        resp = client.open(path, method=method, query_string=query, headers=headers, json=body)
+        resp.get_data()
+        return name, time.perf_counter() - t0, resp.status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, plan[:warmup]))
+        start_barrier.wait()
+        start = time.perf_counter()
+        samples = list(pool.map(one, plan[warmup:]))
+        elapsed = time.perf_counter() - start
+    results.put({
+        'worker': worker_id,
+        'seconds': elapsed,
+        'samples': samples,
+        'rss_mb': {'after_import': round(rss_start, 1), 'end': round(_rss_mb(), 1),
+                   'peak': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)},
+    })
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def _summary(samples, seconds):
+    lat = sorted(s[1] for s in samples)
+    ms = lambda v: None if v is None else round(v * 1000, 2)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for s in samples if s[2] >= 500),
+        'req_per_s': round(len(samples) / seconds, 1) if seconds else None,
+        'p50_ms': ms(_percentile(lat, 50)),
+        'p95_ms': ms(_percentile(lat, 95)),
+        'p99_ms': ms(_percentile(lat, 99)),
+        'max_ms': ms(lat[-1] if lat else None),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _print_report(result, baseline=None):
+    print(f"profile {result['profile']}: {result['workers']} workers x {result['threads']} threads, "
+          f"commit {result['commit']}")
+    print(f"{'endpoint':<10} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    rows = dict(result['endpoints'], total=result['total'])
+    for name, s in rows.items():
+        line = (f"{name:<10} {s['req_per_s']:>9,.0f} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} "
+                f"{s['p99_ms']:>8.1f} {s['max_ms']:>8.1f} {s['errors']:>7}")
+        old = (baseline or {}).get('endpoints', {}).get(name) if name != 'total' else (baseline or {}).get('total')
+        if old and old.get('p95_ms') and old.get('req_per_s'):
+            line += (f"   vs {baseline.get('commit')}: req/s {s['req_per_s'] / old['req_per_s'] - 1:+.0%}, "
+                     f"p95 {s['p95_ms'] / old['p95_ms'] - 1:+.0%}")
+        print(line)
+    for w in result['memory']:
+        print(f"worker {w['worker']}: RSS {w['after_import']:.0f} MB after import, {w['end']:.0f} MB at end, "
+              f"peak {w['peak']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='normal', help='upstream latency/errors')
+    parser.add_argument('--requests', type=int, default=4000, help='measured requests per worker')
+    parser.add_argument('--warmup', type=int, default=200, help='unmeasured requests per worker first')
+    parser.add_argument('--workers', type=int, default=2, help='app processes')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent clients per worker')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='results JSON path (default under benchmarks/results/)')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    meteo_latency, meteo_errors, portal_latency, portal_errors = PROFILES[args.profile]
+    districts = _districts()
+    meteo, meteo_base = start_open_meteo(latency=meteo_latency, error_rate=meteo_errors, seed=args.seed)
+    portal, portal_base = start_data_gov_in(_mandi_records(districts), latency=portal_latency,
+                                            error_rate=portal_errors, seed=args.seed)
+    tmp = tempfile.mkdtemp(prefix='load-suite-')
+    env = {
+        'OPEN_METEO_BASE': meteo_base, 'DATA_GOV_IN_BASE': portal_base,
+        'MANDI_DB_PATH': os.path.join(tmp, 'mandi.sqlite3'), 'MANDI_SYNC_INTERVAL': '0',
+        'LOCALE_RELOAD_INTERVAL': '0', 'WEATHER_PREFETCH_INTERVAL': '0', 'FLASK_DEBUG': '0',
+    }
+    os.environ.update(env)
+    from services.mandi_store import sync_mandi
+    sync = sync_mandi(api_key='load-suite', base_url=portal_base)
+
+    ctx = multiprocessing.get_context('spawn')
+    barrier, results = ctx.Barrier(args.workers), ctx.Queue()
+    procs = []
+    for w in range(args.workers):
+        plan = make_plan(args.warmup + args.requests, args.seed * 1000 + w, districts)
+        p = ctx.Process(target=_worker, args=(w, env, plan, args.threads, args.warmup, barrier, results))
+        p.start()
+        procs.append(p)
+    outputs = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    wall = max(o['seconds'] for o in outputs)
+    samples = [s for o in outputs for s in o['samples']]
+    by_name = {}
+    for s in samples:
+        by_name.setdefault(s[0], []).append(s)
+    result = {
+        'commit': _git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'profile': args.profile,
+        'upstream': {'open_meteo_latency_s': meteo_latency, 'open_meteo_error_rate': meteo_errors,
+                     'data_gov_in_latency_s': portal_latency, 'data_gov_in_error_rate': portal_errors},
+        'workers': args.workers,
+        'threads': args.threads,
+        'requests_per_worker': args.requests,
+        'mandi_sync': sync,
+        'upstream_hits': {'open_meteo': meteo.hits},
+        'total': _summary(samples, wall),
+        'endpoints': {name: _summary(by_name[name], wall) for name, _ in MIX if name in by_name},
+        'memory': sorted((dict(o['rss_mb'], worker=o['worker']) for o in outputs), key=lambda m: m['worker']),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print_report(result, baseline)
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        out = os.path.join(RESULTS_DIR, f"load-{result['commit'] or 'nocommit'}-{stamp}.json")
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'results: {out}')
+    meteo.shutdown()
+    portal.shutdown()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
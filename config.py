@@ -56,6 +56,69 @@ TRANSLATION_MODULES = ['common', 'dashboard', 'chatbot', 'advisory', 'schemes',
 
 # Path to locale JSON files
 LOCALES_DIR = BASE_DIR / 'locales'
+# Compile all languages at boot (otherwise each is compiled on first use)
+LOCALE_WARMUP = os.environ.get('LOCALE_WARMUP', '1') == '1'
+# Seconds between checks for edited locale files (0 disables hot reload)
+LOCALE_RELOAD_INTERVAL = float(os.environ.get('LOCALE_RELOAD_INTERVAL', '5'))
+
+# Local data (bundled datasets and runtime stores)
+DATA_DIR = BASE_DIR / 'data'
+
+# Local mandi price store, synced from data.gov.in
+MANDI_DB_PATH = Path(os.environ.get('MANDI_DB_PATH', str(DATA_DIR / 'mandi.sqlite3')))
+# Seconds between background syncs (0 disables; sync also needs DATA_GOV_IN_API_KEY)
+MANDI_SYNC_INTERVAL = int(os.environ.get('MANDI_SYNC_INTERVAL', '3600'))
+
+# State/district boundaries for lat/lon -> region lookups. Empty uses the bundled coarse regions
+# (derived from district headquarters); set to a GeoJSON FeatureCollection for exact boundaries
+REGIONS_DIR = DATA_DIR / 'regions'
+REGION_BOUNDARIES_PATH = os.environ.get('REGION_BOUNDARIES_PATH', '')
+
+# Soil Health Card-style nutrient tables, one file per state (<state_slug>.csv or .parquet)
+SOIL_DATA_DIR = Path(os.environ.get('SOIL_DATA_DIR', str(DATA_DIR / 'soil')))
+# Memory cap for loaded state tables; least recently used states are dropped beyond it
+SOIL_DATA_MAX_MB = float(os.environ.get('SOIL_DATA_MAX_MB', '64'))
+
+# NDVI raster for crop-condition values: tiled raster header (.json) or uncompressed GeoTIFF (.tif,
+# needs tifffile). Empty disables NDVI; the satellite card then only carries portal links
+NDVI_RASTER_PATH = os.environ.get('NDVI_RASTER_PATH', '')
+# Memory for decoded raster tiles (LRU)
+NDVI_TILE_CACHE_MB = float(os.environ.get('NDVI_TILE_CACHE_MB', '32'))
+
+# Shared cache tier under the per-process caches (compiled translations, weather forecasts, mandi
+# queries): 'memory' (per worker; translations and forecasts then skip the tier), 'shm' (files in
+# CACHE_DIR, on tmpfs by default, shared by all workers on the host) or 'resp' (a Redis-protocol
+# server at CACHE_URL, shared across hosts). Values are pickled: only point CACHE_URL at a trusted store.
+# CACHE_DIR is created 0700; one that is not owned by the service user, or that group/others can write
+# to, is refused and the tier falls back to 'memory'.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHE_DIR = os.environ.get('CACHE_DIR', '/dev/shm/krishinirnay-cache')
+CACHE_URL = os.environ.get('CACHE_URL', 'redis://127.0.0.1:6379/0')
+CACHE_PREFIX = os.environ.get('CACHE_PREFIX', 'krishinirnay:')
+CACHE_MAX_MB = float(os.environ.get('CACHE_MAX_MB', '128'))
+MANDI_CACHE_TTL = int(os.environ.get('MANDI_CACHE_TTL', '300'))
+
+# Cache of serialized read-only API responses (schemes, soil, satellite): 'memory' (per worker),
+# 'shm' (files in RESPONSE_CACHE_DIR, on tmpfs by default, shared by all workers on the host) or
+# 'resp' (the CACHE_URL server)
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+RESPONSE_CACHE_DIR = os.environ.get('RESPONSE_CACHE_DIR', '/dev/shm/krishinirnay-responses')
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', '3600'))
+RESPONSE_CACHE_MAX_MB = float(os.environ.get('RESPONSE_CACHE_MAX_MB', '64'))
+
+# Weather prefetch: registered farm grid cells (CSV or JSON of lat,lon) kept warm in the forecast cache
+WEATHER_PREFETCH_CELLS = os.environ.get('WEATHER_PREFETCH_CELLS', '')
+# Seconds between prefetch passes (0 disables); each pass only refreshes cells that are due. SSE
+# weather alerts (services.events) rely on it to refresh the cells clients subscribed to
+# With a shared cache tier (CACHE_BACKEND=shm/resp) one worker at a time runs the full passes
+WEATHER_PREFETCH_INTERVAL = float(os.environ.get('WEATHER_PREFETCH_INTERVAL', '0'))
+
+# Request instrumentation: per-stage timings (Server-Timing header, /metrics). 0 makes it a no-op
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+# Percentage of requests captured with cProfile (0 disables); .prof files go to PROFILE_DIR, newest PROFILE_KEEP kept
+PROFILE_SAMPLE_PERCENT = float(os.environ.get('PROFILE_SAMPLE_PERCENT', '0'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(DATA_DIR / 'profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '200'))
 
 # Flask
 SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-change-in-production')
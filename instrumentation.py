@@ -0,0 +1,187 @@
+# Request instrumentation for the Flask app: per-request stage timings, /metrics export, sampled cProfile
+# Each request's stage breakdown (see services.metrics) is returned in a Server-Timing header and
+# aggregated into histograms exported in the Prometheus text format. PROFILE_SAMPLE_PERCENT of requests
+# are additionally run under cProfile and dumped as .prof files (inspect with `python -m pstats`).
+# The natively async routes in asgi.py record the same request metrics and Server-Timing header
+# (via services.metrics directly); they are not sampled for cProfile.
+
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+
+from flask import g, request
+from flask.json.provider import DefaultJSONProvider
+
+from config import METRICS_ENABLED, PROFILE_DIR, PROFILE_KEEP, PROFILE_SAMPLE_PERCENT
+from services import metrics
+from services.metrics import stage
+from services.upstream import upstream_stats
+
+PREFIX = 'krishinirnay'
+
+# One profiled request at a time: concurrent profilers would also see each other's threads on 3.12+
+_profile_lock = threading.Lock()
+_profile_percent = PROFILE_SAMPLE_PERCENT
+_profile_stats = {'captured': 0, 'skipped_busy': 0}
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with serialization counted as the 'json' stage."""
+
+    def dumps(self, obj, **kwargs):
+        with stage('json'):
+            return super().dumps(obj, **kwargs)
+
+
+def set_profile_percent(percent):
+    """Change the share of requests captured with cProfile at runtime (0 disables)."""
+    global _profile_percent
+    _profile_percent = min(max(float(percent), 0.0), 100.0)
+
+
+def _endpoint():
+    # The route pattern keeps the label set bounded (no raw paths from 404 scans)
+    return request.url_rule.rule if request.url_rule is not None else 'other'
+
+
+def _save_profile(profiler, endpoint, seconds):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', endpoint).strip('_') or 'root'
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1e6) % 1000000:06d}-{slug}-{seconds * 1000:.0f}ms.prof"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+    profiles = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith('.prof'))
+    for old in profiles[:max(0, len(profiles) - PROFILE_KEEP)]:
+        try:
+            os.unlink(os.path.join(PROFILE_DIR, old))
+        except OSError:
+            pass
+
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+    g._metrics_token = metrics.begin_request()
+    if _profile_percent > 0 and random.random() * 100 < _profile_percent:
+        if _profile_lock.acquire(blocking=False):
+            profiler = g._profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            _profile_stats['skipped_busy'] += 1
+
+
+def _finish(status):
+    """Close the request's metrics (and profile); returns (stages, total seconds) or None."""
+    token = g.pop('_metrics_token', None)
+    if token is None:
+        return None
+    elapsed = time.perf_counter() - g._metrics_start
+    endpoint = _endpoint()
+    profiler = g.pop('_profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        try:
+            _save_profile(profiler, endpoint, elapsed)
+            _profile_stats['captured'] += 1
+        except OSError:
+            pass
+        finally:
+            _profile_lock.release()
+    return metrics.end_request(token, endpoint, status, elapsed), elapsed
+
+
+def server_timing(stages, elapsed):
+    """Server-Timing header value for a request's {stage: (seconds, calls)} and total seconds."""
+    timings = [f'{name};dur={spent * 1000:.2f}' for name, (spent, _) in stages.items()]
+    timings.append(f'total;dur={elapsed * 1000:.2f}')
+    return ', '.join(timings)
+
+
+def _after_request(response):
+    finished = _finish(response.status_code)
+    if finished is not None:
+        response.headers['Server-Timing'] = server_timing(*finished)
+    return response
+
+
+def _teardown_request(error):
+    # Only reached with the token still set when after_request did not run
+    if error is not None:
+        _finish(500)
+
+
+def init_instrumentation(app):
+    """Install the timing hooks and JSON provider (nothing when metrics and profiling are both off)."""
+    if not METRICS_ENABLED and _profile_percent <= 0:
+        return
+    if METRICS_ENABLED:
+        app.json = TimedJSONProvider(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+
+def _label_str(labels):
+    def esc(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{esc(v)}"' for k, v in labels.items()) + '}' if labels else ''
+
+
+def _histogram(lines, name, labels, snap):
+    for le, count in snap['buckets'].items():
+        lines.append(f'{name}_bucket{_label_str(dict(labels, le=le))} {count}')
+    lines.append(f'{name}_sum{_label_str(labels)} {snap["sum"]}')
+    lines.append(f'{name}_count{_label_str(labels)} {snap["count"]}')
+
+
+def render_prometheus(caches=None):
+    """All request, stage and upstream metrics (plus `caches`: name -> stats dict) as Prometheus text."""
+    snap = metrics.snapshot()
+    lines = []
+
+    name = f'{PREFIX}_requests_total'
+    lines += [f'# HELP {name} Requests handled, by route and status.', f'# TYPE {name} counter']
+    lines += [f'{name}{_label_str({"endpoint": r["endpoint"], "status": r["status"]})} {r["count"]}'
+              for r in snap['requests']]
+
+    name = f'{PREFIX}_request_duration_seconds'
+    lines += [f'# HELP {name} Request handling time, by route.', f'# TYPE {name} histogram']
+    for endpoint, hist in snap['request_seconds'].items():
+        _histogram(lines, name, {'endpoint': endpoint}, hist)
+
+    name = f'{PREFIX}_stage_duration_seconds'
+    lines += [f'# HELP {name} Time a request spent in each stage (exclusive of nested stages).',
+              f'# TYPE {name} histogram']
+    for stage_name, hist in snap['stage_seconds'].items():
+        _histogram(lines, name, {'stage': stage_name}, hist)
+
+    name = f'{PREFIX}_stage_calls_total'
+    lines += [f'# HELP {name} Times each stage was entered.', f'# TYPE {name} counter']
+    lines += [f'{name}{_label_str({"stage": s})} {n}' for s, n in sorted(snap['stage_calls'].items())]
+
+    upstreams = upstream_stats()
+    name = f'{PREFIX}_upstream_request_duration_seconds'
+    lines += [f'# HELP {name} Upstream call attempts, by upstream.', f'# TYPE {name} histogram']
+    for upstream, stats in upstreams.items():
+        _histogram(lines, name, {'upstream': upstream}, stats['latency_seconds'])
+    name = f'{PREFIX}_upstream_events_total'
+    lines += [f'# HELP {name} Upstream client events (requests, ok, failures, retries, ...).',
+              f'# TYPE {name} counter']
+    for upstream, stats in upstreams.items():
+        lines += [f'{name}{_label_str({"upstream": upstream, "event": k})} {v}'
+                  for k, v in stats.items() if isinstance(v, int) and not isinstance(v, bool)]
+
+    if caches:
+        name = f'{PREFIX}_cache'
+        lines += [f'# HELP {name} Cache counters and sizes (hits, misses, entries, bytes, ...).',
+                  f'# TYPE {name} untyped']
+        for cache, stats in caches.items():
+            lines += [f'{name}{_label_str({"cache": cache, "stat": k})} {v}'
+                      for k, v in stats.items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    return '\n'.join(lines) + '\n'
+
+
+def instrumentation_stats():
+    return {'enabled': METRICS_ENABLED, 'profile_percent': _profile_percent, 'profiles': dict(_profile_stats),
+            'stages': metrics.snapshot()['stage_seconds']}
@@ -1,23 +1,77 @@
 # Language detection middleware - URL, header, session
 
-from flask import request
+from functools import lru_cache
 
-from config import LANGUAGE_CODES, DEFAULT_LANGUAGE
+from flask import g, request
 
+from config import LANGUAGE_CODES, LANGUAGE_LOCALE_MAP, DEFAULT_LANGUAGE
 
-def get_request_language():
-    """Priority: URL ?lang= > Accept-Language header > default."""
-    # 1. URL parameter (deep linking)
-    url_lang = request.args.get('lang', '').strip()[:5]
-    if url_lang in LANGUAGE_CODES:
-        return url_lang
+_CODES = frozenset(LANGUAGE_CODES)
+# Full tags -> supported code: each code's own locale (hi-IN, ta-IN, ...) plus the regional
+# fallbacks from LANGUAGE_LOCALE_MAP; the first language claiming a locale keeps it (hi-IN -> hi)
+_TAGS = {}
+for _code, _locale in LANGUAGE_LOCALE_MAP.items():
+    _TAGS.setdefault(_locale.lower(), _code)
+# Headers longer than this are only negotiated on their first entries (keeps cache keys bounded)
+MAX_HEADER_CHARS = 256
+
+
+def _match(tag):
+    """Supported code for one language tag ('mai', 'hi-IN', 'bn-BD', 'EN_us'), or None."""
+    tag = tag.strip().lower().replace('_', '-')
+    if tag in _CODES:
+        return tag
+    code = _TAGS.get(tag)
+    if code is None:
+        primary = tag.split('-', 1)[0]
+        code = primary if primary in _CODES else None
+    return code
 
-    # 2. Accept-Language header (e.g. hi-IN, en)
-    accept = request.headers.get('Accept-Language', '')
+
+@lru_cache(maxsize=512)
+def negotiate(accept):
+    """Best supported code for an Accept-Language header by q-weight (ties: header order), or None."""
+    best, best_q = None, 0.0
     for part in accept.split(','):
-        part = part.strip().split(';')[0].strip()
-        code = part.split('-')[0].lower() if part else ''
-        if code in LANGUAGE_CODES:
+        tag, _, params = part.partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0  # malformed weight: skip the entry
+        if q <= best_q:
+            continue
+        code = _match(tag)
+        if code is not None:
+            best, best_q = code, q
+    return best
+
+
+def resolve_language(url_lang, accept):
+    """Priority: URL ?lang= > Accept-Language header > default. Framework-independent."""
+    # 1. URL parameter (deep linking)
+    url_lang = (url_lang or '').strip()[:5]
+    if url_lang:
+        code = _match(url_lang)
+        if code is not None:
+            return code
+
+    # 2. Accept-Language header (e.g. "mai-IN, hi;q=0.8, en;q=0.5"), memoized per raw header
+    if accept:
+        code = negotiate(accept[:MAX_HEADER_CHARS])
+        if code is not None:
             return code
 
     return DEFAULT_LANGUAGE
+
+
+def get_request_language():
+    """Language for the current Flask request (negotiated once, then kept on flask.g)."""
+    lang = g.get('_language')
+    if lang is None:
+        lang = g._language = resolve_language(request.args.get('lang', ''),
+                                              request.headers.get('Accept-Language', ''))
+    return lang
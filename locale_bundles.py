@@ -0,0 +1,127 @@
+# Pre-compressed, ETag-versioned locale JSON for the frontend i18n (per module and per-language bundle)
+# Everything is serialized and compressed once (at startup and after a locale reload), never per request.
+
+import gzip
+import hashlib
+import json
+import threading
+
+from flask import request, Response
+
+from config import LANGUAGE_CODES, DEFAULT_LANGUAGE, TRANSLATION_MODULES
+from translations import get_locale_data, on_locale_reload
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Versioned URLs (?v=<etag>) never change content, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unversioned URLs must revalidate (cheap: 304 on matching ETag)
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+BUNDLE = '_bundle'
+
+
+class _Asset:
+    __slots__ = ('body', 'gzip', 'br', 'etag', 'version')
+
+    def __init__(self, data):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        self.version = hashlib.sha256(self.body).hexdigest()[:16]
+        self.etag = f'"{self.version}"'
+        self.gzip = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.br = brotli.compress(self.body, quality=11) if brotli else None
+
+
+# (lang, module or BUNDLE) -> _Asset; replaced per language, never mutated in place
+_assets = {}
+_lock = threading.Lock()
+
+
+def _merge(base: dict, override: dict) -> dict:
+    out = dict(base)
+    for k, v in override.items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = _merge(out[k], v)
+        else:
+            out[k] = v
+    return out
+
+
+def _build_language(lang: str) -> dict:
+    assets = {}
+    bundle = {}
+    for module in TRANSLATION_MODULES:
+        data = get_locale_data(lang, module)
+        assets[(lang, module)] = _Asset(data)
+        # The bundle carries DEFAULT_LANGUAGE strings for keys this language lacks (same as the server)
+        bundle[module] = data if lang == DEFAULT_LANGUAGE else _merge(get_locale_data(DEFAULT_LANGUAGE, module), data)
+    assets[(lang, BUNDLE)] = _Asset(bundle)
+    return assets
+
+
+def build_locale_bundles(langs=None) -> None:
+    global _assets
+    built = {}
+    for lang in langs or LANGUAGE_CODES:
+        built.update(_build_language(lang))
+    with _lock:
+        _assets = {**_assets, **built}
+
+
+def locale_versions() -> dict:
+    """lang -> bundle version, for building cache-busting bundle URLs in templates."""
+    return {lang: asset.version for (lang, module), asset in _assets.items() if module == BUNDLE}
+
+
+def _get_asset(lang: str, module: str):
+    asset = _assets.get((lang, module))
+    if asset is None and lang in LANGUAGE_CODES:
+        build_locale_bundles([lang])
+        asset = _assets.get((lang, module))
+    return asset
+
+
+def bundle_version(lang: str) -> str:
+    """Current version of a language's bundle (changes whenever any of its strings change)."""
+    return _get_asset(lang, BUNDLE).version
+
+
+def bundle_data(lang: str) -> dict:
+    """A language's bundle as data: {module: strings}, DEFAULT_LANGUAGE fallbacks merged in."""
+    return json.loads(_get_asset(lang, BUNDLE).body)
+
+
+def locale_response(lang: str, module: str = BUNDLE):
+    """Serve one locale asset with ETag / 304 handling and the best pre-compressed encoding."""
+    asset = _get_asset(lang, module)
+    if asset is None:
+        return None
+    versioned = request.args.get('v') == asset.version
+    headers = {
+        'ETag': asset.etag,
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if versioned else REVALIDATE_CACHE_CONTROL,
+        'Vary': 'Accept-Encoding',
+    }
+    if asset.etag in request.if_none_match or asset.version in request.if_none_match:
+        return Response(status=304, headers=headers)
+    body = asset.body
+    accept = request.accept_encodings
+    if asset.br is not None and accept['br']:
+        body = asset.br
+        headers['Content-Encoding'] = 'br'
+    elif accept['gzip']:
+        body = asset.gzip
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='application/json', headers=headers)
+
+
+def _on_reload(lang: str) -> None:
+    # Reloads of DEFAULT_LANGUAGE trigger a callback for every language, so merged bundles stay current
+    if _assets:
+        build_locale_bundles([lang])
+
+
+on_locale_reload(_on_reload)
@@ -0,0 +1,148 @@
+# Pre-rendered HTML pages per language (index, dashboard, chatbot)
+# Page content only varies by language, so each (template, language) is rendered once, stored with its
+# gzip/brotli encodings and an ETag, and served as bytes. Entries are dropped when a locale reloads
+# (the pages embed the locale bundle versions) or when a template file changes on disk.
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+from flask import Response, current_app, render_template, request
+
+from config import BASE_DIR, LANGUAGE_CODES, LOCALE_RELOAD_INTERVAL
+from language_middleware import get_request_language
+from services.metrics import stage
+from translations import on_locale_reload
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+TEMPLATES_DIR = BASE_DIR / 'templates'
+# HTML must revalidate (cheap: 304 on matching ETag) so a language or locale change shows up at once
+PAGE_CACHE_CONTROL = 'no-cache'
+
+
+class _Page:
+    __slots__ = ('body', 'gzip', 'br', 'etag')
+
+    def __init__(self, html):
+        self.body = html.encode('utf-8')
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:16] + '"'
+        self.gzip = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.br = brotli.compress(self.body, quality=11) if brotli else None
+
+
+_pages = {}             # (template, lang) -> _Page
+_generation = 0         # bumped on every invalidation; renders started before it are not stored
+_lock = threading.Lock()
+_templates_signature = None
+_templates_checked = 0.0
+_stats = {'hits': 0, 'renders': 0, 'not_modified': 0, 'invalidations': 0}
+
+
+def _signature():
+    sig = []
+    for root, _, files in os.walk(TEMPLATES_DIR):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                sig.append((path, os.stat(path).st_mtime_ns))
+            except OSError:
+                pass
+    return tuple(sorted(sig))
+
+
+def invalidate(reason=None):
+    global _pages, _generation
+    with _lock:
+        _pages = {}
+        _generation += 1
+        _stats['invalidations'] += 1
+    if reason == 'templates' and current_app.jinja_env.cache is not None:
+        # Jinja keeps compiled templates too (and only re-checks them with auto_reload)
+        current_app.jinja_env.cache.clear()
+
+
+def _check_templates():
+    """Invalidate when a template changed (checked at most every LOCALE_RELOAD_INTERVAL seconds)."""
+    global _templates_signature, _templates_checked
+    if LOCALE_RELOAD_INTERVAL <= 0:
+        return
+    now = time.monotonic()
+    if now - _templates_checked < LOCALE_RELOAD_INTERVAL:
+        return
+    _templates_checked = now
+    sig = _signature()
+    if _templates_signature is None:
+        _templates_signature = sig
+    elif sig != _templates_signature:
+        _templates_signature = sig
+        invalidate('templates')
+
+
+def _render(template, lang):
+    with _lock:
+        generation = _generation
+    with stage('template'):
+        html = render_template(template)
+    page = _Page(html)
+    with _lock:
+        _stats['renders'] += 1
+        if generation == _generation:
+            _pages[(template, lang)] = page
+    return page
+
+
+def page_response(template):
+    """Serve a page for the request's language from the cache (rendering it on first use)."""
+    _check_templates()
+    lang = get_request_language()
+    page = _pages.get((template, lang))
+    if page is None:
+        page = _render(template, lang)
+    else:
+        with _lock:
+            _stats['hits'] += 1
+    headers = {
+        'ETag': page.etag,
+        'Cache-Control': PAGE_CACHE_CONTROL,
+        'Vary': 'Accept-Encoding, Accept-Language',
+    }
+    if page.etag.strip('"') in request.if_none_match:
+        with _lock:
+            _stats['not_modified'] += 1
+        return Response(status=304, headers=headers)
+    body = page.body
+    accept = request.accept_encodings
+    if page.br is not None and accept['br']:
+        body = page.br
+        headers['Content-Encoding'] = 'br'
+    elif accept['gzip']:
+        body = page.gzip
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='text/html', headers=headers)
+
+
+def build_page_cache(app, pages, langs=None):
+    """Render every (path, template) in `pages` for each language up front (at startup)."""
+    global _templates_signature
+    _templates_signature = _signature()
+    for lang in langs or LANGUAGE_CODES:
+        for path, template in pages.items():
+            with app.test_request_context(path, query_string={'lang': lang}):
+                _render(template, lang)
+
+
+def page_cache_stats():
+    with _lock:
+        out = dict(_stats)
+        out['pages'] = len(_pages)
+        out['bytes'] = sum(len(p.body) + len(p.gzip) + len(p.br or b'') for p in _pages.values())
+    return out
+
+
+on_locale_reload(lambda lang: invalidate('locales') if _pages else None)
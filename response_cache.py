@@ -0,0 +1,92 @@
+# Response cache for read-only, language-dependent JSON APIs (schemes, soil, satellite)
+# A view's JSON is serialized once per (endpoint, language, normalized params, data versions) and
+# served as stored bytes with an ETag; matching If-None-Match requests get 304. Data versions
+# (schemes and soil advisory versions, soil file, NDVI raster) are part of the key, so a reload of
+# the underlying data simply stops matching the old entries. Locale files are not: an edited
+# translation shows up once the entries expire (RESPONSE_CACHE_TTL).
+#
+# Backends (services.cache_backends): 'memory' keeps entries per worker; 'shm' writes them as files
+# in a tmpfs directory, so every worker on the host reads the same page-cached copy; 'resp' keeps
+# them on the CACHE_URL server.
+
+import functools
+import hashlib
+import json
+import threading
+
+from flask import Response, request
+
+from config import (
+    CACHE_PREFIX,
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_MAX_MB,
+    RESPONSE_CACHE_TTL,
+)
+from services import cache_backends
+from services.metrics import stage
+
+
+def make_backend(kind=RESPONSE_CACHE_BACKEND):
+    return cache_backends.make_backend(kind, RESPONSE_CACHE_DIR, int(RESPONSE_CACHE_MAX_MB * 1024 * 1024),
+                                       prefix=CACHE_PREFIX + 'responses:')
+
+
+backend = make_backend()
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'stored': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def _respond(etag, body, max_age, status):
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={max_age}',
+        'Vary': 'Accept-Language',
+        'X-Cache': status,
+    }
+    if etag.strip('"') in request.if_none_match:
+        _count('not_modified')
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='application/json', headers=headers)
+
+
+def cached_json(name, key_fn, ttl=RESPONSE_CACHE_TTL, max_age=300):
+    """Decorate a Flask view returning JSON; key_fn() -> JSON-able parts that fully determine the body.
+
+    Only 200 responses are stored. Stored entries are b'<etag>\\n<body>'.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            parts = key_fn()
+            key = name + ':' + hashlib.sha256(
+                json.dumps(parts, separators=(',', ':'), default=str).encode('utf-8')).hexdigest()[:32]
+            with stage('cache.response'):
+                entry = backend.get(key)
+            if entry is not None:
+                _count('hits')
+                etag, _, body = entry.partition(b'\n')
+                return _respond(etag.decode('ascii'), body, max_age, 'HIT')
+            _count('misses')
+            resp = view(*args, **kwargs)
+            if isinstance(resp, tuple) or resp.status_code != 200 or resp.mimetype != 'application/json':
+                return resp
+            body = resp.get_data()
+            etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+            backend.set(key, etag.encode('ascii') + b'\n' + body, ttl)
+            _count('stored')
+            return _respond(etag, body, max_age, 'MISS')
+        return wrapper
+    return decorator
+
+
+def response_cache_stats():
+    with _stats_lock:
+        out = dict(_stats)
+    out.update(backend.stats())
+    return out
@@ -1,13 +1,70 @@
-# Combined advisory from weather + soil (for "Today's Advisory" card)
+# Combined advisory from weather + agro-weather indices + soil (for "Today's Advisory" card)
 
+from services.agro_indices import IRRIGATION_DAYS, get_agro_indices
+from services.pool import executor
 from services.weather import fetch_weather
 from services.soil import get_soil_advisory
 from translations import get_translation
 
+# Below this the 3-day irrigation need is reported as covered by rain
+IRRIGATION_MIN_MM = 5.0
 
-def get_advisory(lang, lat=None, lon=None, state=None):
-    weather = fetch_weather(lat=lat, lon=lon)
-    soil = get_soil_advisory(state=state, lang=lang)
+
+def _index_sentences(lang, indices, crop=None):
+    """Advisory sentences from a get_agro_indices result: spray window, heat stress, irrigation."""
+    out = []
+    window = indices.get("next_spray_window")
+    if window:
+        date, time = window.split("T")
+        out.append(get_translation(lang, "advisory", "indices.spray_window",
+                                   date=f"{date[8:10]}/{date[5:7]}", time=time))
+    else:
+        out.append(get_translation(lang, "advisory", "indices.no_spray_window", days=len(indices["days"])))
+    heat = sum(indices["heat_stress_hours"][:IRRIGATION_DAYS])
+    if heat:
+        out.append(get_translation(lang, "advisory", "indices.heat_stress", hours=heat,
+                                   threshold=f"{indices['heat_stress_threshold']:.0f}", days=IRRIGATION_DAYS))
+    need = indices["irrigation_need_3d_mm"]
+    if need >= IRRIGATION_MIN_MM:
+        out.append(get_translation(lang, "advisory", "indices.irrigation", mm=f"{need:.0f}", days=IRRIGATION_DAYS))
+    else:
+        out.append(get_translation(lang, "advisory", "indices.no_irrigation", days=IRRIGATION_DAYS))
+    if crop:
+        out.append(get_translation(lang, "advisory", "indices.gdd", gdd=f"{indices['gdd_total']:.0f}"))
+    return out
+
+
+def get_advisory(lang, lat=None, lon=None, state=None, weather=None, crop=None, district=None):
+    """Build the advisory text. Pass `weather` (a fetch_weather result) to reuse an existing fetch.
+
+    Without a state, soil advice uses the region resolved from lat/lon.
+    """
+    pending = None
+    if weather is None:
+        # Fetch weather in the background while soil advice is resolved locally
+        pending = executor.submit(fetch_weather, lat=lat, lon=lon)
+    soil = get_soil_advisory(state=state, district=district, lang=lang, lat=lat, lon=lon, crop=crop)
+    if pending is not None:
+        weather = pending.result()
+    indices = None
+    if weather.get("current") and not weather.get("error"):
+        # Same grid cell as the weather fetch above, so the forecast comes from the cache; that
+        # fetch already counted this request towards the cell's prefetch demand
+        indices = get_agro_indices([(lat, lon)], crop=crop, note_demand=False)[0]
+        if indices.get("error"):
+            indices = None
+    return {
+        "text": compose_advisory(lang, weather, indices, soil, crop),
+        "soil_tip": soil.get("npk_tip"),
+        "weather": weather.get("current"),
+        "indices": indices,
+        "region": soil.get("region"),
+    }
+
+
+def compose_advisory(lang, weather, indices, soil, crop=None):
+    """Advisory text from a fetch_weather-style dict (only "current" is read), agro indices (or None)
+    and a get_soil_advisory result."""
     parts = []
     if weather.get("current"):
         cur = weather["current"]
@@ -18,9 +75,7 @@ def get_advisory(lang, lat=None, lon=None, state=None):
             parts.append(f"{cond_label}, {temp:.0f}°C.")
         else:
             parts.append(cond_label + ".")
+    if indices:
+        parts.extend(_index_sentences(lang, indices, crop))
     parts.append(soil.get("summary", ""))
-    return {
-        "text": " ".join(parts),
-        "soil_tip": soil.get("npk_tip"),
-        "weather": weather.get("current"),
-    }
+    return " ".join(parts)
@@ -0,0 +1,197 @@
+# Vectorized agro-weather indices over many forecasts at once
+# Forecasts are stacked into (locations x days) and (locations x hours) arrays, so indices for a whole
+# list of farms cost a handful of NumPy operations instead of a Python loop per location and hour.
+
+import datetime
+
+import numpy as np
+
+from services.pool import executor
+from services.weather import get_forecast, grid_cell
+
+# Per crop: GDD base and upper cut-off temperatures (°C), mid-season crop coefficient Kc (FAO-56)
+# and the air temperature above which an hour counts as heat stress
+CROP_PARAMS = {
+    "default": {"t_base": 10.0, "t_upper": 30.0, "kc": 1.0, "heat_stress": 35.0},
+    "wheat": {"t_base": 5.0, "t_upper": 30.0, "kc": 1.15, "heat_stress": 32.0},
+    "rice": {"t_base": 10.0, "t_upper": 35.0, "kc": 1.2, "heat_stress": 35.0},
+    "maize": {"t_base": 10.0, "t_upper": 30.0, "kc": 1.2, "heat_stress": 35.0},
+    "cotton": {"t_base": 15.5, "t_upper": 32.0, "kc": 1.15, "heat_stress": 38.0},
+    "soybean": {"t_base": 10.0, "t_upper": 30.0, "kc": 1.15, "heat_stress": 35.0},
+    "mustard": {"t_base": 5.0, "t_upper": 25.0, "kc": 1.05, "heat_stress": 30.0},
+    "chickpea": {"t_base": 5.0, "t_upper": 30.0, "kc": 1.0, "heat_stress": 32.0},
+    "sugarcane": {"t_base": 12.0, "t_upper": 35.0, "kc": 1.25, "heat_stress": 38.0},
+}
+
+# An hour suits spraying when wind, temperature and humidity are in range, it is daylight, and no
+# rain falls in that hour or the following SPRAY_RAIN_FREE_HOURS (the spray must dry on the leaf)
+SPRAY_WIND_KMH = (2.0, 15.0)      # below: inversion/drift risk, above: drift
+SPRAY_TEMP_C = (10.0, 30.0)
+SPRAY_HUMIDITY = (40.0, 90.0)
+SPRAY_DAYLIGHT = (6, 18)          # local hours [start, end)
+SPRAY_RAIN_FREE_HOURS = 4
+SPRAY_MIN_RUN = 3                 # consecutive suitable hours that make a usable window
+RAIN_MM = 0.1                     # hourly precipitation counted as rain
+EFFECTIVE_RAIN = 0.8              # share of rainfall available to the crop
+IRRIGATION_DAYS = 3               # horizon of the irrigation_need_3d_mm summary
+
+MAX_INDEX_POINTS = 500            # per /api/weather/indices request
+
+# Open-Meteo is queried with timezone=Asia/Kolkata, so hourly series start at local midnight
+_IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+
+
+def _stack(arrays, width, fill=np.nan, dtype=np.float64):
+    if all(len(arr) == width for arr in arrays):
+        return np.array(arrays, dtype=dtype)
+    out = np.full((len(arrays), width), fill, dtype=dtype)
+    for i, arr in enumerate(arrays):
+        n = min(len(arr), width)
+        out[i, :n] = arr[:n]
+    return out
+
+
+def _hargreaves_et0(tmax, tmin, lat, doy):
+    """FAO-56 Hargreaves reference ET (mm/day), used where Open-Meteo returns no ET0."""
+    phi = np.radians(lat)[:, None]
+    b = 2 * np.pi * doy / 365
+    dr = 1 + 0.033 * np.cos(b)
+    delta = 0.409 * np.sin(b - 1.39)
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1.0, 1.0))
+    ra = (24 * 60 / np.pi) * 0.0820 * dr * (
+        ws * np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.sin(ws))
+    return 0.0023 * 0.408 * ra * ((tmax + tmin) / 2 + 17.8) * np.sqrt(np.clip(tmax - tmin, 0, None))
+
+
+def _window_sum(flags, k):
+    """Sum of flags[:, h:h+k] for every start hour h (windows are cut off at the horizon)."""
+    n = flags.shape[1]
+    c = np.zeros((flags.shape[0], n + 1))
+    np.cumsum(flags, axis=1, out=c[:, 1:])
+    end = np.minimum(np.arange(n) + k, n)
+    return c[:, end] - c[:, :n]
+
+
+def _rounded_rows(arr):
+    """Rows of arr rounded to 0.1 as lists, NaN -> None (rounding done once for the whole matrix)."""
+    rows = np.round(arr, 1).tolist()
+    if np.isnan(arr).any():
+        rows = [[None if v != v else v for v in row] for row in rows]
+    return rows
+
+
+def compute_indices(forecasts, crop=None, now=None):
+    """Indices for a list of services.forecast.Forecast objects, one dict per forecast.
+
+    Per day: growing degree days, heat-stress hours, spray-suitable hours, reference ET0 and
+    irrigation need (Kc * ET0 - effective rain). Plus the first upcoming spray window of
+    SPRAY_MIN_RUN consecutive suitable hours. `now` (naive local time) defaults to the current IST.
+    A forecast without daily rows (upstream sent no "daily" block) gets None.
+    """
+    if not forecasts:
+        return []
+    if not all(f.days for f in forecasts):
+        computed = iter(compute_indices([f for f in forecasts if f.days], crop, now))
+        return [next(computed) if f.days else None for f in forecasts]
+    crop_key = (crop or "").strip().lower()
+    crop_key = crop_key if crop_key in CROP_PARAMS else "default"
+    params = CROP_PARAMS[crop_key]
+    n_loc = len(forecasts)
+    n_days = max(f.days for f in forecasts)
+    n_hours = n_days * 24
+
+    # Daily: GDD and irrigation need
+    tmax = _stack([f.daily["temperature_2m_max"] for f in forecasts], n_days)
+    tmin = _stack([f.daily["temperature_2m_min"] for f in forecasts], n_days)
+    rain = _stack([f.daily["precipitation_sum"] for f in forecasts], n_days)
+    et0 = _stack([f.daily["et0_fao_evapotranspiration"] for f in forecasts], n_days)
+    t_base, t_upper = params["t_base"], params["t_upper"]
+    gdd = (np.clip(tmax, t_base, t_upper) + np.clip(tmin, t_base, t_upper)) / 2 - t_base
+    missing = np.isnan(et0)
+    if missing.any():
+        dates = _stack([f.daily_time for f in forecasts], n_days,
+                       fill=np.datetime64("NaT"), dtype="datetime64[D]")
+        doy = (dates - dates.astype("datetime64[Y]")).astype(np.int64) + 1
+        lat = np.array([f.lat for f in forecasts], dtype=np.float64)
+        et0 = np.where(missing, _hargreaves_et0(tmax, tmin, lat, doy), et0)
+    need = np.clip(params["kc"] * et0 - EFFECTIVE_RAIN * np.nan_to_num(rain), 0, None)
+
+    # Hourly: heat stress and spray suitability (NaN compares False, so missing hours never qualify)
+    temp = _stack([f.hourly["temperature_2m"] for f in forecasts], n_hours)
+    humidity = _stack([f.hourly["relative_humidity_2m"] for f in forecasts], n_hours)
+    wind = _stack([f.hourly["wind_speed_10m"] for f in forecasts], n_hours)
+    hourly_rain = _stack([f.hourly["precipitation"] for f in forecasts], n_hours)
+    heat = (temp >= params["heat_stress"]).reshape(n_loc, n_days, 24).sum(axis=2)
+
+    wet = ~(hourly_rain < RAIN_MM)  # unknown precipitation is treated as rain
+    rain_ahead = _window_sum(wet, SPRAY_RAIN_FREE_HOURS + 1) > 0
+    hour_of_day = np.arange(n_hours) % 24
+    ok = ((hour_of_day >= SPRAY_DAYLIGHT[0]) & (hour_of_day < SPRAY_DAYLIGHT[1]) & ~rain_ahead
+          & (wind >= SPRAY_WIND_KMH[0]) & (wind <= SPRAY_WIND_KMH[1])
+          & (temp >= SPRAY_TEMP_C[0]) & (temp <= SPRAY_TEMP_C[1])
+          & (humidity >= SPRAY_HUMIDITY[0]) & (humidity <= SPRAY_HUMIDITY[1]))
+    spray_hours = ok.reshape(n_loc, n_days, 24).sum(axis=2)
+
+    # First full run of suitable hours that has not started yet
+    now = np.datetime64(now or datetime.datetime.now(_IST).replace(tzinfo=None), "m")
+    starts = np.array([f.hourly_time[0] if len(f.hourly_time) else now for f in forecasts])
+    elapsed = ((now - starts) / np.timedelta64(1, "h")).astype(np.int64)
+    runs = _window_sum(ok, SPRAY_MIN_RUN) >= SPRAY_MIN_RUN
+    runs &= np.arange(n_hours)[None, :] >= elapsed[:, None]
+    has_window = runs.any(axis=1)
+    first_window = runs.argmax(axis=1)
+
+    day_index = np.arange(n_days)
+    days_of = np.array([f.days for f in forecasts])[:, None]
+    gdd_total = np.round(np.nansum(np.where(day_index < days_of, gdd, np.nan), axis=1), 1).tolist()
+    need_3d = np.round(np.nansum(need[:, :IRRIGATION_DAYS], axis=1), 1).tolist()
+    gdd_rows, et0_rows, need_rows = _rounded_rows(gdd), _rounded_rows(et0), _rounded_rows(need)
+    heat_rows, spray_rows = heat.tolist(), spray_hours.tolist()
+
+    results = []
+    for i, f in enumerate(forecasts):
+        d = f.days
+        window = None
+        if has_window[i] and first_window[i] < len(f.hourly_time):
+            window = str(f.hourly_time[first_window[i]])
+        results.append({
+            "crop": crop_key,
+            "days": [str(t) for t in f.daily_time],
+            "gdd": gdd_rows[i][:d],
+            "gdd_total": gdd_total[i],
+            "heat_stress_threshold": params["heat_stress"],
+            "heat_stress_hours": heat_rows[i][:d],
+            "spray_hours": spray_rows[i][:d],
+            "next_spray_window": window,
+            "et0_mm": et0_rows[i][:d],
+            "irrigation_need_mm": need_rows[i][:d],
+            "irrigation_need_3d_mm": need_3d[i],
+        })
+    return results
+
+
+def _load(cell, note_demand=True):
+    try:
+        return get_forecast(*cell, note_demand=note_demand)
+    except (OSError, ValueError) as e:
+        return e
+
+
+def get_agro_indices(points, crop=None, note_demand=True):
+    """Indices for many (lat, lon) points; points in the same grid cell share one forecast.
+
+    Returns one dict per point, in order. Points whose forecast is unavailable get {"error": ...}.
+    note_demand=False leaves the prefetch demand counts alone (the caller already counted them).
+    """
+    point_cells = [grid_cell(lat, lon) for lat, lon in points]
+    cells = list(dict.fromkeys(point_cells))
+    if len(cells) == 1:
+        loaded = {cells[0]: _load(cells[0], note_demand)}
+    else:
+        loaded = dict(zip(cells, executor.map(_load, cells, [note_demand] * len(cells))))
+    good = [c for c in cells if not isinstance(loaded[c], Exception)]
+    by_cell = dict(zip(good, compute_indices([loaded[c] for c in good], crop)))
+    for c in cells:
+        if by_cell.get(c) is None:
+            by_cell[c] = {"error": str(loaded[c]) if c not in by_cell else "Forecast has no daily data"}
+    return [by_cell[c] for c in point_cells]
@@ -0,0 +1,221 @@
+# Bulk advisory generation for SMS campaigns: one localized advisory per registered farmer
+# Input: CSV (or Parquet, with pyarrow installed) with id, lat, lon, state, lang, crop columns; state,
+# lang and crop may be blank. The file is read BULK_CHUNK_ROWS farmers at a time, so memory stays
+# bounded whatever its size.
+#
+# Per chunk the parent groups farmers by weather grid cell and gets each cell's forecast once: from
+# the forecast cache if an earlier chunk (or the shared tier) has it, else in multi-location
+# Open-Meteo requests rate limited like the prefetcher. Cell-grouped tasks go to a process pool. A
+# worker computes agro indices for its cells in one vectorized pass per crop and renders each
+# distinct (cell, language, crop, state) message once through the translation layer; every farmer
+# sharing it only costs an output row. Output rows (id, lang, text) are written as tasks complete,
+# so not in input order: CSV, or JSON lines for a .jsonl output path.
+#
+# Usage: python -m services.bulk_advisory farmers.csv advisories.csv [--workers N]
+
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from config import DEFAULT_LANGUAGE
+from language_middleware import negotiate
+from services.advisory import compose_advisory
+from services.agro_indices import compute_indices
+from services.regions import resolve_regions
+from services.soil import get_soil_advisory
+from services.weather import get_forecasts, snap_to_grid, weather_cache_stats
+from services.weather_prefetch import PREFETCH_BATCH, PREFETCH_RATE, RateLimiter
+from translations import build_translation_index
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # optional: Parquet input
+    pq = None
+
+BULK_CHUNK_ROWS = int(os.environ.get("BULK_CHUNK_ROWS", "100000"))   # farmers read per chunk
+BULK_TASK_ROWS = int(os.environ.get("BULK_TASK_ROWS", "5000"))       # farmers per worker task
+FIELDS = ("id", "lat", "lon", "state", "lang", "crop")
+
+
+def _records(path):
+    """Farmer dicts from a CSV or Parquet file, streamed."""
+    if str(path).endswith(".parquet"):
+        if pq is None:
+            raise ValueError("Parquet input needs pyarrow (pip install pyarrow)")
+        parquet = pq.ParquetFile(path)
+        columns = [name for name in FIELDS if name in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=10000, columns=columns):
+            yield from batch.to_pylist()
+        return
+    with open(path, encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def read_chunks(path, chunk_rows=BULK_CHUNK_ROWS):
+    """(farmers, skipped) per chunk; a farmer is (id, lat, lon, state, lang, crop, cell).
+
+    Rows without valid coordinates are skipped; unsupported or blank languages fall back to
+    DEFAULT_LANGUAGE (regional tags like hi-IN are matched as Accept-Language is).
+    """
+    rows, skipped = [], 0
+    for rec in _records(path):
+        try:
+            lat, lon = float(rec["lat"]), float(rec["lon"])
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+            continue
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            skipped += 1
+            continue
+        lang = negotiate(str(rec.get("lang") or "")[:32]) or DEFAULT_LANGUAGE
+        rows.append((str(rec.get("id") or ""), lat, lon, (rec.get("state") or "").strip(), lang,
+                     (rec.get("crop") or "").strip() or None, snap_to_grid(lat, lon)))
+        if len(rows) >= chunk_rows:
+            yield rows, skipped
+            rows, skipped = [], 0
+    if rows or skipped:
+        yield rows, skipped
+
+
+def _tasks(by_cell, forecasts, task_rows):
+    """Split one chunk into (farmers, {cell: Forecast or None}) tasks along cell boundaries."""
+    rows, cells = [], {}
+    for cell, farmers in by_cell.items():
+        forecast = forecasts.get(cell)
+        cells[cell] = None if isinstance(forecast, Exception) else forecast
+        rows.extend(farmers)
+        if len(rows) >= task_rows:
+            yield rows, cells
+            rows, cells = [], {}
+    if rows:
+        yield rows, cells
+
+
+# ---------- worker side ----------
+
+def _init_worker():
+    build_translation_index()
+
+
+def render_task(farmers, forecasts, fmt="csv"):
+    """Output rows for one task as text, plus counts. Runs in a pool worker."""
+    # States left blank are resolved from the coordinates in one vectorized lookup
+    blank = [i for i, f in enumerate(farmers) if not f[3]]
+    states = {}
+    if blank:
+        for i, region in zip(blank, resolve_regions([(farmers[i][1], farmers[i][2]) for i in blank])):
+            states[i] = region["state"] if region else ""
+
+    cells_by_crop = {}
+    for f in farmers:
+        if forecasts.get(f[6]) is not None:
+            cells_by_crop.setdefault(f[5], {})[f[6]] = None
+    indices = {}
+    for crop, cells in cells_by_crop.items():
+        for cell, result in zip(cells, compute_indices([forecasts[c] for c in cells], crop)):
+            indices[(cell, crop)] = result
+
+    messages = {}
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    for i, (farmer_id, _, _, state, lang, crop, cell) in enumerate(farmers):
+        state = states.get(i, state)
+        key = (cell, lang, crop, state.lower())
+        text = messages.get(key)
+        if text is None:
+            forecast = forecasts.get(cell)
+            weather = {"current": forecast.current} if forecast is not None else {}
+            soil = get_soil_advisory(state=state or None, lang=lang, crop=crop)
+            text = messages[key] = compose_advisory(lang, weather, indices.get((cell, crop)), soil, crop)
+        if writer is not None:
+            writer.writerow((farmer_id, lang, text))
+        else:
+            buf.write(json.dumps({"id": farmer_id, "lang": lang, "text": text}, ensure_ascii=False) + "\n")
+    return buf.getvalue(), {"farmers": len(farmers), "messages": len(messages),
+                            "no_weather": sum(1 for f in farmers if forecasts.get(f[6]) is None)}
+
+
+# ---------- parent side ----------
+
+def run(input_path, output_path, workers=None, chunk_rows=BULK_CHUNK_ROWS, task_rows=BULK_TASK_ROWS,
+        rate_per_minute=PREFETCH_RATE, progress=None):
+    """Generate advisories for every farmer in input_path into output_path; returns the run's counts.
+
+    rate_per_minute caps Open-Meteo locations fetched; progress(stats) is called after each chunk.
+    """
+    workers = workers or os.cpu_count() or 1
+    fmt = "jsonl" if str(output_path).endswith(".jsonl") else "csv"
+    limiter = RateLimiter(rate_per_minute, burst=PREFETCH_BATCH)
+    fetched_before = weather_cache_stats()["misses"]
+    stats = {"farmers": 0, "skipped": 0, "cells": 0, "messages": 0, "no_weather": 0, "chunks": 0}
+    seen_cells = set()
+    started = time.perf_counter()
+
+    def collect(done, out):
+        for future in done:
+            text, counts = future.result()
+            out.write(text)
+            for name, n in counts.items():
+                stats[name] += n
+
+    # spawn: the parent may hold service threads, which fork would copy mid-state
+    context = multiprocessing.get_context("spawn")
+    with open(output_path, "w", encoding="utf-8", newline="") as out, \
+            ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker) as pool:
+        if fmt == "csv":
+            out.write("id,lang,text\r\n")
+        pending = set()
+        for farmers, skipped in read_chunks(input_path, chunk_rows):
+            stats["skipped"] += skipped
+            stats["chunks"] += 1
+            by_cell = {}
+            for f in farmers:
+                by_cell.setdefault(f[6], []).append(f)
+            seen_cells.update(by_cell)
+            stats["cells"] = len(seen_cells)
+            forecasts = get_forecasts(list(by_cell), PREFETCH_BATCH, limiter)
+            for rows, cells in _tasks(by_cell, forecasts, task_rows):
+                # At most two tasks per worker in flight: bounded memory however large the input
+                while len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done, out)
+                pending.add(pool.submit(render_task, rows, cells, fmt))
+            if progress is not None:
+                progress(dict(stats))
+        collect(pending, out)
+    seconds = time.perf_counter() - started
+    stats.update(
+        forecasts_fetched=weather_cache_stats()["misses"] - fetched_before,
+        seconds=round(seconds, 3),
+        farmers_per_sec=round(stats["farmers"] / seconds, 1) if seconds else 0.0,
+        workers=workers,
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate one localized advisory per farmer (SMS campaigns).")
+    parser.add_argument("input", help="CSV or .parquet with id, lat, lon, state, lang, crop columns")
+    parser.add_argument("output", help="CSV, or JSON lines if it ends in .jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=BULK_CHUNK_ROWS)
+    parser.add_argument("--task-rows", type=int, default=BULK_TASK_ROWS)
+    parser.add_argument("--rate", type=float, default=PREFETCH_RATE, help="Open-Meteo locations per minute")
+    args = parser.parse_args()
+
+    def progress(stats):
+        print(f"\r{stats['farmers']:,} farmers rendered, {stats['cells']:,} cells", end="", file=sys.stderr)
+
+    stats = run(args.input, args.output, args.workers, args.chunk_rows, args.task_rows, args.rate, progress)
+    print(file=sys.stderr)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# In-process TTL cache: LRU eviction, memory cap, single-flight loads, stale-while-revalidate
+# Used for upstream data (Open-Meteo forecasts etc.) so concurrent requests share one fetch.
+# Optionally backed by a shared tier (services.cache_backends.SharedCache): a miss first looks for
+# a fresh entry another worker stored there, and every load is written through to it.
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def _approx_size(value):
+    """Rough byte size of a JSON-like value (serialized length); used for the memory cap."""
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "size")
+
+    def __init__(self, value, stored_at, size):
+        self.value = value
+        self.stored_at = stored_at
+        self.size = size
+
+
+class _Flight:
+    """One in-progress load; waiters block on the event and read value/error."""
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Thread-safe cache.
+
+    - Entries younger than `ttl` are fresh and returned directly (hit).
+    - Entries older than `ttl` but younger than `ttl + stale_ttl` are returned immediately
+      and refreshed in a background thread (stale-while-revalidate).
+    - Missing/expired keys are loaded once per key no matter how many callers ask (single-flight).
+    - Least recently used entries are evicted beyond `max_entries` or `max_bytes`.
+    - With `shared`, loads check and fill the shared tier (an entry keeps its original age);
+      on_load(key, value) runs after every successful load, whichever tier it came from.
+    """
+
+    def __init__(self, ttl, stale_ttl=0, max_entries=1024, max_bytes=16 * 1024 * 1024, sizeof=_approx_size,
+                 shared=None, on_load=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self.shared = shared
+        self._on_load = on_load
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "coalesced": 0,
+                       "refreshes": 0, "load_errors": 0, "evictions": 0, "shared_hits": 0}
+
+    def get_or_load(self, key, loader):
+        """Return cached value for key, calling loader() (at most once concurrently) if needed.
+
+        loader() must raise on failure; failures are never cached. If a stale value exists
+        and the refresh fails, the stale value keeps being served until it expires fully.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["stale"] += 1
+                    if key not in self._inflight:
+                        flight = self._inflight[key] = _Flight()
+                        self._stats["refreshes"] += 1
+                        threading.Thread(target=self._run_load, args=(key, loader, flight),
+                                         daemon=True).start()
+                    return entry.value
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = self._inflight[key] = _Flight()
+                owner = True
+                self._stats["misses"] += 1
+            else:
+                owner = False
+                self._stats["coalesced"] += 1
+        if owner:
+            self._run_load(key, loader, flight)
+        else:
+            flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _run_load(self, key, loader, flight):
+        age = 0.0
+        try:
+            held = self.shared_lookup(key)
+            if held is not None:
+                flight.value, age = held
+            else:
+                flight.value = loader()
+                self._share([(key, flight.value)])
+            if self._on_load is not None:
+                self._on_load(key, flight.value)
+        except Exception as e:  # propagated to every waiter
+            flight.error = e
+        with self._lock:
+            if flight.error is None:
+                if age:
+                    self._stats["shared_hits"] += 1
+                self._put_locked(key, flight.value, age)
+            else:
+                self._stats["load_errors"] += 1
+            self._inflight.pop(key, None)
+        flight.event.set()
+
+    def lookup(self, key):
+        """Non-loading read: (value, "fresh" | "stale") or (None, None). Does not count stats."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            age = time.monotonic() - entry.stored_at
+            if age < self.ttl:
+                return entry.value, "fresh"
+            if age < self.ttl + self.stale_ttl:
+                return entry.value, "stale"
+            return None, None
+
+    def age(self, key):
+        """Seconds since key was stored, or None if it is not held."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return time.monotonic() - entry.stored_at if entry is not None else None
+
+    def peek(self, key):
+        """Last stored value for key regardless of age (None if never stored or evicted)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def shared_lookup(self, key):
+        """(value, age) of a still-fresh entry in the shared tier, else None."""
+        return self.shared_lookup_many([key]).get(key)
+
+    def shared_lookup_many(self, keys):
+        """{key: (value, age)} for the keys with a still-fresh entry in the shared tier (one batch read)."""
+        if self.shared is None:
+            return {}
+        now = time.time()
+        out = {}
+        for key, (stored_at, value) in self.shared.get_many(keys).items():
+            age = max(now - stored_at, 1e-6)
+            if age < self.ttl:
+                out[key] = (value, age)
+        return out
+
+    def _share(self, items):
+        if self.shared is not None:
+            now = time.time()
+            self.shared.set_many([(key, (now, value)) for key, value in items], self.ttl)
+
+    def set(self, key, value, age=0.0):
+        """Store a value; a new one (age 0) is also written to the shared tier."""
+        if not age:
+            self._share([(key, value)])
+        with self._lock:
+            self._put_locked(key, value, age)
+
+    def set_many(self, items):
+        """Store new values for several keys (one shared-tier round trip)."""
+        items = list(items)
+        self._share(items)
+        with self._lock:
+            for key, value in items:
+                self._put_locked(key, value)
+
+    def _put_locked(self, key, value, age=0.0):
+        size = self._sizeof(value)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._entries[key] = _Entry(value, time.monotonic() - age, size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._stats["evictions"] += 1
+
+    def record(self, stat, n=1):
+        """Count an event for callers that use lookup()/set() directly (e.g. the async path)."""
+        with self._lock:
+            self._stats[stat] = self._stats.get(stat, 0) + n
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out["entries"] = len(self._entries)
+            out["bytes"] = self._bytes
+            out["inflight"] = len(self._inflight)
+        return out
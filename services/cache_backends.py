@@ -0,0 +1,519 @@
+# Pluggable byte-value cache backends and the shared cache tier built on them
+# - MemoryBackend: per-process LRU (bytes, expiry, byte cap)
+# - SharedDirBackend: one file per entry in a tmpfs directory, shared by every worker on the host
+# - RespBackend: Redis-protocol client (GET/MGET/SET PX, pipelined bulk writes), shared across hosts
+# All have get / get_many / set / add / set_many / clear / stats. response_cache stores its serialized
+# responses in one directly; SharedCache stores Python objects (pickled, so a hit does not re-parse
+# JSON or recompile anything) for translations, weather forecasts and mandi queries.
+
+import hashlib
+import logging
+import os
+import pickle
+import socket
+import stat
+import struct
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+
+from config import CACHE_BACKEND, CACHE_DIR, CACHE_MAX_MB, CACHE_PREFIX, CACHE_URL
+from services.metrics import stage
+
+_log = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Base: bulk operations as loops; `shared` says whether other processes see the entries."""
+    shared = False
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items, ttl):
+        for key, value in items:
+            self.set(key, value, ttl)
+
+    def add(self, key, value, ttl):
+        """Set only if the key is absent; True if set (None: the backend is unavailable)."""
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, ttl)
+        return True
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU of bytes values with expiry and a byte cap."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= time.time():
+                return False
+            self._put(key, value, ttl)
+            return True
+
+    def _put(self, key, value, ttl):
+        self._drop(key)
+        self._entries[key] = (time.time() + ttl, value)
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries), "bytes": self._bytes}
+
+
+class SharedDirBackend(CacheBackend):
+    """One file per entry (8-byte expiry + value) in a directory shared by all workers.
+
+    On tmpfs (/dev/shm) the files live in memory once for the whole host. Writes go through a
+    temp file and rename, so readers never see a partial entry. Every `sweep_every` writes a
+    worker drops expired entries and trims the oldest beyond max_bytes.
+
+    SharedCache unpickles what it reads here, so the directory must be private to the service
+    user: it is created 0700, and an existing one that is a symlink, owned by someone else or
+    writable by group/others is refused with PermissionError.
+    """
+    shared = True
+
+    def __init__(self, directory, max_bytes, sweep_every=256):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sweep_every = sweep_every
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        st = os.lstat(directory)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & 0o022:
+            raise PermissionError(f"cache directory {directory} must be a directory owned by this user "
+                                  "and not writable by group or others")
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < 8 or struct.unpack(">d", data[:8])[0] < time.time():
+            return None
+        return data[8:]
+
+    def set(self, key, value, ttl):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(struct.pack(">d", time.time() + ttl) + value)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % self.sweep_every == 0
+        if sweep:
+            self.sweep()
+
+    def add(self, key, value, ttl):
+        """Set if absent: the entry is hard-linked into place, which fails if another worker's is there."""
+        path = self._path(key)
+        if self.get(key) is None:
+            try:
+                os.unlink(path)     # expired (a live entry would have been read)
+            except OSError:
+                pass
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(struct.pack(">d", time.time() + ttl) + value)
+            os.link(tmp, path)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            return None
+        finally:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def _files(self):
+        out = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                out.append((st.st_mtime, st.st_size, entry.path))
+        return out
+
+    def sweep(self):
+        now = time.time()
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            expired = False
+            try:
+                with open(path, "rb") as f:
+                    head = f.read(8)
+                expired = len(head) < 8 or struct.unpack(">d", head)[0] < now
+            except OSError:
+                continue
+            if expired or total > self.max_bytes:
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        for _, _, path in self._files():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        files = self._files()
+        return {"backend": "shm", "directory": self.directory, "entries": len(files),
+                "bytes": sum(size for _, size, _ in files)}
+
+
+# ---------- Redis protocol (RESP2) ----------
+
+class RespError(Exception):
+    """Error reply from the server (the connection itself is fine)."""
+
+
+def encode_command(*args):
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+def read_reply(f):
+    """One reply from a buffered binary stream; error replies are returned as RespError."""
+    line = f.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed by the cache server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"$":
+        n = int(rest)
+        if n < 0:
+            return None
+        data = f.read(n + 2)
+        if len(data) != n + 2:
+            raise ConnectionError("connection closed by the cache server")
+        return data[:-2]
+    if kind == b"+":
+        return rest
+    if kind == b":":
+        return int(rest)
+    if kind == b"*":
+        n = int(rest)
+        return None if n < 0 else [read_reply(f) for _ in range(n)]
+    if kind == b"-":
+        return RespError(rest.decode("utf-8", "replace"))
+    raise ConnectionError(f"unexpected reply from the cache server: {line[:32]!r}")
+
+
+class _Connection:
+    __slots__ = ("sock", "file")
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile("rb")
+
+    def execute(self, commands):
+        """Send every command in one write, then read one reply per command (pipelining)."""
+        self.sock.sendall(b"".join(encode_command(*c) for c in commands))
+        return [read_reply(self.file) for _ in commands]
+
+    def close(self):
+        try:
+            self.file.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RespBackend(CacheBackend):
+    """Client for a Redis-compatible server: redis://[:password@]host[:port][/db].
+
+    One connection per thread. Keys get `prefix`. A cache server that is down or slow never fails
+    a request: operations return misses and skip writes, and the server is not retried for
+    `retry_after` seconds.
+    """
+    shared = True
+    # Keys per MGET / SET pipeline
+    BATCH = 500
+
+    def __init__(self, url, prefix="", timeout=0.5, retry_after=5.0):
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int((parsed.path or "/0").strip("/") or 0)
+        self.password = parsed.password
+        self.prefix = prefix
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._local = threading.local()
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"round_trips": 0, "commands": 0, "errors": 0, "connects": 0}
+
+    def _connect(self):
+        conn = _Connection(self.host, self.port, self.timeout)
+        setup = ([("AUTH", self.password)] if self.password else []) + ([("SELECT", self.db)] if self.db else [])
+        for reply in conn.execute(setup) if setup else ():
+            if isinstance(reply, RespError):
+                conn.close()
+                raise ConnectionError(f"cache server refused the connection: {reply}")
+        with self._lock:
+            self._stats["connects"] += 1
+        return conn
+
+    def execute(self, commands):
+        """Replies for a pipeline of commands, or None when the server is unavailable."""
+        if not commands or time.monotonic() < self._down_until:
+            return None
+        conn = getattr(self._local, "conn", None)
+        try:
+            if conn is None:
+                conn = self._local.conn = self._connect()
+            replies = conn.execute(commands)
+        except (OSError, ValueError):
+            if conn is not None:
+                conn.close()
+            self._local.conn = None
+            self._down_until = time.monotonic() + self.retry_after
+            with self._lock:
+                self._stats["errors"] += 1
+            return None
+        with self._lock:
+            self._stats["round_trips"] += 1
+            self._stats["commands"] += len(commands)
+        return replies
+
+    def get(self, key):
+        replies = self.execute([("GET", self.prefix + key)])
+        value = replies[0] if replies else None
+        return value if isinstance(value, bytes) else None
+
+    def get_many(self, keys):
+        keys = list(keys)
+        out = []
+        for i in range(0, len(keys), self.BATCH):
+            batch = keys[i:i + self.BATCH]
+            replies = self.execute([("MGET", *(self.prefix + k for k in batch))])
+            values = replies[0] if replies and isinstance(replies[0], list) else [None] * len(batch)
+            out.extend(v if isinstance(v, bytes) else None for v in values)
+        return out
+
+    def set(self, key, value, ttl):
+        self.execute([("SET", self.prefix + key, value, "PX", max(int(ttl * 1000), 1))])
+
+    def add(self, key, value, ttl):
+        replies = self.execute([("SET", self.prefix + key, value, "PX", max(int(ttl * 1000), 1), "NX")])
+        return None if replies is None else replies[0] == b"OK"
+
+    def set_many(self, items, ttl):
+        px = max(int(ttl * 1000), 1)
+        commands = [("SET", self.prefix + key, value, "PX", px) for key, value in items]
+        for i in range(0, len(commands), self.BATCH):
+            self.execute(commands[i:i + self.BATCH])
+
+    def clear(self):
+        """Delete this backend's keys (those under its prefix) with SCAN + DEL."""
+        cursor = b"0"
+        while True:
+            replies = self.execute([("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 1000)])
+            if not replies or not isinstance(replies[0], list):
+                return
+            cursor, keys = replies[0]
+            if keys:
+                self.execute([("DEL", *keys)])
+            if cursor in (b"0", 0):
+                return
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+        out.update(backend="resp", server=f"{self.host}:{self.port}/{self.db}",
+                   available=time.monotonic() >= self._down_until)
+        return out
+
+
+def make_backend(kind, directory, max_bytes, url=CACHE_URL, prefix=CACHE_PREFIX):
+    """Backend for a CACHE_BACKEND-style name; 'shm' falls back to memory if the directory is unusable."""
+    if kind == "resp":
+        return RespBackend(url, prefix)
+    if kind == "shm":
+        try:
+            return SharedDirBackend(directory, max_bytes)
+        except OSError as e:
+            _log.warning("shm cache unavailable, using per-process memory: %s", e)
+    return MemoryBackend(max_bytes)
+
+
+# ---------- shared object cache ----------
+
+class SharedCache:
+    """One namespace of the shared backend holding Python objects.
+
+    Values are pickled (protocol 5: NumPy forecast arrays go out as raw buffers), so a hit costs an
+    unpickle rather than a JSON parse or a recompute. Entries a newer or older deploy cannot unpickle
+    count as misses.
+    """
+
+    def __init__(self, backend, namespace):
+        self.backend = backend
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "bytes_read": 0, "bytes_written": 0, "errors": 0}
+
+    @property
+    def shared(self):
+        return self.backend.shared
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _count(self, **counts):
+        with self._lock:
+            for stat, n in counts.items():
+                self._stats[stat] += n
+
+    def _decode(self, data):
+        try:
+            return pickle.loads(data)
+        except Exception:  # stale class layout, truncated entry, ...
+            self._count(errors=1)
+            return None
+
+    def get(self, key):
+        with stage("cache.shared"):
+            data = self.backend.get(self._key(key))
+            if data is None:
+                self._count(misses=1)
+                return None
+            value = self._decode(data)
+        if value is None:
+            self._count(misses=1)
+        else:
+            self._count(hits=1, bytes_read=len(data))
+        return value
+
+    def get_many(self, keys):
+        """{key: value} for the keys held; one round trip on the Redis backend."""
+        keys = list(keys)
+        out = {}
+        read = 0
+        with stage("cache.shared"):
+            for key, data in zip(keys, self.backend.get_many([self._key(k) for k in keys])):
+                if data is not None:
+                    value = self._decode(data)
+                    if value is not None:
+                        out[key] = value
+                        read += len(data)
+        self._count(hits=len(out), misses=len(keys) - len(out), bytes_read=read)
+        return out
+
+    def set(self, key, value, ttl):
+        self.set_many([(key, value)], ttl)
+
+    def set_many(self, items, ttl):
+        encoded = [(self._key(key), pickle.dumps(value, protocol=5)) for key, value in items]
+        with stage("cache.shared"):
+            if len(encoded) == 1:
+                self.backend.set(encoded[0][0], encoded[0][1], ttl)
+            else:
+                self.backend.set_many(encoded, ttl)
+        self._count(stored=len(encoded), bytes_written=sum(len(v) for _, v in encoded))
+
+    def lease(self, key, owner, seconds):
+        """Claim or renew the lease `key` for `owner` unless another live holder has it; True if held.
+
+        Keeps a periodic job to one worker of those sharing the backend. Taking a free lease is
+        atomic (SET NX, or a hard link on shm); a renewal racing the lease's expiry can leave two
+        holders for one term, which only duplicates that term's work. A backend that cannot answer
+        counts as held, so the job falls back to every worker rather than none.
+        """
+        key, token = self._key(key), owner.encode("utf-8")
+        taken = self.backend.add(key, token, seconds)
+        if taken is None or taken:
+            return True
+        if self.backend.get(key) != token:
+            return False
+        self.backend.set(key, token, seconds)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+backend = make_backend(CACHE_BACKEND, CACHE_DIR, int(CACHE_MAX_MB * 1024 * 1024))
+_namespaces = {}
+
+
+def shared_cache(namespace):
+    """The SharedCache for a namespace (one per name per process)."""
+    cache = _namespaces.get(namespace)
+    if cache is None:
+        cache = _namespaces.setdefault(namespace, SharedCache(backend, namespace))
+    return cache
+
+
+def cache_backend_stats():
+    out = backend.stats()
+    out["namespaces"] = {name: cache.stats() for name, cache in _namespaces.items()}
+    return out
@@ -0,0 +1,89 @@
+# Batch chatbot replies for SMS/IVR gateways
+# Messages are classified up front and grouped by intent so upstream data is fetched once per batch
+# (one weather fetch per grid cell, one mandi fetch), and replies are yielded as soon as their data is ready.
+
+from concurrent.futures import as_completed
+
+from config import LANGUAGE_CODES, DEFAULT_LANGUAGE
+from services.chatbot_engine import render_reply
+from services.intent_matcher import classify_intent
+from services.mandi import fetch_mandi
+from services.pool import executor
+from services.weather import coordinate, fetch_weather, snap_to_grid
+
+MAX_BATCH_ITEMS = 1000
+
+
+def _coord(value):
+    try:
+        return coordinate(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_items(items, default_lang=DEFAULT_LANGUAGE):
+    """Validate raw {message, lang, lat, lon} dicts; invalid languages fall back to default_lang."""
+    out = []
+    for raw in items:
+        raw = raw if isinstance(raw, dict) else {}
+        lang = str(raw.get("lang") or "").strip()
+        out.append({
+            "message": str(raw.get("message") or "").strip(),
+            "lang": lang if lang in LANGUAGE_CODES else default_lang,
+            "lat": _coord(raw.get("lat")),
+            "lon": _coord(raw.get("lon")),
+        })
+    return out
+
+
+def _result(index, item, intent, reply):
+    return {"index": index, "intent": intent, "reply": reply, "language": item["lang"]}
+
+
+def iter_batch_replies(items):
+    """Yield one result dict per item (with its "index"), in completion order.
+
+    Upstream fetches are submitted before the first reply is yielded, so they run while a slow
+    consumer is still taking the immediate replies.
+    """
+    weather_groups = {}
+    mandi_group = []
+    immediate = []
+    for index, item in enumerate(items):
+        intent = classify_intent(item["message"])
+        if intent == "weather":
+            if item["lat"] is not None and item["lon"] is not None:
+                cell = snap_to_grid(item["lat"], item["lon"])
+            else:
+                cell = None  # fetch_weather's configured default location
+            weather_groups.setdefault(cell, []).append(index)
+        elif intent == "mandi":
+            mandi_group.append(index)
+        else:
+            immediate.append((index, intent))
+
+    futures = {}
+    if mandi_group:
+        futures[executor.submit(fetch_mandi, limit=5)] = ("mandi", mandi_group)
+    for cell, indices in weather_groups.items():
+        lat, lon = cell if cell else (None, None)
+        futures[executor.submit(fetch_weather, lat=lat, lon=lon)] = ("weather", indices)
+
+    # No upstream data needed: answer while the fetches are in flight
+    for index, intent in immediate:
+        item = items[index]
+        yield _result(index, item, intent, render_reply(intent, item["lang"]))
+
+    for future in as_completed(futures):
+        intent, indices = futures[future]
+        try:
+            data = future.result()
+        except Exception as e:
+            data = {"error": str(e)} if intent == "weather" else {"prices": []}
+        for index in indices:
+            item = items[index]
+            if intent == "weather":
+                reply = render_reply(intent, item["lang"], weather=data)
+            else:
+                reply = render_reply(intent, item["lang"], mandi=data)
+            yield _result(index, item, intent, reply)
@@ -4,30 +4,30 @@ from services.weather import fetch_weather
 from services.mandi import fetch_mandi
 from services.schemes import get_schemes
 from services.soil import get_soil_advisory
+from services.intent_matcher import classify_intent
 from translations import get_translation, translate_crop
 
 
-def _normalize(msg):
-    return (msg or "").strip().lower()
+def get_chatbot_reply(message: str, lang: str, lat=None, lon=None) -> str:
+    return render_reply(classify_intent(message), lang, lat=lat, lon=lon)
 
 
-def _matches(msg, *keywords):
-    m = _normalize(msg)
-    return any(k in m for k in keywords)
+def render_reply(intent, lang, lat=None, lon=None, weather=None, mandi=None) -> str:
+    """Reply text for an already classified intent.
 
-
-def get_chatbot_reply(message: str, lang: str) -> str:
-    msg = _normalize(message)
-    if not msg:
+    weather / mandi may carry prefetched fetch_weather / fetch_mandi results (batch mode);
+    otherwise they are fetched here.
+    """
+    if intent is None:
         return get_translation(lang, "chatbot", "default_reply")
 
     # Greeting / help
-    if _matches(msg, "hi", "hello", "namaste", "hey", "help", "start", "kaise", "कैसे", "नमस्ते"):
+    if intent == "greeting":
         return get_translation(lang, "chatbot", "help_prompt")
 
     # Weather
-    if _matches(msg, "weather", "mausam", "मौसम", "तापमान", "temperature", "barish", "बारिश", "rain"):
-        data = fetch_weather()
+    if intent == "weather":
+        data = weather if weather is not None else fetch_weather(lat=lat, lon=lon)
         prefix = get_translation(lang, "chatbot", "weather_reply")
         if data.get("error"):
             return prefix + get_translation(lang, "common", "messages.error")
@@ -45,8 +45,8 @@ def get_chatbot_reply(message: str, lang: str) -> str:
         return prefix + (", ".join(parts) if parts else get_translation(lang, "common", "messages.no_data"))
 
     # Mandi / prices
-    if _matches(msg, "mandi", "bhav", "भाव", "price", "कीमत", "market", "मंडी"):
-        out = fetch_mandi(limit=5)
+    if intent == "mandi":
+        out = mandi if mandi is not None else fetch_mandi(limit=5)
         prefix = get_translation(lang, "chatbot", "mandi_reply")
         prices = out.get("prices") or []
         if not prices:
@@ -60,19 +60,19 @@ def get_chatbot_reply(message: str, lang: str) -> str:
         return prefix + ("; ".join(lines) if lines else get_translation(lang, "common", "messages.no_data"))
 
     # Schemes
-    if _matches(msg, "scheme", "yojana", "योजना", "pm kisan", "kcc", "bima", "बीमा", "insurance"):
+    if intent == "schemes":
         schemes = get_schemes(lang=lang)
         return get_translation(lang, "chatbot", "schemes_reply")
 
     # Soil
-    if _matches(msg, "soil", "mitti", "मिट्टी", "मृदा", "soil health", "npk"):
+    if intent == "soil":
         data = get_soil_advisory(lang=lang)
         prefix = get_translation(lang, "chatbot", "soil_reply")
         summary = (data or {}).get("summary", "")
         return prefix + (summary or get_translation(lang, "common", "messages.no_data"))
 
     # Pest / crop
-    if _matches(msg, "pest", "keet", "कीट", "disease", "रोग", "crop", "fasal", "फसल", "photo", "फोटो"):
+    if intent == "pest":
         return get_translation(lang, "chatbot", "pest_tip")
 
     return get_translation(lang, "chatbot", "default_reply")
@@ -0,0 +1,94 @@
+# Composite dashboard payload: all cards in one response
+# Sources run concurrently; each has its own deadline measured from the start of the request,
+# so total latency is bounded by the slowest deadline rather than the sum of all sources.
+
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from services.pool import executor
+from services.weather import fetch_weather
+from services.mandi import fetch_mandi
+from services.schemes import get_schemes
+from services.soil import get_soil_advisory
+from services.satellite import get_satellite_info
+from services.advisory import get_advisory
+from services.regions import fill_region
+from translations import get_translation, translate_crop
+
+# Seconds each source may take before its section is returned as an error marker
+SOURCE_DEADLINES = {
+    "weather": float(os.environ.get("DASHBOARD_WEATHER_DEADLINE", "4")),
+    "mandi": float(os.environ.get("DASHBOARD_MANDI_DEADLINE", "5")),
+    "schemes": float(os.environ.get("DASHBOARD_SCHEMES_DEADLINE", "1")),
+    "soil": float(os.environ.get("DASHBOARD_SOIL_DEADLINE", "1")),
+    "satellite": float(os.environ.get("DASHBOARD_SATELLITE_DEADLINE", "1")),
+}
+
+
+def localize_weather(data, lang):
+    """Add the translated condition label (sunny/cloudy/rainy/stormy) to a fetch_weather result."""
+    if data.get("current"):
+        cond = data["current"].get("condition", "")
+        data["current"]["condition_label"] = get_translation(lang, "common", f"weather.conditions.{cond}")
+    return data
+
+
+def localize_mandi(out, lang):
+    prices = out.get("prices", [])
+    for p in prices:
+        p["commodity_local"] = translate_crop(p.get("commodity", ""), lang)
+    out["prices"] = prices
+    return out
+
+
+def localize_satellite(info, lang):
+    key = "description_hi" if lang == "hi" else "description_en"
+    info["description"] = info.get(key, info["description_en"])
+    return info
+
+
+def get_dashboard(lang, lat=None, lon=None, state=None, mandi_limit=10):
+    started = time.monotonic()
+    # Resolve the region once here rather than in each card
+    state, district = fill_region(state, None, lat, lon)
+    futures = {
+        "weather": executor.submit(fetch_weather, lat=lat, lon=lon),
+        "mandi": executor.submit(fetch_mandi, limit=mandi_limit),
+        "schemes": executor.submit(get_schemes, lang=lang),
+        "soil": executor.submit(get_soil_advisory, state=state, district=district, lang=lang),
+        "satellite": executor.submit(get_satellite_info, lat=lat, lon=lon, state=state, district=district),
+    }
+    results = {}
+    errors = {}
+    for name, future in futures.items():
+        remaining = SOURCE_DEADLINES[name] - (time.monotonic() - started)
+        try:
+            results[name] = future.result(timeout=max(remaining, 0))
+        except FutureTimeout:
+            errors[name] = "timeout"
+        except Exception as e:
+            errors[name] = str(e) or e.__class__.__name__
+
+    out = {}
+    weather = results.get("weather")
+    if weather is not None and weather.get("error"):
+        errors["weather"] = weather["error"]
+    if weather is not None:
+        out["weather"] = localize_weather(weather, lang)
+    if "mandi" in results:
+        out["mandi"] = localize_mandi(results["mandi"], lang)
+    if "schemes" in results:
+        out["schemes"] = {"schemes": results["schemes"]}
+    if "soil" in results:
+        out["soil"] = results["soil"]
+    if "satellite" in results:
+        out["satellite"] = localize_satellite(results["satellite"], lang)
+    # Advisory reuses the weather result above instead of fetching it a second time
+    out["advisory"] = get_advisory(lang=lang, lat=lat, lon=lon, state=state, district=district,
+                                   weather=weather if weather is not None else {})
+    out["region"] = {"state": state, "district": district}
+    for name, reason in errors.items():
+        out.setdefault(name, {"error": reason})
+    out["errors"] = errors
+    return out
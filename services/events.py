@@ -0,0 +1,295 @@
+# Live mandi price and weather alerts for server-sent event clients (GET /api/events, ASGI mode)
+# Mandi: only one worker runs the sync, so every worker checks the store's data version every
+# MANDI_EVENTS_POLL seconds; when it moves, markets whose modal price moved by MANDI_ALERT_PCT or more
+# are published to that worker's clients. Weather: when a grid cell's refreshed forecast turns
+# 'stormy' (from any other condition), that cell is alerted. Subscribed cells are handed to the
+# prefetch scheduler, so weather alerts need WEATHER_PREFETCH_INTERVAL > 0 (without it a cell is only
+# refreshed by requests for it). Nothing is polled per client.
+#
+# Subscribers are asyncio queues on the serving event loop(s), indexed by commodity and by grid cell,
+# so publishing touches only matching clients. Events are serialized once per language and handed
+# to each loop with a single call_soon_threadsafe; one heartbeat task per loop keeps idle
+# connections open through proxies. A client that stops reading loses its oldest queued events
+# instead of growing memory.
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from services.mandi_store import price_moves, sync_marker
+from services.weather import coordinate, grid_cell, on_forecast_refresh, unwatch_cell, watch_cell
+from translations import get_translation, translate_crop
+
+MANDI_ALERT_PCT = float(os.environ.get("MANDI_ALERT_PCT", "5"))
+MANDI_EVENTS_POLL = float(os.environ.get("MANDI_EVENTS_POLL", "30"))  # seconds between store checks
+SSE_MAX_CLIENTS = int(os.environ.get("SSE_MAX_CLIENTS", "50000"))
+SSE_QUEUE_SIZE = int(os.environ.get("SSE_QUEUE_SIZE", "64"))        # events buffered per slow client
+SSE_HEARTBEAT = float(os.environ.get("SSE_HEARTBEAT", "25"))         # seconds between keep-alive comments
+SSE_RETRY_MS = int(os.environ.get("SSE_RETRY_MS", "15000"))          # client reconnect delay
+MAX_SUBSCRIPTIONS = 50                                               # commodities / markets per client
+
+HEARTBEAT = b": keep-alive\n\n"
+CLOSE = object()
+
+_log = logging.getLogger(__name__)
+
+
+def encode_event(event, data, event_id=None):
+    """One SSE frame."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return (head + f"event: {event}\ndata: " + json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+            + "\n\n").encode("utf-8")
+
+
+class Subscriber:
+    __slots__ = ("queue", "loop", "lang", "commodities", "markets", "states", "cell", "dropped")
+
+    def __init__(self, loop, lang, commodities, markets, states, cell):
+        self.queue = asyncio.Queue(SSE_QUEUE_SIZE)
+        self.loop = loop
+        self.lang = lang
+        self.commodities = commodities
+        self.markets = markets
+        self.states = states
+        self.cell = cell
+        self.dropped = 0
+
+    def wants_price(self, state, market):
+        return ((not self.markets or market.lower() in self.markets)
+                and (not self.states or state.lower() in self.states))
+
+    def put(self, item):
+        """Enqueue on the subscriber's loop; drops the oldest event when the client is not reading."""
+        queue = self.queue
+        if queue.full():
+            try:
+                queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(item)
+
+
+class EventBroker:
+    """Thread-safe publish, asyncio subscribe."""
+
+    def __init__(self, max_clients=SSE_MAX_CLIENTS, heartbeat=SSE_HEARTBEAT):
+        self.max_clients = max_clients
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._by_commodity = {}     # commodity (lower) -> set of Subscriber
+        self._by_cell = {}          # grid cell -> set of Subscriber
+        self._loops = {}            # loop -> set of Subscriber (heartbeat task runs while non-empty)
+        self._ids = itertools.count(1)
+        self._stats = {"published": 0, "delivered": 0, "rejected": 0}
+
+    def subscribe(self, lang, commodities=(), markets=(), states=(), cell=None):
+        """Register a subscriber on the running loop; None when the node is at max_clients."""
+        loop = asyncio.get_running_loop()
+        sub = Subscriber(loop, lang, frozenset(c.lower() for c in commodities),
+                         frozenset(m.lower() for m in markets), frozenset(s.lower() for s in states), cell)
+        with self._lock:
+            if sum(len(subs) for subs in self._loops.values()) >= self.max_clients:
+                self._stats["rejected"] += 1
+                return None
+            for commodity in sub.commodities:
+                self._by_commodity.setdefault(commodity, set()).add(sub)
+            if cell is not None:
+                self._by_cell.setdefault(cell, set()).add(sub)
+                watch_cell(cell)
+            on_loop = self._loops.get(loop)
+            # An empty set means the loop's heartbeat task is still running and will pick this one up
+            start_heartbeat = on_loop is None
+            if on_loop is None:
+                on_loop = self._loops[loop] = set()
+            on_loop.add(sub)
+        if start_heartbeat:
+            loop.create_task(self._heartbeat(loop))
+        if sub.commodities:
+            _start_mandi_watch()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            for commodity in sub.commodities:
+                subs = self._by_commodity.get(commodity)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._by_commodity[commodity]
+            if sub.cell is not None:
+                subs = self._by_cell.get(sub.cell)
+                if subs is not None and sub in subs:
+                    subs.discard(sub)
+                    unwatch_cell(sub.cell)
+                    if not subs:
+                        del self._by_cell[sub.cell]
+            on_loop = self._loops.get(sub.loop)
+            if on_loop is not None:
+                on_loop.discard(sub)
+
+    async def _heartbeat(self, loop):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            with self._lock:
+                subs = self._loops.get(loop)
+                if not subs:
+                    self._loops.pop(loop, None)
+                    return
+                subs = list(subs)
+            for sub in subs:
+                sub.put(HEARTBEAT)
+
+    def has_commodity_subscribers(self):
+        return bool(self._by_commodity)
+
+    def has_cell_subscribers(self, cell):
+        return cell in self._by_cell
+
+    def _fanout(self, subs, event, payload_for):
+        """Deliver one event to `subs`: frame encoded once per language, one callback per loop."""
+        if not subs:
+            return 0
+        event_id = next(self._ids)
+        frames = {}
+        by_loop = {}
+        for sub in subs:
+            frame = frames.get(sub.lang)
+            if frame is None:
+                frame = frames[sub.lang] = encode_event(event, payload_for(sub.lang), event_id)
+            by_loop.setdefault(sub.loop, []).append((sub, frame))
+        for loop, batch in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, batch)
+            except RuntimeError:
+                pass  # loop closed; its subscribers are gone with it
+        with self._lock:
+            self._stats["published"] += 1
+            self._stats["delivered"] += len(subs)
+        return len(subs)
+
+    def publish_price_move(self, move):
+        """move: a mandi_store.price_moves row. Returns the number of clients it went to."""
+        with self._lock:
+            subs = [s for s in self._by_commodity.get(move["commodity"].lower(), ())
+                    if s.wants_price(move["state"], move["market"])]
+
+        def payload(lang):
+            return dict(move, commodity_local=translate_crop(move["commodity"], lang))
+        return self._fanout(subs, "price_move", payload)
+
+    def publish_weather_alert(self, cell, alert):
+        with self._lock:
+            subs = list(self._by_cell.get(cell, ()))
+
+        def payload(lang):
+            label = get_translation(lang, "common", f"weather.conditions.{alert['condition']}")
+            return dict(alert, condition_label=label)
+        return self._fanout(subs, "weather_alert", payload)
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out["clients"] = sum(len(subs) for subs in self._loops.values())
+            out["commodities"] = len(self._by_commodity)
+            out["cells"] = len(self._by_cell)
+            out["dropped"] = sum(sub.dropped for subs in self._loops.values() for sub in subs)
+        return out
+
+
+def _deliver(batch):
+    for sub, frame in batch:
+        sub.put(frame)
+
+
+broker = EventBroker()
+
+
+# ---------- producers ----------
+
+_mandi_seen = [None, None]   # (data_version, watermark) this process last read from the store
+_mandi_watch = None
+_mandi_watch_lock = threading.Lock()
+
+
+def poll_mandi_changes(path=None):
+    """Publish price moves if the store's data version moved since the last call; returns how many.
+
+    The first call only records the version, and a sync without a previous watermark (the first
+    full sync) is not a change. The version is only marked seen once its moves are published, so
+    a failed read is retried on the next call.
+    """
+    version, watermark = sync_marker(path)
+    seen_version, since = _mandi_seen
+    moves = []
+    if (seen_version is not None and version != seen_version and since
+            and broker.has_commodity_subscribers()):
+        moves = price_moves(since, MANDI_ALERT_PCT, path=path)
+        for move in moves:
+            broker.publish_price_move(move)
+    _mandi_seen[:] = [version, watermark]
+    return len(moves)
+
+
+def _start_mandi_watch(interval=MANDI_EVENTS_POLL):
+    """Start this process's poller thread (once)."""
+    global _mandi_watch
+    if _mandi_watch is not None or interval <= 0:
+        return
+    with _mandi_watch_lock:
+        if _mandi_watch is not None:
+            return
+        def loop():
+            while True:
+                try:
+                    poll_mandi_changes()  # the first pass records the baseline
+                except Exception:
+                    # A busy or missing store must not end the poller; the next pass retries
+                    _log.exception("mandi event poll failed")
+                time.sleep(interval)
+
+        _mandi_watch = threading.Thread(target=loop, name="mandi-events", daemon=True)
+        _mandi_watch.start()
+
+
+def _on_forecast_refresh(cell, previous, forecast):
+    if not broker.has_cell_subscribers(cell):
+        return
+    condition = (forecast.current or {}).get("condition")
+    before = (previous.current or {}).get("condition") if previous is not None else None
+    if condition == "stormy" and before != "stormy":
+        broker.publish_weather_alert(cell, {
+            "cell": list(cell), "condition": condition, "previous": before,
+            "temperature": forecast.current.get("temperature"), "at": int(time.time()),
+        })
+
+
+on_forecast_refresh(_on_forecast_refresh)
+
+
+def parse_subscription(args):
+    """(commodities, markets, states, cell) from query args; raises ValueError on an empty or oversized one.
+
+    args: mapping with comma-separated 'commodities', 'markets', 'states' and optional 'lat'/'lon'.
+    """
+    def split(name):
+        items = [v.strip() for v in (args.get(name) or "").split(",") if v.strip()]
+        if len(items) > MAX_SUBSCRIPTIONS:
+            raise ValueError(f"At most {MAX_SUBSCRIPTIONS} {name}")
+        return items
+
+    commodities, markets, states = split("commodities"), split("markets"), split("states")
+    cell = None
+    if args.get("lat") is not None and args.get("lon") is not None:
+        cell = grid_cell(coordinate(args["lat"]), coordinate(args["lon"]))
+    if not commodities and cell is None:
+        raise ValueError("Subscribe to commodities and/or a location (lat, lon)")
+    return commodities, markets, states, cell
+
+
+def events_stats():
+    return broker.stats()
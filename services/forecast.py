@@ -0,0 +1,67 @@
+# Parsed Open-Meteo forecasts held as NumPy arrays (the weather cache stores these)
+# The full hourly and daily horizon is kept; /api/weather renders a JSON view on demand and the
+# agro-weather indices (services.agro_indices) stack many forecasts into one array per variable.
+
+import numpy as np
+
+HOURLY_VARS = ("temperature_2m", "relative_humidity_2m", "precipitation", "wind_speed_10m")
+DAILY_VARS = ("temperature_2m_max", "temperature_2m_min", "precipitation_sum", "weather_code",
+              "et0_fao_evapotranspiration")
+
+
+def _array(values, dtype):
+    # Open-Meteo returns null for missing values; those become NaN
+    return np.array([np.nan if v is None else v for v in values or ()], dtype=dtype)
+
+
+def _to_list(arr, as_int=False):
+    out = []
+    for v in arr.tolist():
+        if v != v:  # NaN
+            out.append(None)
+        else:
+            out.append(int(v) if as_int else v)
+    return out
+
+
+class Forecast:
+    """One location's forecast: current conditions dict plus hourly/daily arrays keyed by variable."""
+    __slots__ = ("lat", "lon", "current", "daily_time", "daily", "hourly_time", "hourly", "nbytes")
+
+    def __init__(self, lat, lon, current, daily_time, daily, hourly_time, hourly):
+        self.lat = lat
+        self.lon = lon
+        self.current = current
+        self.daily_time = daily_time
+        self.daily = daily
+        self.hourly_time = hourly_time
+        self.hourly = hourly
+        # Cache accounting (TTLCache sizeof); the time arrays are counted like the value arrays
+        self.nbytes = (sum(a.nbytes for a in daily.values()) + sum(a.nbytes for a in hourly.values())
+                       + daily_time.nbytes + hourly_time.nbytes + 512)
+
+    @property
+    def days(self):
+        return len(self.daily_time)
+
+    def to_dict(self):
+        """JSON view served by /api/weather (current conditions and the daily series)."""
+        daily = {"time": [str(d) for d in self.daily_time]}
+        for name, arr in self.daily.items():
+            daily[name] = _to_list(arr, as_int=name == "weather_code")
+        return {"current": dict(self.current), "daily": daily, "lat": self.lat, "lon": self.lon}
+
+
+def parse_forecast(data, lat, lon, current):
+    """Forecast from an Open-Meteo /v1/forecast response; `current` is the already-normalized dict."""
+    daily = data.get("daily") or {}
+    hourly = data.get("hourly") or {}
+    # Daily values are printed as-is, so keep float64 to avoid float32 rounding noise; the much
+    # larger hourly block is only aggregated and is stored as float32
+    return Forecast(
+        lat, lon, current,
+        np.array(daily.get("time") or [], dtype="datetime64[D]"),
+        {name: _array(daily.get(name), np.float64) for name in DAILY_VARS},
+        np.array(hourly.get("time") or [], dtype="datetime64[m]"),
+        {name: _array(hourly.get(name), np.float32) for name in HOURLY_VARS},
+    )
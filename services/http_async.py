@@ -0,0 +1,63 @@
+# Pooled async HTTP client for upstream APIs (ASGI serving mode)
+# One keep-alive connection pool per event loop, with a global connection limit and a
+# per-host concurrency cap so one slow upstream cannot take every connection.
+
+import asyncio
+import contextlib
+import os
+import urllib.parse
+import weakref
+
+import httpx
+
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get("ASYNC_HTTP_MAX_CONNECTIONS", "200"))
+ASYNC_HTTP_MAX_KEEPALIVE = int(os.environ.get("ASYNC_HTTP_MAX_KEEPALIVE", "50"))
+ASYNC_HTTP_PER_HOST = int(os.environ.get("ASYNC_HTTP_PER_HOST", "64"))
+
+# loop -> (client, {host: semaphore}); clients and semaphores cannot be shared across loops
+_per_loop = weakref.WeakKeyDictionary()
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _per_loop.get(loop)
+    if state is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=30,
+            ),
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            headers={"User-Agent": "KrishiSaathi/1.0"},
+        )
+        state = _per_loop[loop] = (client, {})
+    return state
+
+
+async def get_json(url, timeout=10, upstream=None):
+    """GET url and decode JSON. Raises httpx.HTTPError / ValueError on failure.
+
+    With an `upstream` (services.upstream.Upstream) the call shares that service's circuit
+    breaker and latency histogram with the thread-pool path.
+    """
+    client, host_limits = _state()
+    host = urllib.parse.urlsplit(url).netloc
+    sem = host_limits.get(host)
+    if sem is None:
+        sem = host_limits[host] = asyncio.Semaphore(ASYNC_HTTP_PER_HOST)
+    with upstream.attempt() if upstream is not None else contextlib.nullcontext():
+        async with sem:
+            resp = await client.get(url, timeout=timeout)
+        if resp.status_code >= 500 or resp.status_code == 429:
+            resp.raise_for_status()
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def aclose():
+    """Close this loop's client (ASGI lifespan shutdown)."""
+    loop = asyncio.get_running_loop()
+    state = _per_loop.pop(loop, None)
+    if state is not None:
+        await state[0].aclose()
@@ -0,0 +1,236 @@
+# Chatbot intent matcher: one Aho-Corasick automaton over keyword tables for all supported languages
+# The message is normalized once and scanned in a single pass; matches must sit on word boundaries
+# (so "hi" no longer fires inside "chitchat" or "kharif"), and intents are scored rather than
+# taken in first-match order.
+
+import unicodedata
+
+# Keywords per intent, grouped by language/script. Lowercase; multi-word phrases use single spaces.
+# A trailing "*" allows any suffix (inflected forms in Dravidian and other agglutinative languages).
+# Santali has few agricultural terms in Ol Chiki in common use; speakers mostly type Hindi/English
+# words, which the shared Latin/Devanagari entries cover.
+INTENT_KEYWORDS = {
+    "greeting": {
+        "en": ["hi", "hello", "hey", "help", "start", "good morning"],
+        "latin": ["namaste", "namaskar", "kaise", "johar", "vanakkam", "sat sri akal"],
+        "hi": ["नमस्ते", "नमस्कार", "कैसे", "मदद", "प्रणाम"],
+        "mr": ["नमस्कार", "मदत"],
+        "bn": ["নমস্কার", "সাহায্য"],
+        "as": ["নমস্কাৰ", "সহায়"],
+        "te": ["నమస్తే", "నమస్కారం", "సహాయం"],
+        "ta": ["வணக்கம்", "உதவி"],
+        "gu": ["નમસ્તે", "મદદ"],
+        "kn": ["ನಮಸ್ಕಾರ", "ಸಹಾಯ"],
+        "or": ["ନମସ୍କାର", "ସାହାଯ୍ୟ"],
+        "ml": ["നമസ്കാരം", "സഹായം"],
+        "pa": ["ਸਤ ਸ੍ਰੀ ਅਕਾਲ", "ਨਮਸਤੇ", "ਮਦਦ"],
+        "sat": ["ᱡᱚᱦᱟᱨ"],
+        "ks": ["آداب", "سلام"],
+    },
+    "weather": {
+        "en": ["weather", "temperature", "rain*", "forecast", "humidity", "storm*"],
+        "latin": ["mausam", "barish", "baarish", "tapman"],
+        "hi": ["मौसम", "तापमान", "बारिश", "वर्षा", "बरसात", "आंधी"],
+        "mr": ["हवामान", "पाऊस"],
+        "mai": ["बरखा"],
+        "bn": ["আবহাওয়া", "বৃষ্টি", "তাপমাত্রা"],
+        "as": ["বতৰ", "বৰষুণ", "উষ্ণতা"],
+        "te": ["వాతావరణం*", "వర్షం*", "వాన*", "ఉష్ణోగ్రత*"],
+        "ta": ["வானிலை*", "மழை*", "வெப்பநிலை*"],
+        "gu": ["હવામાન", "વરસાદ", "તાપમાન"],
+        "kn": ["ಹವಾಮಾನ*", "ಮಳೆ*", "ತಾಪಮಾನ*"],
+        "or": ["ପାଣିପାଗ", "ବର୍ଷା", "ତାପମାତ୍ରା"],
+        "ml": ["കാലാവസ്ഥ*", "മഴ*", "താപനില*"],
+        "pa": ["ਮੌਸਮ", "ਮੀਂਹ", "ਤਾਪਮਾਨ"],
+        "sat": ["ᱫᱟᱜ"],
+        "ks": ["موسم", "روٗد"],
+    },
+    "mandi": {
+        "en": ["mandi", "price*", "market*", "rate*"],
+        "latin": ["bhav", "bhaav", "daam", "keemat", "kimat"],
+        "hi": ["मंडी", "भाव", "कीमत", "दाम", "बाजार", "बाज़ार"],
+        "mr": ["बाजारभाव", "किंमत"],
+        "bn": ["বাজার", "দাম", "মণ্ডি"],
+        "as": ["বজাৰ", "দাম"],
+        "te": ["ధర*", "మార్కెట్*", "మండి*"],
+        "ta": ["விலை*", "சந்தை*", "மண்டி*"],
+        "gu": ["ભાવ", "બજાર", "મંડી"],
+        "kn": ["ಬೆಲೆ*", "ಮಾರುಕಟ್ಟೆ*", "ಮಂಡಿ*"],
+        "or": ["ଦର", "ବଜାର", "ମଣ୍ଡି"],
+        "ml": ["വില*", "ചന്ത*", "മാർക്കറ്റ്*"],
+        "pa": ["ਭਾਅ", "ਕੀਮਤ", "ਮੰਡੀ"],
+        "ks": ["منڈی", "قیمت"],
+    },
+    "schemes": {
+        "en": ["scheme*", "insurance", "subsidy", "kcc", "pm kisan", "pm-kisan", "pmfby"],
+        "latin": ["yojana", "bima"],
+        "hi": ["योजना", "बीमा", "सब्सिडी", "किसान सम्मान"],
+        "mr": ["विमा"],
+        "bn": ["প্রকল্প", "যোজনা", "বিমা"],
+        "as": ["আঁচনি", "বীমা"],
+        "te": ["పథకం*", "బీమా*"],
+        "ta": ["திட்டம்*", "காப்பீடு*"],
+        "gu": ["યોજના", "વીમો", "વીમા"],
+        "kn": ["ಯೋಜನೆ*", "ವಿಮೆ*"],
+        "or": ["ଯୋଜନା", "ବୀମା"],
+        "ml": ["പദ്ധതി*", "ഇൻഷുറൻസ്*"],
+        "pa": ["ਯੋਜਨਾ", "ਸਕੀਮ", "ਬੀਮਾ"],
+        "ks": ["اسکیم"],
+    },
+    "soil": {
+        "en": ["soil", "soil health", "npk", "fertili*"],
+        "latin": ["mitti", "khad"],
+        "hi": ["मिट्टी", "मृदा", "खाद", "उर्वरक"],
+        "mr": ["माती", "खत"],
+        "bn": ["মাটি", "সার"],
+        "as": ["মাটি", "সাৰ"],
+        "te": ["నేల*", "మట్టి*", "ఎరువు*"],
+        "ta": ["மண்*", "உரம்*"],
+        "gu": ["જમીન", "માટી", "ખાતર"],
+        "kn": ["ಮಣ್ಣು*", "ಗೊಬ್ಬರ*"],
+        "or": ["ମାଟି", "ସାର"],
+        "ml": ["മണ്ണ്*", "വളം*"],
+        "pa": ["ਮਿੱਟੀ", "ਖਾਦ"],
+        "ks": ["مٔژ"],
+    },
+    "pest": {
+        "en": ["pest*", "disease*", "insect*", "crop*", "photo", "bollworm", "whitefly"],
+        "latin": ["keet", "keeda", "fasal", "rog"],
+        "hi": ["कीट", "कीड़े", "कीड़ा", "रोग", "बीमारी", "फसल", "फोटो"],
+        "mr": ["कीड", "पीक"],
+        "bn": ["পোকা", "রোগ", "ফসল"],
+        "as": ["পোক", "ৰোগ", "শস্য"],
+        "te": ["పురుగు*", "తెగులు*", "పంట*"],
+        "ta": ["பூச்சி*", "நோய்*", "பயிர்*"],
+        "gu": ["જીવાત", "રોગ", "પાક"],
+        "kn": ["ಕೀಟ*", "ರೋಗ*", "ಬೆಳೆ*"],
+        "or": ["ପୋକ", "ରୋଗ", "ଫସଲ"],
+        "ml": ["കീടം*", "രോഗം*", "വിള*"],
+        "pa": ["ਕੀੜੇ", "ਬਿਮਾਰੀ", "ਫਸਲ"],
+        "ks": ["کیڑ", "فصل"],
+    },
+}
+
+# A greeting inside a real question ("hello, what's the mandi rate?") should not win
+INTENT_WEIGHTS = {"greeting": 0.5}
+# Tie-break order (earlier wins)
+INTENT_PRIORITY = ("weather", "mandi", "schemes", "soil", "pest", "greeting")
+
+
+def normalize(text):
+    """NFC, casefold and collapse whitespace; the only per-message preprocessing."""
+    return " ".join(unicodedata.normalize("NFC", text or "").casefold().split())
+
+
+def _is_word_char(ch):
+    # Indic vowel signs/viramas are combining marks (category M*) and belong to the word
+    return ch.isalnum() or unicodedata.category(ch)[0] == "M"
+
+
+class IntentMatcher:
+    """Aho-Corasick automaton: goto transitions per node, failure links, and outputs per node.
+
+    Scanning uses a lazily filled DFA table (_delta): a transition resolved through the failure
+    links once is memoized, so steady-state scanning is one dict lookup per character.
+    """
+
+    def __init__(self, keyword_table, weights=None, priority=()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self.weights = weights or {}
+        self.priority = {intent: i for i, intent in enumerate(priority)}
+        seen = set()
+        for intent, by_lang in keyword_table.items():
+            for words in by_lang.values():
+                for word in words:
+                    prefix = word.endswith("*")
+                    pattern = normalize(word.rstrip("*"))
+                    if pattern and (pattern, intent) not in seen:
+                        seen.add((pattern, intent))
+                        self._add(pattern, (len(pattern), intent, prefix))
+        self._build_links()
+
+    def _add(self, pattern, output):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] = self._out[node] + (output,)
+
+    def _build_links(self):
+        queue = list(self._goto[0].values())
+        i = 0
+        while i < len(queue):
+            node = queue[i]
+            i += 1
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._delta = [dict(g) for g in self._goto]
+
+    def _resolve(self, node, ch):
+        start = node
+        while node and ch not in self._goto[node]:
+            node = self._fail[node]
+        target = self._goto[node].get(ch, 0)
+        self._delta[start][ch] = target
+        return target
+
+    def find(self, text):
+        """All boundary-respecting keyword matches in normalized text: [(start, end, intent)]."""
+        delta, out = self._delta, self._out
+        n = len(text)
+        node = 0
+        found = []
+        for i, ch in enumerate(text):
+            nxt = delta[node].get(ch)
+            node = self._resolve(node, ch) if nxt is None else nxt
+            if out[node]:
+                for length, intent, prefix in out[node]:
+                    start = i - length + 1
+                    if start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if not prefix and i + 1 < n and _is_word_char(text[i + 1]):
+                        continue
+                    found.append((start, i + 1, intent))
+        return found
+
+    def scores(self, text):
+        """Intent -> score; overlapping matches keep only the longest (e.g. Tamil மண்டி over மண்)."""
+        matches = sorted(self.find(text), key=lambda m: (m[0], m[0] - m[1]))
+        scores = {}
+        covered_to = 0
+        for start, end, intent in matches:
+            if start < covered_to:
+                continue
+            covered_to = end
+            scores[intent] = scores.get(intent, 0.0) + self.weights.get(intent, 1.0)
+        return scores
+
+    def classify(self, text):
+        """Best intent for already-normalized text, or None."""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        last = len(self.priority)
+        return max(scores, key=lambda k: (scores[k], -self.priority.get(k, last)))
+
+
+_matcher = IntentMatcher(INTENT_KEYWORDS, INTENT_WEIGHTS, INTENT_PRIORITY)
+
+
+def classify_intent(message):
+    """Intent name (weather/mandi/schemes/soil/pest/greeting) for a raw user message, or None."""
+    return _matcher.classify(normalize(message))
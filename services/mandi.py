@@ -1,15 +1,21 @@
 # Mandi (wholesale) prices - data.gov.in API or fallback sample from government structure
 # https://data.gov.in/catalog/current-daily-price-various-commodities-various-markets-mandi
 
-import os
+import asyncio
 import json
-import urllib.request
-import urllib.error
+import os
+import sqlite3
+
+from config import MANDI_CACHE_TTL
+from services.cache_backends import shared_cache
+from services.mandi_store import data_version, query_prices
 
 # data.gov.in: resource IDs for "Current daily price of various commodities from various markets (Mandi)"
 # User can set DATA_GOV_IN_API_KEY after registering at data.gov.in
-DATA_GOV_IN_BASE = "https://api.data.gov.in/resource"
-# Fallback: representative mandi prices (structure mirrors government data; update periodically)
+# DATA_GOV_IN_BASE can point at a local stand-in server for testing the sync
+DATA_GOV_IN_BASE = os.environ.get("DATA_GOV_IN_BASE", "https://api.data.gov.in/resource")
+DEFAULT_MANDI_RESOURCE_ID = "9ef84268-d583-4a30-b979-715d3eec5311"
+# Seed data for the local store: representative mandi prices (structure mirrors government data)
 FALLBACK_MANDI = [
     {"commodity": "Rice", "market": "Delhi", "modal_price": 3200, "min_price": 3100, "max_price": 3350, "unit": "Quintal"},
     {"commodity": "Wheat", "market": "Delhi", "modal_price": 2400, "min_price": 2350, "max_price": 2480, "unit": "Quintal"},
@@ -22,19 +28,28 @@ FALLBACK_MANDI = [
 ]
 
 
-def fetch_mandi(api_key=None, limit=20):
-    api_key = api_key or os.environ.get("DATA_GOV_IN_API_KEY", "").strip()
-    if api_key:
-        # data.gov.in format: resource id for mandi prices (example - replace with actual resource id from portal)
-        resource_id = os.environ.get("DATA_GOV_IN_MANDI_RESOURCE_ID", "9ef84268-d583-4a30-b979-715d3eec5311")
-        url = f"{DATA_GOV_IN_BASE}/{resource_id}?api-key={api_key}&format=json&limit={limit}"
-        try:
-            with urllib.request.urlopen(url, timeout=15) as resp:
-                raw = json.loads(resp.read().decode())
-            # Normalize response; data.gov.in returns {"records": [...]} or similar
-            records = raw.get("records") or raw.get("Records") or raw.get("data") or []
-            if isinstance(records, list) and len(records) > 0:
-                return {"prices": records[:limit], "source": "data.gov.in"}
-        except (urllib.error.URLError, json.JSONDecodeError, OSError, KeyError):
-            pass
-    return {"prices": FALLBACK_MANDI, "source": "fallback"}
+# Query results, keyed by the store's data_version (bumped by every sync), so a sync never serves stale rows
+_queries = shared_cache("mandi")
+
+
+def fetch_mandi(limit=20, commodity=None, state=None, market=None, date_from=None, date_to=None):
+    """Latest prices from the local store (kept current by mandi_store.sync_mandi)."""
+    try:
+        key = json.dumps([data_version(), limit, commodity, state, market, date_from, date_to])
+        out = _queries.get(key)
+        if out is not None:
+            return out
+        prices = query_prices(commodity=commodity, state=state, market=market,
+                              date_from=date_from, date_to=date_to, limit=limit)
+    except sqlite3.Error:
+        return {"prices": [dict(p) for p in FALLBACK_MANDI[:limit]], "source": "fallback"}
+    synced = any(p.get("source") != "seed" for p in prices)
+    out = {"prices": prices, "source": "data.gov.in" if synced else "fallback"}
+    _queries.set(key, out, MANDI_CACHE_TTL)
+    return out
+
+
+async def fetch_mandi_async(limit=20, commodity=None, state=None, market=None, date_from=None, date_to=None):
+    """Async counterpart of fetch_mandi. The store is local SQLite, so the query runs in a worker thread."""
+    return await asyncio.to_thread(fetch_mandi, limit=limit, commodity=commodity, state=state,
+                                   market=market, date_from=date_from, date_to=date_to)
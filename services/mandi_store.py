@@ -0,0 +1,369 @@
+# Local mandi price store (SQLite) with incremental sync from data.gov.in
+# /api/mandi and the chatbot read from here; only the background sync talks to data.gov.in.
+
+import datetime
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import uuid
+
+from config import MANDI_DB_PATH
+from services.metrics import stage
+from services.upstream import Upstream
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mandi_prices (
+    state TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    district TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    market TEXT NOT NULL COLLATE NOCASE,
+    commodity TEXT NOT NULL COLLATE NOCASE,
+    variety TEXT NOT NULL DEFAULT '',
+    grade TEXT NOT NULL DEFAULT '',
+    arrival_date TEXT NOT NULL,
+    min_price REAL,
+    max_price REAL,
+    modal_price REAL,
+    unit TEXT NOT NULL DEFAULT 'Quintal',
+    source TEXT NOT NULL DEFAULT 'data.gov.in',
+    PRIMARY KEY (state, district, market, commodity, variety, grade, arrival_date)
+);
+CREATE INDEX IF NOT EXISTS idx_mandi_commodity_date ON mandi_prices (commodity, arrival_date);
+CREATE INDEX IF NOT EXISTS idx_mandi_state_date ON mandi_prices (state, arrival_date);
+CREATE INDEX IF NOT EXISTS idx_mandi_market_date ON mandi_prices (market, arrival_date);
+CREATE INDEX IF NOT EXISTS idx_mandi_date ON mandi_prices (arrival_date);
+-- One row per commodity/market/day (varieties and grades averaged); feeds the trend analytics
+CREATE TABLE IF NOT EXISTS mandi_daily (
+    commodity TEXT NOT NULL COLLATE NOCASE,
+    state TEXT NOT NULL COLLATE NOCASE,
+    market TEXT NOT NULL COLLATE NOCASE,
+    arrival_date TEXT NOT NULL,
+    modal_price REAL,
+    min_price REAL,
+    max_price REAL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (commodity, state, market, arrival_date)
+);
+CREATE INDEX IF NOT EXISTS idx_mandi_daily_date ON mandi_daily (arrival_date);
+CREATE TABLE IF NOT EXISTS mandi_sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_COLUMNS = ("state", "district", "market", "commodity", "variety", "grade", "arrival_date",
+            "min_price", "max_price", "modal_price", "unit", "source")
+
+_data_gov_in = Upstream("data.gov.in", timeout=15)
+_log = logging.getLogger(__name__)
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def _connect(path=None):
+    """Per-thread connection; creates the schema and seed rows on first use of a path."""
+    path = str(path or MANDI_DB_PATH)
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is not None:
+        return conn
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with _init_lock:
+        if path not in _initialized_paths or path == ":memory:":
+            conn.executescript(_SCHEMA)
+            _seed_if_empty(conn)
+            _initialized_paths.add(path)
+    conns[path] = conn
+    return conn
+
+
+def _seed_if_empty(conn):
+    # Imported here: services.mandi imports this module
+    from services.mandi import FALLBACK_MANDI
+    if conn.execute("SELECT 1 FROM mandi_prices LIMIT 1").fetchone():
+        return
+    today = datetime.date.today().isoformat()
+    rows = []
+    for r in FALLBACK_MANDI:
+        # Seed rows name a state in "market"; keep it as the state too so state filters work
+        rows.append((r["market"], "", r["market"], r["commodity"], "", "", today,
+                     r["min_price"], r["max_price"], r["modal_price"], r.get("unit", "Quintal"), "seed"))
+    with conn:
+        conn.executemany(f"INSERT OR IGNORE INTO mandi_prices ({', '.join(_COLUMNS)}) "
+                         f"VALUES ({', '.join('?' * len(_COLUMNS))})", rows)
+    refresh_daily_aggregates(conn=conn)
+
+
+def refresh_daily_aggregates(date_from=None, path=None, conn=None):
+    """Rebuild mandi_daily from date_from (ISO, inclusive; None = everything) and bump data_version."""
+    conn = conn or _connect(path)
+    since = date_from or ""
+    with conn:
+        conn.execute("DELETE FROM mandi_daily WHERE arrival_date >= ?", (since,))
+        conn.execute(
+            "INSERT INTO mandi_daily (commodity, state, market, arrival_date, modal_price, min_price, max_price, n) "
+            "SELECT commodity, state, market, arrival_date, AVG(modal_price), MIN(min_price), MAX(max_price), COUNT(*) "
+            "FROM mandi_prices WHERE arrival_date >= ? AND modal_price IS NOT NULL "
+            "GROUP BY commodity, state, market, arrival_date", (since,))
+        conn.execute(
+            "INSERT INTO mandi_sync_state (key, value) VALUES ('data_version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+
+def data_version(path=None):
+    """Counter bumped whenever the daily aggregates change; use it to key derived caches."""
+    return int(_get_state(_connect(path), "data_version") or 0)
+
+
+def _parse_date(value):
+    """data.gov.in uses dd/mm/yyyy; store ISO yyyy-mm-dd so dates sort as text."""
+    value = (value or "").strip()
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_price(value):
+    try:
+        return float(str(value).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize_record(rec):
+    rec = {str(k).lower(): v for k, v in rec.items()}
+    arrival = _parse_date(rec.get("arrival_date"))
+    commodity = (rec.get("commodity") or "").strip()
+    market = (rec.get("market") or "").strip()
+    if not (arrival and commodity and market):
+        return None
+    return ((rec.get("state") or "").strip(), (rec.get("district") or "").strip(), market, commodity,
+            (rec.get("variety") or "").strip(), (rec.get("grade") or "").strip(), arrival,
+            _parse_price(rec.get("min_price")), _parse_price(rec.get("max_price")),
+            _parse_price(rec.get("modal_price")), "Quintal", "data.gov.in")
+
+
+def upsert_records(records, path=None):
+    """Insert or replace raw data.gov.in records. Returns the number of valid rows written."""
+    rows = [r for r in (_normalize_record(rec) for rec in records) if r]
+    if not rows:
+        return 0
+    conn = _connect(path)
+    with conn:
+        conn.executemany(f"INSERT OR REPLACE INTO mandi_prices ({', '.join(_COLUMNS)}) "
+                         f"VALUES ({', '.join('?' * len(_COLUMNS))})", rows)
+    return len(rows)
+
+
+def _get_state(conn, key):
+    row = conn.execute("SELECT value FROM mandi_sync_state WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+def _set_state(conn, key, value):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO mandi_sync_state (key, value) VALUES (?, ?)", (key, value))
+
+
+def _fetch_page(base_url, resource_id, api_key, offset, limit, arrival_date=None):
+    params = {"api-key": api_key, "format": "json", "offset": offset, "limit": limit}
+    if arrival_date:
+        # data.gov.in filters use the portal's dd/mm/yyyy format
+        params["filters[arrival_date]"] = datetime.date.fromisoformat(arrival_date).strftime("%d/%m/%Y")
+    url = f"{base_url}/{resource_id}?{urllib.parse.urlencode(params)}"
+    with stage("upstream.data-gov-in"):
+        raw = _data_gov_in.get_json(url)
+    records = raw.get("records") or raw.get("Records") or raw.get("data") or []
+    return records if isinstance(records, list) else []
+
+
+def sync_mandi(api_key=None, base_url=None, resource_id=None, page_size=500, path=None, today=None):
+    """Page data.gov.in into the local store.
+
+    First run pages through the whole resource. Later runs only request arrival dates from
+    the stored watermark (inclusive, since the last day may have been partial) up to today.
+    """
+    # Imported here: services.mandi imports this module
+    from services.mandi import DATA_GOV_IN_BASE, DEFAULT_MANDI_RESOURCE_ID
+    api_key = api_key or os.environ.get("DATA_GOV_IN_API_KEY", "").strip()
+    if not api_key:
+        return {"synced": 0, "error": "DATA_GOV_IN_API_KEY not set"}
+    base_url = base_url or DATA_GOV_IN_BASE
+    resource_id = resource_id or os.environ.get("DATA_GOV_IN_MANDI_RESOURCE_ID", DEFAULT_MANDI_RESOURCE_ID)
+    conn = _connect(path)
+    watermark = _get_state(conn, "watermark")
+    today = today or datetime.date.today()
+
+    if watermark:
+        start = datetime.date.fromisoformat(watermark)
+        dates = [(start + datetime.timedelta(days=i)).isoformat() for i in range((today - start).days + 1)]
+    else:
+        dates = [None]
+
+    synced = pages = 0
+    error = None
+    for arrival_date in dates:
+        offset = 0
+        while True:
+            try:
+                records = _fetch_page(base_url, resource_id, api_key, offset, page_size, arrival_date)
+            except (OSError, ValueError) as e:
+                error = str(e)
+                break
+            pages += 1
+            synced += upsert_records(records, path=path)
+            if len(records) < page_size:
+                break
+            offset += page_size
+        if error:
+            break
+
+    if synced:
+        seeded = conn.execute("SELECT 1 FROM mandi_prices WHERE source = 'seed' LIMIT 1").fetchone()
+        if seeded and not error:
+            # Real data replaces the FALLBACK_MANDI seed rows
+            with conn:
+                conn.execute("DELETE FROM mandi_prices WHERE source = 'seed'")
+        refresh_daily_aggregates(date_from=None if (seeded or not watermark) else watermark, conn=conn)
+    newest = conn.execute(
+        "SELECT MAX(arrival_date) AS d FROM mandi_prices WHERE source != 'seed'").fetchone()["d"]
+    if newest and not error:
+        _set_state(conn, "watermark", newest)
+    _set_state(conn, "last_sync", json.dumps({"at": time.time(), "synced": synced, "pages": pages, "error": error}))
+    out = {"synced": synced, "pages": pages, "watermark": newest}
+    if error:
+        out["error"] = error
+    return out
+
+
+def sync_marker(path=None):
+    """(data_version, watermark) in one read. Any process can poll it to notice another one's sync:
+    when data_version moves, rows dated from the previously seen watermark on may have changed."""
+    rows = _connect(path).execute(
+        "SELECT key, value FROM mandi_sync_state WHERE key IN ('data_version', 'watermark')").fetchall()
+    state = {r["key"]: r["value"] for r in rows}
+    return int(state.get("data_version") or 0), state.get("watermark")
+
+
+def price_moves(since, threshold_pct, lookback_days=14, path=None):
+    """Markets whose latest daily modal price (dated `since` or later) moved at least threshold_pct
+    from the previous trading day within lookback_days. Reads the mandi_daily aggregates."""
+    start = (datetime.date.fromisoformat(since) - datetime.timedelta(days=lookback_days)).isoformat()
+    sql = ("SELECT commodity, state, market, arrival_date, modal_price, prev_date, prev_price FROM ("
+           " SELECT commodity, state, market, arrival_date, modal_price,"
+           " LAG(arrival_date) OVER w AS prev_date, LAG(modal_price) OVER w AS prev_price,"
+           " ROW_NUMBER() OVER (PARTITION BY commodity, state, market ORDER BY arrival_date DESC) AS rn"
+           " FROM mandi_daily WHERE arrival_date >= ?"
+           " WINDOW w AS (PARTITION BY commodity, state, market ORDER BY arrival_date))"
+           " WHERE rn = 1 AND arrival_date >= ? AND prev_price > 0"
+           " AND ABS(modal_price - prev_price) >= prev_price * ?")
+    rows = _connect(path).execute(sql, (start, since, threshold_pct / 100.0)).fetchall()
+    return [dict(r, change_pct=round((r["modal_price"] / r["prev_price"] - 1) * 100, 2)) for r in rows]
+
+
+def _take_sync_lease(owner, seconds, path=None):
+    """Claim (or renew) the sync lease for `owner` unless another live holder has it; True if held.
+
+    One conditional upsert, so concurrent workers cannot both win. A holder that dies stops
+    renewing and the lease passes to another worker once it expires.
+    """
+    now = time.time()
+    lease = json.dumps({"owner": owner, "until": now + seconds})
+    with _connect(path) as conn:
+        cur = conn.execute(
+            "INSERT INTO mandi_sync_state (key, value) VALUES ('sync_lease', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value "
+            "WHERE json_extract(value, '$.owner') = ? OR json_extract(value, '$.until') < ?",
+            (lease, owner, now))
+    return cur.rowcount == 1
+
+
+def start_background_sync(interval, stop=None, **sync_kwargs):
+    """Run sync_mandi every `interval` seconds in a daemon thread, until `stop` (an Event) is set.
+
+    Every worker process may call this; a lease in the store lets only one of them sync at a
+    time, the others keep checking in case the holder goes away.
+    """
+    stop = stop or threading.Event()
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    # Generous: a first full sync pages through the whole resource
+    lease_seconds = 2 * interval + 600
+
+    def loop():
+        while not stop.is_set():
+            try:
+                if _take_sync_lease(owner, lease_seconds, sync_kwargs.get("path")):
+                    sync_mandi(**sync_kwargs)
+            except Exception:
+                # A malformed portal page or a locked store must not end the loop: this worker may
+                # hold the lease, and nobody else syncs until it expires
+                _log.exception("mandi sync failed")
+            stop.wait(interval)
+
+    thread = threading.Thread(target=loop, name="mandi-sync", daemon=True)
+    thread.start()
+    return thread
+
+
+def _row_to_dict(row):
+    out = dict(row)
+    for k in ("min_price", "max_price", "modal_price"):
+        v = out.get(k)
+        if isinstance(v, float) and v.is_integer():
+            out[k] = int(v)
+    return out
+
+
+def query_prices(commodity=None, state=None, market=None, date_from=None, date_to=None,
+                 latest_only=True, limit=20, path=None):
+    """Indexed lookup. latest_only keeps the newest row per (state, market, commodity, variety)."""
+    where, params = [], []
+    for col, val in (("commodity", commodity), ("state", state), ("market", market)):
+        if val:
+            where.append(f"{col} = ?")
+            params.append(val.strip())
+    if date_from:
+        where.append("arrival_date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("arrival_date <= ?")
+        params.append(date_to)
+    clause = ("WHERE " + " AND ".join(where)) if where else ""
+    cols = ", ".join(_COLUMNS)
+    if latest_only:
+        sql = (f"SELECT {cols} FROM (SELECT {cols}, ROW_NUMBER() OVER ("
+               f"PARTITION BY state, market, commodity, variety ORDER BY arrival_date DESC) AS rn "
+               f"FROM mandi_prices {clause}) WHERE rn = 1 "
+               f"ORDER BY arrival_date DESC, commodity, market LIMIT ?")
+    else:
+        sql = f"SELECT {cols} FROM mandi_prices {clause} ORDER BY arrival_date DESC, commodity, market LIMIT ?"
+    params.append(int(limit))
+    with stage("store.mandi"):
+        rows = _connect(path).execute(sql, params).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def store_status(path=None):
+    conn = _connect(path)
+    row = conn.execute("SELECT COUNT(*) AS n, MAX(arrival_date) AS newest FROM mandi_prices").fetchone()
+    last = _get_state(conn, "last_sync")
+    lease = _get_state(conn, "sync_lease")
+    return {"rows": row["n"], "newest": row["newest"], "watermark": _get_state(conn, "watermark"),
+            "last_sync": json.loads(last) if last else None,
+            "sync_owner": json.loads(lease)["owner"] if lease else None}
@@ -0,0 +1,170 @@
+# Mandi price analytics: rolling means, week-over-week change, spread and arbitrage rankings
+# Computed with NumPy over a (series x day) matrix built from the mandi_daily aggregates,
+# so thousands of commodity/market series are processed in one batch instead of per-row loops.
+
+import datetime
+
+import numpy as np
+
+from services.cache import TTLCache
+from services.mandi_store import _connect, data_version
+
+# Relative week-over-week change (fraction) below which a series counts as stable
+TREND_THRESHOLD = 0.02
+
+# Results are keyed on data_version, so a long TTL is safe: new data means a new key
+_trend_cache = TTLCache(ttl=3600, max_entries=256, max_bytes=8 * 1024 * 1024)
+
+
+def _load_matrix(commodity=None, state=None, days=30, path=None):
+    """Return (keys, dates, modal, low, high): keys is an array of (commodity, state, market) rows,
+    the price arrays have shape (series, days) with NaN where a market did not report."""
+    conn = _connect(path)
+    newest = conn.execute("SELECT MAX(arrival_date) AS d FROM mandi_daily").fetchone()["d"]
+    if not newest:
+        return None
+    end = datetime.date.fromisoformat(newest)
+    start = end - datetime.timedelta(days=days - 1)
+    where, params = ["arrival_date >= ?"], [start.isoformat()]
+    if commodity:
+        where.append("commodity = ?")
+        params.append(commodity.strip())
+    if state:
+        where.append("state = ?")
+        params.append(state.strip())
+    clause = " AND ".join(where)
+    # Series and day indices come straight from SQLite so no per-row Python parsing is needed
+    rows = conn.execute(
+        "SELECT DENSE_RANK() OVER (ORDER BY commodity, state, market) - 1, "
+        "CAST(julianday(arrival_date) - julianday(?) AS INTEGER), modal_price, min_price, max_price "
+        f"FROM mandi_daily WHERE {clause}", [start.isoformat()] + params).fetchall()
+    if not rows:
+        return None
+    keys = conn.execute(
+        f"SELECT DISTINCT commodity, state, market FROM mandi_daily WHERE {clause} "
+        "ORDER BY commodity, state, market", params).fetchall()
+    data = np.array(rows, dtype=float)
+    series_idx = data[:, 0].astype(np.int64)
+    day_idx = data[:, 1].astype(np.int64)
+    shape = (len(keys), days)
+    modal = np.full(shape, np.nan)
+    low = np.full(shape, np.nan)
+    high = np.full(shape, np.nan)
+    modal[series_idx, day_idx] = data[:, 2]
+    low[series_idx, day_idx] = data[:, 3]
+    high[series_idx, day_idx] = data[:, 4]
+    dates = [(start + datetime.timedelta(days=i)).isoformat() for i in range(days)]
+    return [tuple(k) for k in keys], dates, modal, low, high
+
+
+def _nan_window_mean(values, start, stop):
+    """Mean over columns [start, stop) ignoring NaN; NaN where the window has no data."""
+    window = values[:, start:stop]
+    counts = np.sum(~np.isnan(window), axis=1)
+    sums = np.nansum(window, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def rolling_mean(values, window):
+    """NaN-aware trailing rolling mean along axis 1 via cumulative sums (no Python loop over days)."""
+    filled = np.nan_to_num(values, nan=0.0)
+    present = (~np.isnan(values)).astype(float)
+    csum = np.cumsum(filled, axis=1)
+    ccount = np.cumsum(present, axis=1)
+    csum[:, window:] = csum[:, window:] - csum[:, :-window]
+    ccount[:, window:] = ccount[:, window:] - ccount[:, :-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(ccount > 0, csum / ccount, np.nan)
+
+
+def _last_valid(values):
+    """Index and value of the last non-NaN column per row (index -1 when the row is empty)."""
+    valid = ~np.isnan(values)
+    rev_idx = np.argmax(valid[:, ::-1], axis=1)
+    idx = values.shape[1] - 1 - rev_idx
+    has = valid.any(axis=1)
+    idx = np.where(has, idx, -1)
+    vals = np.where(has, values[np.arange(len(values)), np.maximum(idx, 0)], np.nan)
+    return idx, vals
+
+
+def _num(v, digits=2):
+    return None if v is None or np.isnan(v) else round(float(v), digits)
+
+
+def compute_trends(commodity=None, state=None, days=30, window=7, limit=50, path=None):
+    """Trend statistics per commodity/market series plus cross-market arbitrage per commodity."""
+    loaded = _load_matrix(commodity=commodity, state=state, days=days, path=path)
+    if loaded is None:
+        return {"as_of": None, "series": [], "arbitrage": []}
+    keys, dates, modal, low, high = loaded
+
+    rolled = rolling_mean(modal, window)
+    last_idx, latest = _last_valid(modal)
+    this_week = _nan_window_mean(modal, days - 7, days)
+    last_week = _nan_window_mean(modal, max(days - 14, 0), days - 7)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        wow = (this_week - last_week) / last_week
+    rows = np.arange(len(modal))
+    safe_idx = np.maximum(last_idx, 0)
+    spread = high[rows, safe_idx] - low[rows, safe_idx]
+    window_range = np.nanmax(np.where(np.isnan(modal), -np.inf, modal), axis=1) - \
+        np.nanmin(np.where(np.isnan(modal), np.inf, modal), axis=1)
+    trend = np.where(np.isnan(wow), "stable",
+                     np.where(wow > TREND_THRESHOLD, "rising",
+                              np.where(wow < -TREND_THRESHOLD, "falling", "stable")))
+
+    commodities = np.array([k[0] for k in keys])
+    # Most recently reporting, highest-volatility series first
+    order = np.lexsort((-np.nan_to_num(np.abs(wow)), -last_idx))
+    series = []
+    for i in order[:limit]:
+        c, s, m = keys[i]
+        series.append({
+            "commodity": c, "state": s, "market": m,
+            "latest_date": dates[last_idx[i]] if last_idx[i] >= 0 else None,
+            "latest_price": _num(latest[i]),
+            "rolling_mean": _num(rolled[i, last_idx[i]]) if last_idx[i] >= 0 else None,
+            "wow_change_pct": _num(wow[i] * 100),
+            "spread": _num(spread[i]),
+            "range": _num(window_range[i]) if np.isfinite(window_range[i]) else None,
+            "trend": str(trend[i]),
+        })
+
+    # Arbitrage: within each commodity, rank markets by latest price (sorted segments + reduceat)
+    arbitrage = []
+    has = ~np.isnan(latest)
+    if has.any():
+        idx = np.flatnonzero(has)
+        seg_order = np.lexsort((-latest[idx], commodities[idx]))
+        idx = idx[seg_order]
+        seg_comm = commodities[idx]
+        starts = np.flatnonzero(np.r_[True, seg_comm[1:] != seg_comm[:-1]])
+        ends = np.r_[starts[1:], len(idx)] - 1
+        best = idx[starts]
+        cheapest = idx[ends]
+        gap = latest[best] - latest[cheapest]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gap_pct = gap / latest[cheapest] * 100
+        for j in np.argsort(-np.nan_to_num(gap_pct)):
+            if best[j] == cheapest[j]:
+                continue
+            arbitrage.append({
+                "commodity": keys[best[j]][0],
+                "best_market": keys[best[j]][2], "best_state": keys[best[j]][1],
+                "best_price": _num(latest[best[j]]),
+                "cheapest_market": keys[cheapest[j]][2], "cheapest_state": keys[cheapest[j]][1],
+                "cheapest_price": _num(latest[cheapest[j]]),
+                "gap": _num(gap[j]), "gap_pct": _num(gap_pct[j]),
+            })
+
+    return {"as_of": dates[-1], "days": days, "window": window, "series": series, "arbitrage": arbitrage[:limit]}
+
+
+def get_trends(commodity=None, state=None, days=30, window=7, limit=50, path=None):
+    """Cached compute_trends; entries are keyed on the store's data_version."""
+    key = ((commodity or "").lower(), (state or "").lower(), days, window, limit, str(path), data_version(path))
+    return _trend_cache.get_or_load(
+        key, lambda: compute_trends(commodity=commodity, state=state, days=days, window=window,
+                                    limit=limit, path=path))
@@ -0,0 +1,194 @@
+# Request stage timing: where a request's time goes (upstream fetches, cache lookups, translation,
+# JSON serialization, template rendering), kept as Prometheus-style histograms
+#
+# Code marks a stage with `with stage("upstream.open-meteo"):` (or the @timed decorator). Inside a
+# request, stage times are exclusive (a cache lookup that loads from the upstream only counts its own
+# time; the fetch is counted under the upstream stage) and summed per request, so each histogram
+# observation is "time this request spent in the stage". Outside a request (background refresh,
+# prefetch) each stage is observed on its own. With METRICS_ENABLED=0 stage() returns a shared no-op
+# and @timed returns the function unchanged.
+
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+from config import METRICS_ENABLED
+from services.upstream import LatencyHistogram
+
+# Per-request stage buckets start lower than the upstream ones: translation and cache stages take µs
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_NOOP = contextlib.nullcontext()
+_perf = time.perf_counter
+_current = contextvars.ContextVar("metrics_request", default=None)
+_lock = threading.Lock()
+_stage_hist = {}        # stage -> LatencyHistogram
+_stage_calls = {}       # stage -> calls
+_request_hist = {}      # endpoint -> LatencyHistogram
+_requests = {}          # (endpoint, status) -> count
+
+
+class _Request:
+    """Stage totals of the request running in this context, plus the open stage stack."""
+    __slots__ = ("totals", "stack", "merged")
+
+    def __init__(self):
+        self.totals = {}    # stage -> [exclusive seconds, calls]
+        self.stack = []     # [stage, start, seconds spent in nested stages]
+        self.merged = []    # totals of tasks run for this request on pool threads (see carry)
+
+
+def _histogram(table, key, buckets):
+    hist = table.get(key)
+    if hist is None:
+        with _lock:
+            hist = table.setdefault(key, LatencyHistogram(buckets))
+    return hist
+
+
+def _observe_stage(name, seconds, calls=1):
+    _histogram(_stage_hist, name, STAGE_BUCKETS).observe(seconds)
+    with _lock:
+        _stage_calls[name] = _stage_calls.get(name, 0) + calls
+
+
+class _Stage:
+    __slots__ = ("name", "req", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        req = self.req = _current.get()
+        if req is None:
+            self.start = _perf()
+        else:
+            req.stack.append([self.name, _perf(), 0.0])
+        return self
+
+    def __exit__(self, *exc):
+        req = self.req
+        if req is None:
+            _observe_stage(self.name, _perf() - self.start)
+            return False
+        name, start, nested = req.stack.pop()
+        elapsed = _perf() - start
+        if req.stack:
+            req.stack[-1][2] += elapsed
+        total = req.totals.get(name)
+        if total is None:
+            req.totals[name] = [elapsed - nested, 1]
+        else:
+            total[0] += elapsed - nested
+            total[1] += 1
+        return False
+
+
+def stage(name):
+    """Context manager timing one stage (a no-op when metrics are disabled)."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Stage(name)
+
+
+def timed(name):
+    """Decorator form of stage() for per-request hot paths; calls outside a request are not timed.
+
+    Leaves the function untouched when metrics are disabled.
+    """
+    def decorator(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        # Inlined stage bookkeeping: this wraps hot helpers such as get_translation
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            req = _current.get()
+            if req is None:
+                return fn(*args, **kwargs)
+            stack = req.stack
+            frame = [name, _perf(), 0.0]
+            stack.append(frame)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = _perf() - frame[1]
+                stack.pop()
+                if stack:
+                    stack[-1][2] += elapsed
+                total = req.totals.get(name)
+                if total is None:
+                    req.totals[name] = [elapsed - frame[2], 1]
+                else:
+                    total[0] += elapsed - frame[2]
+                    total[1] += 1
+        return wrapper
+    return decorator
+
+
+def carry(fn):
+    """Wrap fn to run on another thread with its stages credited to the current request.
+
+    Worker threads do not inherit the request's context; their totals are handed back and added
+    when the request ends. Returns fn itself outside a request or with metrics disabled.
+    """
+    parent = _current.get() if METRICS_ENABLED else None
+    if parent is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current.set(_Request())
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            child = _current.get()
+            _current.reset(token)
+            parent.merged.append(child.totals)
+    return run
+
+
+def begin_request():
+    """Start collecting stages for the request in this context; returns a token for end_request."""
+    return _current.set(_Request())
+
+
+def end_request(token, endpoint, status, seconds):
+    """Record the request and its stage totals; returns {stage: (seconds, calls)} for this request."""
+    req = _current.get()
+    _current.reset(token)
+    _histogram(_request_hist, endpoint, STAGE_BUCKETS).observe(seconds)
+    with _lock:
+        _requests[(endpoint, status)] = _requests.get((endpoint, status), 0) + 1
+    if req is None:
+        return {}
+    for totals in req.merged:
+        for name, (spent, calls) in totals.items():
+            total = req.totals.setdefault(name, [0.0, 0])
+            total[0] += spent
+            total[1] += calls
+    for name, (spent, calls) in req.totals.items():
+        _observe_stage(name, spent, calls)
+    return {name: tuple(total) for name, total in req.totals.items()}
+
+
+def snapshot():
+    """Copies of all counters and histogram snapshots (for /metrics and /api/stats)."""
+    with _lock:
+        stages, calls = dict(_stage_hist), dict(_stage_calls)
+        endpoints, requests = dict(_request_hist), dict(_requests)
+    return {
+        "requests": [{"endpoint": e, "status": s, "count": n} for (e, s), n in sorted(requests.items())],
+        "request_seconds": {e: h.snapshot() for e, h in sorted(endpoints.items())},
+        "stage_seconds": {s: h.snapshot() for s, h in sorted(stages.items())},
+        "stage_calls": calls,
+    }
+
+
+def reset():
+    with _lock:
+        _stage_hist.clear()
+        _stage_calls.clear()
+        _request_hist.clear()
+        _requests.clear()
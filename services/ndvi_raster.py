@@ -0,0 +1,311 @@
+# NDVI from a local raster: memory-mapped, tile-windowed reads with an LRU of decoded tiles
+# A point query touches one tile and a polygon only the tiles under its bounding box, so a
+# country-scale raster is never read whole. Decoded tiles (NDVI as float32) sit in a byte-capped
+# TTLCache shared by all requests.
+#
+# Formats:
+# - Tiled raster: a JSON header plus a raw file of fixed-size tiles, row-major, edge tiles padded with
+#   nodata. Header keys: width, height, tile_size, dtype, west, north, pixel_width, pixel_height,
+#   scale, offset, nodata, data (file name next to the header) and optional date/source.
+#   write_tiled_raster() converts any 2-D array (e.g. read once with GDAL from an Oceansat/MODIS
+#   GeoTIFF) into this layout.
+# - GeoTIFF: uncompressed, north-up, read with tifffile.memmap when tifffile is installed.
+
+import json
+import math
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from config import NDVI_RASTER_PATH, NDVI_TILE_CACHE_MB
+from services.cache import TTLCache
+
+try:
+    import tifffile
+except ImportError:  # optional: tiled raster format only
+    tifffile = None
+
+TILE_SIZE = 256
+MAX_WINDOW = 128                # pixels per side for window/PNG requests
+MAX_ZONAL_PIXELS = 4_000_000    # bounding box of a zonal-stats polygon, in pixels
+
+# NDVI classes for the crop-condition label (upper bounds)
+NDVI_CLASSES = ((0.1, "water_or_bare"), (0.2, "bare"), (0.4, "sparse"), (0.6, "moderate"), (1.01, "dense"))
+
+# GeoTIFF tags: ModelPixelScale, ModelTiepoint, GDAL_NODATA
+_TAG_SCALE, _TAG_TIEPOINT, _TAG_NODATA = 33550, 33922, 42113
+
+
+def write_tiled_raster(header_path, array, west, north, pixel_width, pixel_height, tile_size=TILE_SIZE,
+                       scale=1.0, offset=0.0, nodata=None, **meta):
+    """Write a 2-D array as a tiled raster (header JSON + <name>.bin). Rows run north to south."""
+    header_path = Path(header_path)
+    array = np.asarray(array)
+    height, width = array.shape
+    tiles_y, tiles_x = -(-height // tile_size), -(-width // tile_size)
+    fill = nodata if nodata is not None else 0
+    data_path = header_path.with_suffix(".bin")
+    mm = np.memmap(data_path, dtype=array.dtype, mode="w+", shape=(tiles_y, tiles_x, tile_size, tile_size))
+    for ty in range(tiles_y):
+        for tx in range(tiles_x):
+            block = array[ty * tile_size:(ty + 1) * tile_size, tx * tile_size:(tx + 1) * tile_size]
+            tile = mm[ty, tx]
+            tile[...] = fill
+            tile[:block.shape[0], :block.shape[1]] = block
+    mm.flush()
+    del mm
+    header = dict(meta, width=width, height=height, tile_size=tile_size, dtype=str(array.dtype),
+                  west=west, north=north, pixel_width=pixel_width, pixel_height=pixel_height,
+                  scale=scale, offset=offset, nodata=nodata, data=data_path.name)
+    with open(header_path, "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=1)
+    return header
+
+
+class NdviRaster:
+    """Georeferenced NDVI raster read tile by tile; NDVI = raw * scale + offset, NaN for nodata."""
+
+    def __init__(self, path, cache_bytes=int(NDVI_TILE_CACHE_MB * 1024 * 1024)):
+        self.path = str(path)
+        if self.path.endswith(".json"):
+            self._open_tiled(Path(path))
+        else:
+            self._open_geotiff(path)
+        self.tiles_y = -(-self.height // self.tile_size)
+        self.tiles_x = -(-self.width // self.tile_size)
+        self.version = f"{self.date}:{Path(path).stat().st_mtime_ns}"
+        self.east = self.west + self.width * self.pixel_width
+        self.south = self.north - self.height * self.pixel_height
+        self._tiles = TTLCache(ttl=float("inf"), max_entries=1 << 20, max_bytes=cache_bytes,
+                               sizeof=lambda tile: tile.nbytes)
+
+    def _open_tiled(self, header_path):
+        with open(header_path, encoding="utf-8") as f:
+            h = json.load(f)
+        self.width, self.height, self.tile_size = int(h["width"]), int(h["height"]), int(h["tile_size"])
+        self.west, self.north = float(h["west"]), float(h["north"])
+        self.pixel_width, self.pixel_height = float(h["pixel_width"]), float(h["pixel_height"])
+        self.scale, self.offset, self.nodata = float(h.get("scale", 1.0)), float(h.get("offset", 0.0)), h.get("nodata")
+        self.date, self.source = h.get("date"), h.get("source")
+        n = self.tile_size
+        shape = (-(-self.height // n), -(-self.width // n), n, n)
+        self._mm = np.memmap(header_path.parent / h["data"], dtype=h["dtype"], mode="r", shape=shape)
+        self._tiled = True
+
+    def _open_geotiff(self, path):
+        if tifffile is None:
+            raise RuntimeError("Reading GeoTIFF NDVI rasters needs the tifffile package")
+        with tifffile.TiffFile(path) as tif:
+            tags = tif.pages[0].tags
+            sx, sy = tags[_TAG_SCALE].value[:2]
+            tie = tags[_TAG_TIEPOINT].value
+            nodata = tags[_TAG_NODATA].value if _TAG_NODATA in tags else None
+        self._mm = tifffile.memmap(path, mode="r")  # raises for compressed files
+        self.height, self.width = self._mm.shape[:2]
+        self.tile_size = TILE_SIZE
+        self.west, self.north = float(tie[3] - tie[0] * sx), float(tie[4] + tie[1] * sy)
+        self.pixel_width, self.pixel_height = float(sx), float(sy)
+        self.scale, self.offset = 1.0, 0.0
+        self.nodata = float(nodata.strip("\x00")) if isinstance(nodata, str) else nodata
+        self.date, self.source = None, Path(path).name
+        self._tiled = False
+
+    def _read_tile(self, ty, tx):
+        n = self.tile_size
+        if self._tiled:
+            raw = np.array(self._mm[ty, tx])
+        else:
+            raw = np.array(self._mm[ty * n:(ty + 1) * n, tx * n:(tx + 1) * n])
+            if raw.shape != (n, n):
+                raw = np.pad(raw, ((0, n - raw.shape[0]), (0, n - raw.shape[1])),
+                             constant_values=self.nodata if self.nodata is not None else 0)
+        ndvi = raw.astype(np.float32) * np.float32(self.scale) + np.float32(self.offset)
+        if self.nodata is not None:
+            ndvi[raw == self.nodata] = np.nan
+        return ndvi
+
+    def tile(self, ty, tx):
+        """Decoded NDVI tile (float32, NaN = nodata) through the LRU."""
+        return self._tiles.get_or_load((ty, tx), lambda: self._read_tile(ty, tx))
+
+    def pixel(self, lat, lon):
+        """(row, col) of the pixel containing the point, or None outside the raster."""
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            return None
+        col = int((lon - self.west) // self.pixel_width)
+        row = int((self.north - lat) // self.pixel_height)
+        if 0 <= row < self.height and 0 <= col < self.width:
+            return row, col
+        return None
+
+    def value(self, lat, lon):
+        """NDVI at a point (None outside the raster or on nodata)."""
+        rc = self.pixel(lat, lon)
+        if rc is None:
+            return None
+        n = self.tile_size
+        v = float(self.tile(rc[0] // n, rc[1] // n)[rc[0] % n, rc[1] % n])
+        return None if v != v else v
+
+    def window(self, row0, col0, rows, cols):
+        """NDVI for a pixel window (clipped to the raster), assembled from the tiles it overlaps."""
+        row1, col1 = min(row0 + rows, self.height), min(col0 + cols, self.width)
+        row0, col0 = max(row0, 0), max(col0, 0)
+        out = np.full((max(row1 - row0, 0), max(col1 - col0, 0)), np.nan, dtype=np.float32)
+        n = self.tile_size
+        for ty in range(row0 // n, (row1 - 1) // n + 1 if row1 > row0 else 0):
+            for tx in range(col0 // n, (col1 - 1) // n + 1 if col1 > col0 else 0):
+                r0, r1 = max(row0, ty * n), min(row1, (ty + 1) * n)
+                c0, c1 = max(col0, tx * n), min(col1, (tx + 1) * n)
+                out[r0 - row0:r1 - row0, c0 - col0:c1 - col0] = \
+                    self.tile(ty, tx)[r0 - ty * n:r1 - ty * n, c0 - tx * n:c1 - tx * n]
+        return out
+
+    def zonal_stats(self, rings):
+        """NDVI mean/min/max/std over pixels whose centre falls inside the polygon (lon, lat rings,
+        even-odd, so holes may be passed as extra rings). None when the polygon misses the raster;
+        no pixels when it only grazes the raster's edge."""
+        xs = np.concatenate([np.asarray(r, dtype=np.float64)[:, 0] for r in rings])
+        ys = np.concatenate([np.asarray(r, dtype=np.float64)[:, 1] for r in rings])
+        col0 = max(int((xs.min() - self.west) // self.pixel_width), 0)
+        col1 = min(int((xs.max() - self.west) // self.pixel_width) + 1, self.width)
+        row0 = max(int((self.north - ys.max()) // self.pixel_height), 0)
+        row1 = min(int((self.north - ys.min()) // self.pixel_height) + 1, self.height)
+        if row1 <= row0 or col1 <= col0:
+            return None
+        if (row1 - row0) * (col1 - col0) > MAX_ZONAL_PIXELS:
+            raise ValueError("Polygon too large for zonal statistics")
+        data = self.window(row0, col0, row1 - row0, col1 - col0)
+        mask = _polygon_mask(rings, self.west + (col0 + 0.5) * self.pixel_width, self.pixel_width,
+                             self.north - (row0 + 0.5) * self.pixel_height, self.pixel_height, data.shape)
+        if not mask.any():
+            # Polygon smaller than a pixel: use the pixel under its first vertex, if on the raster
+            x, y = rings[0][0]
+            row = int((self.north - y) // self.pixel_height) - row0
+            col = int((x - self.west) // self.pixel_width) - col0
+            if not (0 <= row < data.shape[0] and 0 <= col < data.shape[1]):
+                return {"pixels": 0, "valid_pixels": 0}
+            mask[row, col] = True
+        values = data[mask]
+        valid = values[~np.isnan(values)]
+        out = {"pixels": int(mask.sum()), "valid_pixels": int(valid.size)}
+        if valid.size:
+            out.update(mean=round(float(valid.mean()), 4), min=round(float(valid.min()), 4),
+                       max=round(float(valid.max()), 4), std=round(float(valid.std()), 4))
+        return out
+
+    def stats(self):
+        return dict(self._tiles.stats(), path=self.path, width=self.width, height=self.height,
+                    tile_size=self.tile_size, date=self.date)
+
+
+def _polygon_mask(rings, x0, dx, y0, dy, shape):
+    """Boolean mask of pixel centres inside the rings (even-odd): per row, the sorted crossings
+    of the edges with that row's centre line are counted against each pixel centre."""
+    edges = []
+    for ring in rings:
+        r = np.asarray(ring, dtype=np.float64)
+        nxt = np.roll(r, -1, axis=0)
+        edges.append(np.hstack([r, nxt]))
+    e = np.vstack(edges)
+    e = e[e[:, 1] != e[:, 3]]
+    ex1, ey1, ex2, ey2 = e[:, 0], e[:, 1], e[:, 2], e[:, 3]
+    centres_x = x0 + dx * np.arange(shape[1])
+    mask = np.zeros(shape, dtype=bool)
+    for i in range(shape[0]):
+        y = y0 - dy * i
+        spans = (ey1 > y) != (ey2 > y)
+        if not spans.any():
+            continue
+        cross = np.sort(ex1[spans] + (y - ey1[spans]) * (ex2[spans] - ex1[spans]) / (ey2[spans] - ey1[spans]))
+        mask[i] = np.searchsorted(cross, centres_x) % 2 == 1
+    return mask
+
+
+def ndvi_class(value):
+    if value is None:
+        return None
+    for limit, name in NDVI_CLASSES:
+        if value < limit:
+            return name
+    return NDVI_CLASSES[-1][1]
+
+
+_RAMP = np.array([  # NDVI -> RGB, brown (bare) through yellow to dark green
+    (-0.2, 120, 80, 50), (0.1, 190, 160, 110), (0.3, 235, 220, 120),
+    (0.5, 140, 200, 90), (0.7, 50, 150, 50), (0.9, 0, 90, 30),
+])
+
+
+def ndvi_png(data):
+    """RGBA PNG bytes for an NDVI window (nodata transparent); no imaging library needed."""
+    v = np.nan_to_num(data, nan=-1.0)
+    rgba = np.empty(data.shape + (4,), dtype=np.uint8)
+    for ch in range(3):
+        rgba[..., ch] = np.interp(v, _RAMP[:, 0], _RAMP[:, ch + 1]).astype(np.uint8)
+    rgba[..., 3] = np.where(np.isnan(data), 0, 255)
+    h, w = data.shape
+    raw = np.hstack([np.zeros((h, 1), dtype=np.uint8), rgba.reshape(h, w * 4)]).tobytes()
+
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+
+_raster = None
+_raster_error = None
+_raster_lock = threading.Lock()
+
+
+def get_raster():
+    """Process-wide raster from NDVI_RASTER_PATH (None when not configured or unreadable)."""
+    global _raster, _raster_error
+    if _raster is None and _raster_error is None and NDVI_RASTER_PATH:
+        with _raster_lock:
+            if _raster is None and _raster_error is None:
+                try:
+                    _raster = NdviRaster(NDVI_RASTER_PATH)
+                except (OSError, ValueError, KeyError, RuntimeError) as e:
+                    _raster_error = str(e)
+    return _raster
+
+
+def ndvi_at(lat, lon, radius=1):
+    """NDVI at a point plus the mean over the surrounding (2*radius+1)^2 pixels, or None."""
+    raster = get_raster()
+    if raster is None or lat is None or lon is None:
+        return None
+    rc = raster.pixel(lat, lon)
+    if rc is None:
+        return None
+    value = raster.value(lat, lon)
+    around = raster.window(rc[0] - radius, rc[1] - radius, 2 * radius + 1, 2 * radius + 1)
+    known = around[~np.isnan(around)]
+    return {
+        "value": round(value, 4) if value is not None else None,
+        "class": ndvi_class(value),
+        "neighbourhood_mean": round(float(known.mean()), 4) if known.size else None,
+        "date": raster.date,
+        "source": raster.source,
+    }
+
+
+def ndvi_pixel(lat, lon):
+    """(version, row, col) identifying the NDVI data a point query returns, or None."""
+    raster = get_raster()
+    if raster is None or lat is None or lon is None:
+        return None
+    rc = raster.pixel(lat, lon)
+    return (raster.version,) + rc if rc is not None else None
+
+
+def ndvi_stats():
+    raster = get_raster()
+    if raster is None:
+        return {"enabled": False, "error": _raster_error}
+    return dict(raster.stats(), enabled=True)
@@ -0,0 +1,19 @@
+# Shared worker pool for fanning out blocking service calls (upstream HTTP, disk)
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import carry
+
+
+class _ServicePool(ThreadPoolExecutor):
+    """Tasks submitted while handling a request report their stage timings to that request."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(carry(fn), *args, **kwargs)
+
+
+executor = _ServicePool(
+    max_workers=int(os.environ.get("SERVICE_POOL_WORKERS", "32")),
+    thread_name_prefix="services",
+)
@@ -0,0 +1,299 @@
+# Reverse geocoding: (lat, lon) -> state and district from boundary polygons
+# Polygons are indexed on a uniform grid: each grid cell lists the regions whose bounding box
+# overlaps it, and each region keeps its edges bucketed by latitude band, so a point-in-polygon
+# test only walks the few edges its horizontal ray can cross. A lookup costs microseconds.
+#
+# Boundaries come from REGION_BOUNDARIES_PATH (GeoJSON, e.g. DataMeet / Survey of India district
+# or state layers) when configured. Otherwise coarse regions are derived from the bundled district
+# headquarters: each district is the area closer to its headquarters than to any other (Voronoi
+# cell), clipped to a coarse India outline. Good for picking a state's advice; near borders the
+# district (and occasionally the state) can be wrong.
+
+import csv
+import json
+import math
+import threading
+import time
+
+import numpy as np
+
+from config import REGION_BOUNDARIES_PATH, REGIONS_DIR
+
+GRID_DEGREES = 0.25
+MAX_BATCH_POINTS = 10000   # per /api/region request
+
+# Property names used for state / district in common Indian boundary GeoJSON files
+_STATE_KEYS = ("state", "State", "STATE", "st_nm", "ST_NM", "stname", "NAME_1")
+_DISTRICT_KEYS = ("district", "District", "DISTRICT", "dtname", "DTNAME", "NAME_2")
+
+
+def _clip(ring, a, b, c):
+    """Part of ring (list of (x, y)) with a*x + b*y <= c (Sutherland-Hodgman against one half-plane)."""
+    out = []
+    n = len(ring)
+    for i in range(n):
+        x1, y1 = ring[i - 1]
+        x2, y2 = ring[i]
+        d1 = a * x1 + b * y1 - c
+        d2 = a * x2 + b * y2 - c
+        if d2 <= 0:
+            if d1 > 0:
+                t = d1 / (d1 - d2)
+                out.append((x1 + t * (x2 - x1), y1 + t * (y2 - y1)))
+            out.append((x2, y2))
+        elif d1 <= 0:
+            t = d1 / (d1 - d2)
+            out.append((x1 + t * (x2 - x1), y1 + t * (y2 - y1)))
+    return out
+
+
+def voronoi_regions(seeds, outline):
+    """Clip the Voronoi cell of every seed (x, y) to the outline polygons; one list of rings per seed.
+
+    Neighbours are applied nearest first and stop once they are more than twice as far as the
+    farthest vertex left, as no bisector beyond that can cut the cell.
+    """
+    pts = np.array(seeds, dtype=np.float64)
+    cells = []
+    for i, (px, py) in enumerate(seeds):
+        dist = np.hypot(pts[:, 0] - px, pts[:, 1] - py)
+        order = np.argsort(dist)
+        rings = []
+        for part in outline:
+            ring = list(part)
+            for j in order:
+                if j == i:
+                    continue
+                reach = max(math.hypot(x - px, y - py) for x, y in ring)
+                if dist[j] > 2 * reach:
+                    break
+                qx, qy = pts[j]
+                # Keep the side closer to the seed: 2(q - p).x <= |q|^2 - |p|^2
+                ring = _clip(ring, 2 * (qx - px), 2 * (qy - py), qx * qx + qy * qy - px * px - py * py)
+                if len(ring) < 3:
+                    break
+            if len(ring) >= 3:
+                rings.append(ring)
+        cells.append(rings)
+    return cells
+
+
+def _bundled_regions():
+    with open(REGIONS_DIR / "district_hq.csv", encoding="utf-8") as f:
+        rows = list(csv.DictReader(line for line in f if not line.startswith("#")))
+    with open(REGIONS_DIR / "india_outline.json", encoding="utf-8") as f:
+        outline = [[tuple(p) for p in polygon[0]] for polygon in json.load(f)["coordinates"]]
+    seeds = [(float(r["lon"]), float(r["lat"])) for r in rows]
+    cells = voronoi_regions(seeds, outline)
+    return [({"state": r["state"], "district": r["district"]}, rings)
+            for r, rings in zip(rows, cells) if rings]
+
+
+def _first(props, keys):
+    for key in keys:
+        value = props.get(key)
+        if value:
+            return str(value).strip()
+    return None
+
+
+def load_geojson(path):
+    """(properties, rings) per feature of a Polygon/MultiPolygon FeatureCollection.
+
+    Holes are kept as extra rings; the even-odd test treats them as outside.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    regions = []
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            continue
+        props = feature.get("properties") or {}
+        state = _first(props, _STATE_KEYS)
+        if not state:
+            continue
+        rings = [[(float(p[0]), float(p[1])) for p in ring] for polygon in polygons for ring in polygon]
+        regions.append(({"state": state, "district": _first(props, _DISTRICT_KEYS)}, rings))
+    return regions
+
+
+class RegionIndex:
+    """Grid index over region polygons; locate() and locate_many() return region numbers (-1: none)."""
+
+    def __init__(self, regions, cell=GRID_DEGREES):
+        self.props = [props for props, _ in regions]
+        self.cell = cell
+        boxes = []
+        all_edges = []
+        for _, rings in regions:
+            edges = []
+            for ring in rings:
+                for k in range(len(ring)):
+                    (x1, y1), (x2, y2) = ring[k - 1], ring[k]
+                    if y1 != y2:  # horizontal edges never cross a horizontal ray
+                        edges.append((x1, y1, x2, y2))
+            xs = [x for ring in rings for x, _ in ring]
+            ys = [y for ring in rings for _, y in ring]
+            boxes.append((min(xs), min(ys), max(xs), max(ys)))
+            all_edges.append(edges)
+        self.x0 = min(b[0] for b in boxes)
+        self.y0 = min(b[1] for b in boxes)
+        self.cols = int((max(b[2] for b in boxes) - self.x0) / cell) + 1
+        self.rows = int((max(b[3] for b in boxes) - self.y0) / cell) + 1
+
+        # grid[(row, col)] -> region numbers whose bounding box overlaps that cell
+        self.grid = {}
+        for rid, (x1, y1, x2, y2) in enumerate(boxes):
+            for row in range(self._row(y1), self._row(y2) + 1):
+                for col in range(self._col(x1), self._col(x2) + 1):
+                    self.grid.setdefault((row, col), []).append(rid)
+        self.grid = {key: tuple(rids) for key, rids in self.grid.items()}
+
+        # bands[(region, row)] -> edges whose latitude range overlaps that row (tuples and an array)
+        self.bands = {}
+        for rid, edges in enumerate(all_edges):
+            for edge in edges:
+                lo, hi = sorted((edge[1], edge[3]))
+                for row in range(self._row(lo), self._row(hi) + 1):
+                    self.bands.setdefault((rid, row), []).append(edge)
+        self.bands = {key: tuple(edges) for key, edges in self.bands.items()}
+        self._band_arrays = {}
+        self.edge_count = sum(len(edges) for edges in all_edges)
+
+    def _row(self, y):
+        return int((y - self.y0) // self.cell)
+
+    def _col(self, x):
+        return int((x - self.x0) // self.cell)
+
+    def locate(self, lat, lon):
+        row = self._row(lat)
+        for rid in self.grid.get((row, self._col(lon)), ()):
+            inside = False
+            for x1, y1, x2, y2 in self.bands.get((rid, row), ()):
+                if (y1 > lat) != (y2 > lat) and lon < (x2 - x1) * (lat - y1) / (y2 - y1) + x1:
+                    inside = not inside
+            if inside:
+                return rid
+        return -1
+
+    def _band_array(self, rid, row):
+        key = (rid, row)
+        arr = self._band_arrays.get(key)
+        if arr is None:
+            arr = np.array(self.bands.get(key, ()), dtype=np.float64).reshape(-1, 4)
+            self._band_arrays[key] = arr
+        return arr
+
+    def locate_many(self, lats, lons):
+        """Vectorized locate(): points are grouped by grid cell and tested against each candidate at once."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        out = np.full(len(lats), -1, dtype=np.int64)
+        with np.errstate(invalid="ignore"):
+            rows = np.floor((lats - self.y0) / self.cell)
+            cols = np.floor((lons - self.x0) / self.cell)
+        valid = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        keys = np.where(valid, rows * self.cols + cols, -1).astype(np.int64)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for group in np.split(order, bounds):
+            key = keys[group[0]]
+            if key < 0:
+                continue
+            row, col = divmod(int(key), self.cols)
+            pending = group
+            for rid in self.grid.get((row, col), ()):
+                edges = self._band_array(rid, row)
+                if not len(edges):
+                    continue
+                y = lats[pending][:, None]
+                x = lons[pending][:, None]
+                x1, y1, x2, y2 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+                crosses = ((y1 > y) != (y2 > y)) & (x < (x2 - x1) * (y - y1) / (y2 - y1) + x1)
+                inside = crosses.sum(axis=1) % 2 == 1
+                out[pending[inside]] = rid
+                pending = pending[~inside]
+                if not len(pending):
+                    break
+        return out
+
+
+_index = None
+_index_source = None
+_index_seconds = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Process-wide index, built on first use from REGION_BOUNDARIES_PATH or the bundled regions."""
+    global _index, _index_source, _index_seconds
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                started = time.perf_counter()
+                if REGION_BOUNDARIES_PATH:
+                    regions, source = load_geojson(REGION_BOUNDARIES_PATH), REGION_BOUNDARIES_PATH
+                else:
+                    regions, source = _bundled_regions(), "bundled"
+                index = RegionIndex(regions)
+                _index_source = source
+                _index_seconds = round(time.perf_counter() - started, 3)
+                _index = index
+    return _index
+
+
+def resolve_region(lat, lon):
+    """{"state", "district"} for a point, or None outside every region (sea, neighbouring country)."""
+    if lat is None or lon is None:
+        return None
+    lat, lon = float(lat), float(lon)
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        return None
+    index = get_index()
+    rid = index.locate(lat, lon)
+    return dict(index.props[rid]) if rid >= 0 else None
+
+
+def resolve_regions(points):
+    """resolve_region() for a list of (lat, lon) points, vectorized."""
+    if not points:
+        return []
+    index = get_index()
+    lats, lons = zip(*points)
+    return [dict(index.props[rid]) if rid >= 0 else None for rid in index.locate_many(lats, lons)]
+
+
+def fill_region(state=None, district=None, lat=None, lon=None):
+    """(state, district) as given, with the blanks filled from the coordinates when they resolve."""
+    state = (state or "").strip() or None
+    district = (district or "").strip() or None
+    if state and district or lat is None or lon is None:
+        return state, district
+    region = resolve_region(lat, lon)
+    if region is None:
+        return state, district
+    if state is None:
+        return region["state"], district or region["district"]
+    if region["state"].lower() == state.lower():
+        return state, district or region["district"]
+    return state, district
+
+
+def region_stats():
+    if _index is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "source": _index_source,
+        "build_seconds": _index_seconds,
+        "regions": len(_index.props),
+        "edges": _index.edge_count,
+        "grid_cells": len(_index.grid),
+    }
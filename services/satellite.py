@@ -1,9 +1,16 @@
 # Satellite / NDVI - links to Bhuvan/NRSC and optional tile or NDVI summary
 # https://bhuvan-app1.nrsc.gov.in https://data.gov.in/resource/oceansat-2ocm-ndvi-india-coverage
 
-def get_satellite_info(lat=None, lon=None, state=None):
-    """Return links and optional NDVI/tile info for agriculture."""
+from services.ndvi_raster import ndvi_at
+from services.regions import fill_region
+
+
+def get_satellite_info(lat=None, lon=None, state=None, district=None):
+    """Return links, plus NDVI at the point when an NDVI raster is configured."""
+    state, district = fill_region(state, district, lat, lon)
     return {
+        "region": {"state": state, "district": district},
+        "ndvi": ndvi_at(lat, lon),
         "bhuvan_portal": "https://bhuvan-app1.nrsc.gov.in/",
         "ndvi_data_portal": "https://www.data.gov.in/resource/oceansat-2ocm-ndvi-india-coverage",
         "description_en": "Use Bhuvan and data.gov.in for NDVI and crop condition maps. Oceansat-2 OCM NDVI available at 1 km resolution.",
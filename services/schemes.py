@@ -1,6 +1,9 @@
 # Government schemes - real info from official sources (PM-Kisan, PMFBY, KCC, etc.)
 # https://pmkisan.gov.in https://pmfby.gov.in
 
+import hashlib
+import json
+
 SCHEMES = [
     {
         "id": "pm_kisan",
@@ -54,6 +57,9 @@ SCHEMES = [
     },
 ]
 
+# Changes whenever the scheme texts change (part of the /api/schemes response cache key)
+SCHEMES_VERSION = hashlib.sha256(json.dumps(SCHEMES, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
 
 def get_schemes(lang="en"):
     """Return schemes with name and description in requested language where available."""
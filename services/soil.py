@@ -1,8 +1,13 @@
 # Soil / NDVI info - government open data (Bhuvan/NRSC, data.gov.in) or advisory text
 # https://data.gov.in/resource/oceansat-2ocm-ndvi-india-coverage
 
+import hashlib
+import json
 import os
 
+from services.regions import fill_region
+from services.soil_data import soil_report
+
 # Optional: fetch NDVI or soil health summary from an API. For now return advisory-style summary
 # that can be driven by state/district when we have location.
 SOIL_ADVISORY_BY_REGION = {
@@ -12,16 +17,59 @@ SOIL_ADVISORY_BY_REGION = {
         "npk_tip_en": "Balance N-P-K based on soil test. Avoid excess urea; use neem-coated urea where advised.",
         "npk_tip_hi": "मृदा परीक्षण के आधार पर N-P-K संतुलन। अधिक यूरिया से बचें; जहां सलाह हो वहां नीम-लेपित यूरिया उपयोग करें।",
     },
+    "Punjab": {
+        "summary_en": "Rice-wheat soils here are often low in zinc and organic carbon. Test soil every 2 years and incorporate crop residue instead of burning it.",
+        "summary_hi": "यहां धान-गेहूं वाली मिट्टी में अक्सर जिंक और जैविक कार्बन कम होता है। हर 2 साल मिट्टी जांच कराएं और पराली जलाने के बजाय मिट्टी में मिलाएं।",
+        "npk_tip_en": "Apply zinc sulphate (25 kg/ha) to rice where deficient. Split urea into 2-3 doses.",
+        "npk_tip_hi": "कमी होने पर धान में जिंक सल्फेट (25 किग्रा/हेक्टेयर) डालें। यूरिया 2-3 बार में बांटकर दें।",
+    },
+    "Maharashtra": {
+        "summary_en": "Black cotton soils hold water well but crack when dry. Keep drainage open in the monsoon and add organic manure.",
+        "summary_hi": "काली कपास मिट्टी पानी अच्छी तरह रोकती है पर सूखने पर फटती है। मानसून में जल निकास खुला रखें और जैविक खाद डालें।",
+        "npk_tip_en": "These soils are usually rich in potash; focus on N and P and add sulphur for soybean and groundnut.",
+        "npk_tip_hi": "इस मिट्टी में पोटाश प्रायः पर्याप्त होता है; N और P पर ध्यान दें और सोयाबीन व मूंगफली में सल्फर डालें।",
+    },
+    "Rajasthan": {
+        "summary_en": "Sandy soils here are low in organic matter and hold little water. Mulch, add farmyard manure and prefer drip or sprinkler irrigation.",
+        "summary_hi": "यहां की रेतीली मिट्टी में जैविक पदार्थ कम है और पानी कम रुकता है। मल्चिंग करें, गोबर की खाद डालें और ड्रिप या स्प्रिंकलर सिंचाई अपनाएं।",
+        "npk_tip_en": "Apply fertilizer in small split doses so it is not washed below the roots. Use gypsum on saline-sodic patches.",
+        "npk_tip_hi": "खाद कम मात्रा में कई बार दें ताकि जड़ों से नीचे न बह जाए। लवणीय-क्षारीय भूमि में जिप्सम डालें।",
+    },
+    "Kerala": {
+        "summary_en": "Laterite soils here are acidic. Apply lime or dolomite based on the soil test before sowing.",
+        "summary_hi": "यहां की लेटराइट मिट्टी अम्लीय है। बुवाई से पहले मृदा परीक्षण के आधार पर चूना या डोलोमाइट डालें।",
+        "npk_tip_en": "Add magnesium and boron where the soil card shows deficiency; avoid heavy single doses of potash.",
+        "npk_tip_hi": "मृदा कार्ड में कमी दिखे तो मैग्नीशियम और बोरॉन डालें; पोटाश एक साथ अधिक मात्रा में न दें।",
+    },
+    "West Bengal": {
+        "summary_en": "Alluvial soils here are fertile; red and lateritic soils in the west are acidic and need lime.",
+        "summary_hi": "यहां की जलोढ़ मिट्टी उपजाऊ है; पश्चिम की लाल व लेटराइट मिट्टी अम्लीय है और उसमें चूना चाहिए।",
+        "npk_tip_en": "Use boron for mustard and vegetables, and zinc for boro rice where deficient.",
+        "npk_tip_hi": "सरसों और सब्जियों में बोरॉन, और कमी होने पर बोरो धान में जिंक डालें।",
+    },
 }
 
+_REGION_KEYS = {key.lower(): key for key in SOIL_ADVISORY_BY_REGION}
+# Changes whenever the advisory texts change (part of the /api/soil response cache key)
+SOIL_ADVISORY_VERSION = hashlib.sha256(
+    json.dumps(SOIL_ADVISORY_BY_REGION, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def get_soil_advisory(state=None, district=None, lang="en", lat=None, lon=None, block=None, crop=None):
+    """Soil advice for a state; with only lat/lon given, the state is resolved from the coordinates.
 
-def get_soil_advisory(state=None, district=None, lang="en"):
-    key = (state or "").strip() or "default"
-    region = SOIL_ADVISORY_BY_REGION.get(key) or SOIL_ADVISORY_BY_REGION["default"]
+    Where the state has soil test data (services.soil_data), the block/district values and a
+    fertilizer plan for `crop` are included as "soil_test".
+    """
+    state, district = fill_region(state, district, lat, lon)
+    key = _REGION_KEYS.get((state or "").lower(), "default")
+    region = SOIL_ADVISORY_BY_REGION[key]
     summary = region.get(f"summary_{lang}") or region.get("summary_hi") or region["summary_en"]
     npk_tip = region.get(f"npk_tip_{lang}") or region.get("npk_tip_hi") or region["npk_tip_en"]
     return {
         "summary": summary,
         "npk_tip": npk_tip,
         "soil_health_card_link": "https://soilhealth.dac.gov.in",
+        "region": {"state": state, "district": district},
+        "soil_test": soil_report(state, district, block, crop) if state else None,
     }
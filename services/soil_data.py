@@ -0,0 +1,316 @@
+# Soil Health Card nutrient data: columnar per-state tables and vectorized fertilizer doses
+# Each state's file is loaded on first use into a handful of NumPy columns (one row per block or
+# district) with a dict index by name. Loaded states share a byte-capped LRU, so a worker only
+# holds the states it is actually asked about.
+#
+# File layout: SOIL_DATA_DIR/<state_slug>.csv (or .parquet with pyarrow installed), e.g.
+# uttar_pradesh.csv, with columns
+#   district, block, samples, n, p, k, ph, oc, zn, fe, mn, cu, b
+# n/p/k are available kg/ha (P as P, K as K2O), oc in %, micronutrients in ppm. `block` may be
+# empty for district-level rows; `samples` weights the district and state averages. Missing
+# values are left empty.
+
+import csv
+import os
+import re
+
+import numpy as np
+
+from config import SOIL_DATA_DIR, SOIL_DATA_MAX_MB
+from services.cache import TTLCache
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # optional: CSV only
+    pq = None
+
+NUTRIENTS = ("n", "p", "k", "ph", "oc", "zn", "fe", "mn", "cu", "b")
+
+# Soil test ratings (Soil Health Card guidelines): below the first value is low, above the second high
+RATING_LIMITS = {
+    "n": (280.0, 560.0),
+    "p": (10.0, 25.0),
+    "k": (108.0, 280.0),
+    "oc": (0.5, 0.75),
+}
+# Deficiency limits for micronutrients (ppm, DTPA-extractable; boron hot-water soluble)
+MICRO_LIMITS = {"zn": 0.6, "fe": 4.5, "mn": 2.0, "cu": 0.2, "b": 0.5}
+PH_ACIDIC = 5.5      # below: liming
+PH_SODIC = 8.5       # above: gypsum
+
+# Recommended N-P2O5-K2O (kg/ha) for a medium-fertility soil; scaled by the soil test rating
+CROP_NPK = {
+    "default": (100.0, 50.0, 50.0),
+    "wheat": (120.0, 60.0, 40.0),
+    "rice": (100.0, 50.0, 50.0),
+    "maize": (120.0, 60.0, 40.0),
+    "cotton": (100.0, 50.0, 50.0),
+    "soybean": (20.0, 60.0, 40.0),
+    "mustard": (80.0, 40.0, 40.0),
+    "chickpea": (20.0, 40.0, 20.0),
+    "sugarcane": (250.0, 100.0, 120.0),
+}
+# Dose multiplier for low / medium / high soil test values
+RATING_FACTOR = (1.25, 1.0, 0.75)
+
+# Nutrient content of the straight fertilizers the doses are expressed in
+UREA_N = 0.46
+DAP_N, DAP_P2O5 = 0.18, 0.46
+MOP_K2O = 0.60
+ZINC_SULPHATE_KG = 25.0
+BORAX_KG = 10.0
+
+SOIL_DATA_TTL = int(os.environ.get("SOIL_DATA_TTL", "900"))   # seconds before a state file is re-read
+
+_COLUMN_ALIASES = {
+    "nitrogen": "n", "phosphorus": "p", "potassium": "k", "organic_carbon": "oc",
+    "zinc": "zn", "iron": "fe", "manganese": "mn", "copper": "cu", "boron": "b",
+    "sample_count": "samples",
+}
+
+
+def state_slug(state):
+    return re.sub(r"[^a-z0-9]+", "_", (state or "").strip().lower()).strip("_")
+
+
+def _key(name):
+    return " ".join((name or "").lower().split())
+
+
+class SoilTable:
+    """One state's soil test rows as columns; row lookup by (district, block) name."""
+    __slots__ = ("state", "districts", "blocks", "district_idx", "samples", "values",
+                 "_codes", "_rows", "_district_rows", "_district_means", "_state_mean", "nbytes", "version")
+
+    def __init__(self, state, district_names, block_names, samples, values):
+        self.state = state
+        self.version = None  # source file mtime, set by load_state_table
+        self.districts = sorted(set(district_names))
+        codes = {name: i for i, name in enumerate(self.districts)}
+        self.district_idx = np.array([codes[d] for d in district_names], dtype=np.int32)
+        self._codes = {_key(name): i for name, i in codes.items()}
+        self.blocks = block_names
+        self.samples = np.asarray(samples, dtype=np.float32)
+        self.values = {name: np.asarray(values[name], dtype=np.float32) for name in NUTRIENTS}
+        self._rows = {}
+        self._district_rows = {}
+        for i, (district, block) in enumerate(zip(district_names, block_names)):
+            if block:
+                self._rows[(_key(district), _key(block))] = i
+            else:
+                self._district_rows[_key(district)] = i
+        self._district_means = self._weighted_means(self.district_idx, len(self.districts))
+        self._state_mean = self._weighted_means(np.zeros(len(self.samples), dtype=np.int32), 1)
+        self.nbytes = (self.samples.nbytes + self.district_idx.nbytes
+                       + sum(a.nbytes for a in self.values.values())
+                       + sum(a.nbytes for a in self._district_means.values())
+                       + 120 * (len(self._rows) + len(self._district_rows) + len(self.districts)))
+
+    def _weighted_means(self, groups, n_groups):
+        """Sample-weighted mean of every nutrient per group, ignoring missing values."""
+        # Block rows feed the averages; district-level rows only where a district has no blocks
+        has_blocks = np.zeros(n_groups, dtype=bool)
+        is_block = np.array([bool(b) for b in self.blocks], dtype=bool)
+        has_blocks[groups[is_block]] = True
+        use = is_block | ~has_blocks[groups]
+        weights = np.where(use, np.maximum(self.samples, 1.0), 0.0)
+        means = {}
+        for name, col in self.values.items():
+            known = ~np.isnan(col)
+            total = np.bincount(groups, weights=np.where(known, col * weights, 0.0), minlength=n_groups)
+            count = np.bincount(groups, weights=np.where(known, weights, 0.0), minlength=n_groups)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[name] = (total / count).astype(np.float32)
+        return means
+
+    def __len__(self):
+        return len(self.samples)
+
+    def lookup(self, district=None, block=None):
+        """Most specific values available: block row, then district, then state average.
+
+        Returns (level, name, {nutrient: value}) with NaN for values the data does not have.
+        """
+        d, b = _key(district), _key(block)
+        if d and b and (d, b) in self._rows:
+            i = self._rows[(d, b)]
+            return "block", self.blocks[i], {k: float(v[i]) for k, v in self.values.items()}
+        if d in self._district_rows:
+            i = self._district_rows[d]
+            return "district", self.districts[self.district_idx[i]], {
+                k: float(v[i]) for k, v in self.values.items()}
+        code = self._codes.get(d)
+        if code is not None:
+            return "district", self.districts[code], {k: float(v[code]) for k, v in self._district_means.items()}
+        return "state", self.state, {k: float(v[0]) for k, v in self._state_mean.items()}
+
+    def rows_for(self, district=None):
+        """Indices of the block/district rows of one district (all rows if district is None)."""
+        if not district:
+            return np.arange(len(self))
+        code = self._codes.get(_key(district))
+        return np.flatnonzero(self.district_idx == code) if code is not None else np.arange(0)
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _normalize_columns(names):
+    out = []
+    for name in names:
+        key = re.sub(r"[^a-z0-9]+", "_", str(name).strip().lower()).strip("_")
+        out.append(_COLUMN_ALIASES.get(key, key))
+    return out
+
+
+def _read_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = _normalize_columns(next(reader, []))
+        rows = [dict(zip(header, row)) for row in reader if row]
+    return {name: [r.get(name) for r in rows] for name in set(header) | {"block", "samples", *NUTRIENTS}}
+
+
+def _read_parquet(path):
+    table = pq.read_table(path)
+    columns = dict(zip(_normalize_columns(table.column_names), table.columns))
+    n = table.num_rows
+    return {name: columns[name].to_pylist() if name in columns else [None] * n
+            for name in set(columns) | {"block", "samples", *NUTRIENTS}}
+
+
+def _state_file(state):
+    slug = state_slug(state)
+    if not slug:
+        return None
+    if pq is not None and (SOIL_DATA_DIR / f"{slug}.parquet").exists():
+        return SOIL_DATA_DIR / f"{slug}.parquet"
+    path = SOIL_DATA_DIR / f"{slug}.csv"
+    return path if path.exists() else None
+
+
+def load_state_table(state):
+    """Read one state's file into a SoilTable (None when the state has no data file)."""
+    path = _state_file(state)
+    if path is None:
+        return None
+    cols = _read_parquet(path) if path.suffix == ".parquet" else _read_csv(path)
+    districts = [(d or "").strip() for d in cols.get("district") or []]
+    keep = [i for i, d in enumerate(districts) if d]
+    if not keep:
+        return None
+    blocks = [(cols["block"][i] or "").strip() for i in keep]
+    samples = [_float(cols["samples"][i]) for i in keep]
+    samples = np.nan_to_num(np.array(samples, dtype=np.float32), nan=1.0)
+    values = {name: np.array([_float(cols[name][i]) for i in keep], dtype=np.float32) for name in NUTRIENTS}
+    table = SoilTable(state.strip(), [districts[i] for i in keep], blocks, samples, values)
+    table.version = os.stat(path).st_mtime_ns
+    return table
+
+
+_tables = TTLCache(ttl=SOIL_DATA_TTL, stale_ttl=24 * 3600, max_entries=64,
+                   max_bytes=int(SOIL_DATA_MAX_MB * 1024 * 1024),
+                   sizeof=lambda t: t.nbytes if t is not None else 64)
+
+
+def get_state_table(state):
+    slug = state_slug(state)
+    if not slug:
+        return None
+    return _tables.get_or_load(slug, lambda: load_state_table(state))
+
+
+def data_version(state):
+    """Version of the state's loaded soil table (None without data); changes when the file is re-read."""
+    table = get_state_table(state) if state else None
+    return table.version if table is not None else None
+
+
+def _rating(values, limits):
+    """0 low, 1 medium, 2 high; NaN (not tested) counts as medium."""
+    lo, hi = limits
+    return np.where(values < lo, 0, np.where(values > hi, 2, 1))
+
+
+def fertilizer_doses(values, crop=None):
+    """Vectorized doses for arrays of soil values ({nutrient: array}); returns a dict of arrays.
+
+    The crop's recommended N-P2O5-K2O is scaled per nutrient by the soil test rating, then expressed
+    as DAP (meeting P first, its N credited), urea for the remaining N and MOP for K.
+    """
+    crop_key = (crop or "").strip().lower()
+    n_rec, p_rec, k_rec = CROP_NPK.get(crop_key, CROP_NPK["default"])
+    factor = np.array(RATING_FACTOR)
+    n = n_rec * factor[_rating(values["n"], RATING_LIMITS["n"])]
+    p2o5 = p_rec * factor[_rating(values["p"], RATING_LIMITS["p"])]
+    k2o = k_rec * factor[_rating(values["k"], RATING_LIMITS["k"])]
+    dap = p2o5 / DAP_P2O5
+    urea = np.clip(n - dap * DAP_N, 0, None) / UREA_N
+    mop = k2o / MOP_K2O
+    return {
+        "n_kg_ha": n, "p2o5_kg_ha": p2o5, "k2o_kg_ha": k2o,
+        "urea_kg_ha": urea, "dap_kg_ha": dap, "mop_kg_ha": mop,
+        "zinc_sulphate_kg_ha": np.where(values["zn"] < MICRO_LIMITS["zn"], ZINC_SULPHATE_KG, 0.0),
+        "borax_kg_ha": np.where(values["b"] < MICRO_LIMITS["b"], BORAX_KG, 0.0),
+        "lime": values["ph"] < PH_ACIDIC,
+        "gypsum": values["ph"] > PH_SODIC,
+    }
+
+
+_LEVELS = ("low", "medium", "high")
+
+
+def _columns(doses):
+    """Dose arrays as Python lists: kg/ha rounded to whole kg, amendment flags as bools."""
+    return {name: arr.tolist() if arr.dtype == bool else np.round(arr).astype(np.int64).tolist()
+            for name, arr in doses.items()}
+
+
+def _clean(value, digits=2):
+    return None if value != value else round(value, digits)
+
+
+def soil_report(state, district=None, block=None, crop=None):
+    """Soil test values, ratings and a fertilizer plan for the most specific region with data.
+
+    None when the state has no soil data file.
+    """
+    table = get_state_table(state)
+    if table is None:
+        return None
+    level, name, values = table.lookup(district, block)
+    arrays = {k: np.array([v], dtype=np.float32) for k, v in values.items()}
+    doses = fertilizer_doses(arrays, crop)
+    ratings = {k: _LEVELS[int(_rating(arrays[k], lim)[0])] if values[k] == values[k] else None
+               for k, lim in RATING_LIMITS.items()}
+    deficient = [k for k, lim in MICRO_LIMITS.items() if values[k] < lim]
+    return {
+        "level": level,
+        "name": name,
+        "values": {k: _clean(v) for k, v in values.items()},
+        "ratings": ratings,
+        "deficient_micronutrients": deficient,
+        "fertilizer": dict({k: v[0] for k, v in _columns(doses).items()},
+                           crop=(crop or "default").strip().lower()),
+    }
+
+
+def fertilizer_table(state, crop=None, district=None):
+    """Fertilizer plan for every block (or district row) of a state or one district, computed in one pass."""
+    table = get_state_table(state)
+    if table is None:
+        return None
+    rows = table.rows_for(district)
+    columns = _columns(fertilizer_doses({k: v[rows] for k, v in table.values.items()}, crop))
+    columns["district"] = [table.districts[c] for c in table.district_idx[rows].tolist()]
+    columns["block"] = [table.blocks[i] or None for i in rows.tolist()]
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def soil_data_stats():
+    return _tables.stats()
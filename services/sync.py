@@ -0,0 +1,298 @@
+# Offline-first sync bundle for low-bandwidth field clients (/api/sync)
+# One request returns what the dashboard needs: weather for the user's grid cell, the mandi rows the
+# user follows, the scheme list and the locale strings of the requested modules. The client sends back
+# the version vector of its last bundle, and each section only carries what changed since then.
+#
+# Mandi, schemes and locale strings are diffed against versioned snapshots: for the last
+# SYNC_SNAPSHOT_KEEP versions of each dataset the server keeps a hash per item, so "what changed since
+# version V" is a dict comparison. A client version that is no longer held (or a changed follow list /
+# module list) gets the section in full. Weather is a single item per cell: sent whenever it changed.
+#
+# Wire format: MessagePack or CBOR when the client accepts it and the library is installed, else
+# compact JSON; gzip/brotli on top.
+
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from config import DEFAULT_LANGUAGE, LANGUAGE_CODES, TRANSLATION_MODULES
+from locale_bundles import bundle_data, bundle_version
+from services.mandi_store import data_version as mandi_data_version, query_prices
+from services.schemes import SCHEMES_VERSION, get_schemes
+from services.weather import fetch_weather, grid_cell
+
+try:
+    import msgpack
+except ImportError:  # optional: MessagePack wire format
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional: CBOR wire format
+    cbor2 = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+SYNC_SNAPSHOT_KEEP = int(os.environ.get("SYNC_SNAPSHOT_KEEP", "8"))
+BUNDLE_FORMAT_VERSION = 1
+MAX_FOLLOWS = 50
+DEFAULT_MODULES = ("common", "dashboard")
+# Smaller bodies are sent uncompressed (compression framing would outweigh the savings)
+MIN_COMPRESS_BYTES = 256
+# Upper bound for the whole-store query that builds a mandi snapshot
+_MANDI_SNAPSHOT_ROWS = 10_000_000
+
+MIMETYPES = {"msgpack": "application/msgpack", "cbor": "application/cbor", "json": "application/json"}
+
+
+def _digest(value):
+    """Stable (cross-process) 32-bit hash of a JSON-able value."""
+    return zlib.crc32(json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+                                 default=str).encode("utf-8"))
+
+
+class SnapshotLog:
+    """Recent versions of one grouped, keyed dataset ({group: {key: value}}), for diffing.
+
+    The newest version keeps its values; every held version keeps a hash per item.
+    """
+
+    def __init__(self, keep=SYNC_SNAPSHOT_KEEP):
+        self.keep = keep
+        self._hashes = OrderedDict()    # version -> {group: {key: hash}}
+        self._values = (None, None)     # (version, {group: {key: value}})
+        self._lock = threading.Lock()
+
+    def current(self, version, build):
+        """(values, hashes) of `version`, calling build() the first time it is seen."""
+        with self._lock:
+            if self._values[0] == version:
+                return self._values[1], self._hashes[version]
+        values = build()
+        hashes = {group: {key: _digest(v) for key, v in items.items()} for group, items in values.items()}
+        with self._lock:
+            self._hashes[version] = hashes
+            self._hashes.move_to_end(version)
+            while len(self._hashes) > self.keep:
+                self._hashes.popitem(last=False)
+            self._values = (version, values)
+        return values, hashes
+
+    def hashes(self, version):
+        with self._lock:
+            return self._hashes.get(version)
+
+    def versions(self):
+        with self._lock:
+            return len(self._hashes)
+
+
+def _section(log, version, build, select, selector, client_token):
+    """(token, section or None when the client is current) for one dataset.
+
+    select(group, keys) yields the keys of a group the client wants; `selector` (follows, modules)
+    is part of the token, so changing it falls back to a full section.
+    """
+    sel = f"{_digest(selector):08x}"
+    token = f"{version}~{sel}"
+    if client_token == token:
+        return token, None
+    values, hashes = log.current(version, build)
+    old = None
+    if client_token:
+        old_version, _, old_sel = str(client_token).rpartition("~")
+        if old_sel == sel:
+            old = log.hashes(old_version)
+    items, removed = {}, {}
+    for group in sorted(set(hashes) | set(old or ())):
+        current = hashes.get(group, {})
+        keys = list(select(group, current))
+        if old is None:
+            changed = keys
+        else:
+            before = old.get(group, {})
+            changed = [k for k in keys if before.get(k) != current[k]]
+            gone = [k for k in select(group, before) if k not in current]
+            if gone:
+                removed[group] = gone
+        if changed:
+            items[group] = {k: values[group][k] for k in changed}
+    out = {"full": old is None, "items": items}
+    if removed:
+        out["removed"] = removed
+    return token, out
+
+
+# ---------- datasets ----------
+
+_mandi_log = SnapshotLog()
+_scheme_logs = {}   # lang -> SnapshotLog
+_locale_logs = {}   # lang -> SnapshotLog
+_logs_lock = threading.Lock()
+_stats = {"bundles": 0, "full_sections": 0, "delta_sections": 0, "unchanged_sections": 0}
+_stats_lock = threading.Lock()
+
+
+def _log_for(logs, lang):
+    with _logs_lock:
+        log = logs.get(lang)
+        if log is None:
+            log = logs[lang] = SnapshotLog()
+        return log
+
+
+def _build_mandi():
+    """Latest row per state/market/commodity/variety, grouped by commodity (lowercase)."""
+    out = {}
+    for p in query_prices(latest_only=True, limit=_MANDI_SNAPSHOT_ROWS):
+        key = f"{p['state']}|{p['market']}|{p.get('variety') or ''}"
+        out.setdefault(p["commodity"].lower(), {})[key] = [
+            p["arrival_date"], p.get("min_price"), p.get("max_price"), p.get("modal_price")]
+    return out
+
+
+def _build_schemes(lang):
+    return {"": {s["id"]: s for s in get_schemes(lang=lang)}}
+
+
+def _flatten(data, prefix, out):
+    for k, v in data.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            _flatten(v, key, out)
+        else:
+            out[key] = v
+    return out
+
+
+def _build_locale(lang):
+    return {module: _flatten(strings, "", {}) for module, strings in bundle_data(lang).items()}
+
+
+def parse_follows(follows):
+    """Normalize [{commodity, state?, market?}] (or "Commodity" strings); raises ValueError."""
+    if not isinstance(follows, list):
+        raise ValueError("follows must be a list")
+    if len(follows) > MAX_FOLLOWS:
+        raise ValueError(f"At most {MAX_FOLLOWS} follows")
+    out = []
+    for f in follows:
+        if isinstance(f, str):
+            f = {"commodity": f}
+        if not isinstance(f, dict) or not str(f.get("commodity") or "").strip():
+            raise ValueError("Each follow needs a commodity")
+        out.append((str(f["commodity"]).strip().lower(), str(f.get("state") or "").strip().lower(),
+                    str(f.get("market") or "").strip().lower()))
+    return sorted(set(out))
+
+
+def _mandi_select(follows):
+    by_commodity = {}
+    for commodity, state, market in follows:
+        by_commodity.setdefault(commodity, []).append((state, market))
+
+    def select(group, keys):
+        wanted = by_commodity.get(group)
+        if not wanted:
+            return
+        for key in keys:
+            state, market, _ = key.lower().split("|", 2)
+            if any((not s or s == state) and (not m or m == market) for s, m in wanted):
+                yield key
+    return select
+
+
+def build_bundle(lang, lat=None, lon=None, follows=(), modules=DEFAULT_MODULES, versions=None):
+    """The sync bundle for one client: sections that changed since `versions` plus the new version vector."""
+    versions = versions if isinstance(versions, dict) else {}
+    lang = lang if lang in LANGUAGE_CODES else DEFAULT_LANGUAGE
+    modules = sorted(m for m in set(modules) if m in TRANSLATION_MODULES)
+    bundle = {"v": BUNDLE_FORMAT_VERSION, "lang": lang, "generated": int(time.time())}
+    new_versions = {}
+
+    weather = fetch_weather(lat, lon)
+    token = f"{_digest(weather):08x}"
+    new_versions["weather"] = token
+    sections = {"weather": None if versions.get("weather") == token else weather}
+    if sections["weather"] is not None:
+        sections["weather"]["cell"] = list(grid_cell(lat, lon))
+
+    new_versions["mandi"], sections["mandi"] = _section(
+        _mandi_log, str(mandi_data_version()), _build_mandi, _mandi_select(follows), follows,
+        versions.get("mandi"))
+    new_versions["schemes"], sections["schemes"] = _section(
+        _log_for(_scheme_logs, lang), SCHEMES_VERSION, lambda: _build_schemes(lang),
+        lambda group, keys: keys, None, versions.get("schemes"))
+    new_versions["locale"], sections["locale"] = _section(
+        _log_for(_locale_logs, lang), bundle_version(lang), lambda: _build_locale(lang),
+        lambda group, keys: keys if group in modules else (), modules, versions.get("locale"))
+
+    with _stats_lock:
+        _stats["bundles"] += 1
+        for name, section in sections.items():
+            if section is None:
+                _stats["unchanged_sections"] += 1
+            elif name != "weather" and not section["full"]:
+                _stats["delta_sections"] += 1
+            else:
+                _stats["full_sections"] += 1
+    bundle.update((name, section) for name, section in sections.items() if section is not None)
+    bundle["versions"] = new_versions
+    return bundle
+
+
+# ---------- wire format ----------
+
+def available_formats():
+    """Wire formats this server can produce, preferred first."""
+    return [f for f, lib in (("msgpack", msgpack), ("cbor", cbor2)) if lib is not None] + ["json"]
+
+
+def negotiate_format(accept_mimetypes, requested=None):
+    """Explicit ?format= if available, else a binary format the client lists by name, else JSON.
+
+    Wildcards do not count: a client only gets MessagePack/CBOR if it says it can decode them.
+    """
+    formats = available_formats()
+    if requested in formats:
+        return requested
+    listed = {mime for mime, q in accept_mimetypes if q > 0}
+    for fmt in formats:
+        if MIMETYPES[fmt] in listed:
+            return fmt
+    return "json"
+
+
+def encode_bundle(bundle, fmt="json"):
+    """Serialize a bundle: (body bytes, mimetype)."""
+    if fmt == "msgpack" and msgpack is not None:
+        return msgpack.packb(bundle, use_bin_type=True), MIMETYPES["msgpack"]
+    if fmt == "cbor" and cbor2 is not None:
+        return cbor2.dumps(bundle), MIMETYPES["cbor"]
+    return (json.dumps(bundle, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), MIMETYPES["json"])
+
+
+def compress(body, accept_br=False, accept_gzip=False):
+    """(body, content encoding or None) using the best encoding the client accepts."""
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if accept_br and brotli is not None:
+        return brotli.compress(body, quality=5), "br"
+    if accept_gzip:
+        return gzip.compress(body, compresslevel=6, mtime=0), "gzip"
+    return body, None
+
+
+def sync_stats():
+    with _stats_lock:
+        out = dict(_stats)
+    out["mandi_versions_held"] = _mandi_log.versions()
+    out["formats"] = available_formats()
+    return out
@@ -0,0 +1,372 @@
+# Shared upstream HTTP client: keep-alive connection pools, circuit breaker, retry budget, latency histograms
+# Every outbound call to Open-Meteo / data.gov.in goes through an Upstream, so a failing service is
+# detected once and short-circuited for everyone instead of costing each request a full timeout.
+
+import bisect
+import contextlib
+import gzip
+import http.client
+import json
+import os
+import random
+import ssl
+import threading
+import time
+import urllib.parse
+
+UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", "16"))          # idle connections kept per host
+UPSTREAM_KEEPALIVE = float(os.environ.get("UPSTREAM_KEEPALIVE", "30"))          # seconds an idle connection is reused
+UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", "2"))
+UPSTREAM_RETRY_RATIO = float(os.environ.get("UPSTREAM_RETRY_RATIO", "0.2"))     # retries allowed per request made
+UPSTREAM_BREAKER_FAILURES = int(os.environ.get("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET = float(os.environ.get("UPSTREAM_BREAKER_RESET", "30"))
+
+BACKOFF_BASE = 0.1
+BACKOFF_CAP = 2.0
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HEADERS = {"User-Agent": "KrishiSaathi/1.0", "Accept": "application/json", "Accept-Encoding": "gzip"}
+_RETRYABLE_STATUS = frozenset((429, 500, 502, 503, 504))
+# Raised when the server already closed an idle keep-alive connection; retried once on a fresh one
+_STALE_ERRORS = (ConnectionError, http.client.BadStatusLine)
+_ssl_context = ssl.create_default_context()
+
+_registry = {}
+
+
+class UpstreamError(OSError):
+    """An upstream call failed. Subclasses OSError so existing `except OSError` fallbacks still apply."""
+
+
+class UpstreamHTTPError(UpstreamError):
+    def __init__(self, name, status):
+        super().__init__(f"{name}: HTTP {status}")
+        self.status = status
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised without touching the network while an upstream's breaker is open."""
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram (Prometheus layout) with interpolated percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += seconds
+
+    def quantile(self, q, counts=None):
+        if counts is None:
+            with self._lock:
+                counts = list(self._counts)
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+        cumulative = {}
+        running = 0
+        for bound, n in zip(self.buckets + ("+Inf",), counts):
+            running += n
+            cumulative[str(bound)] = running
+        out = {"count": running, "sum": round(total_sum, 6), "buckets": cumulative}
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = self.quantile(q, counts)
+            out[name] = round(value, 6) if value is not None else None
+        return out
+
+
+class RetryBudget:
+    """Token bucket for retries: each request deposits `ratio` tokens and each retry spends one,
+    so retries stay a bounded fraction of traffic; `min_per_sec` keeps a few available when idle."""
+
+    def __init__(self, ratio=UPSTREAM_RETRY_RATIO, min_per_sec=1.0, cap=10.0):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.cap = cap
+        self._balance = cap
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._balance = min(self.cap, self._balance + (now - self._updated) * self.min_per_sec)
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill_locked()
+            self._balance = min(self.cap, self._balance + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            self._refill_locked()
+            if self._balance >= 1.0:
+                self._balance -= 1.0
+                return True
+            return False
+
+    @property
+    def balance(self):
+        with self._lock:
+            self._refill_locked()
+            return self._balance
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures; after `reset_after` seconds
+    one probe call is let through (half_open) and its outcome closes or re-opens the circuit."""
+
+    def __init__(self, failure_threshold=UPSTREAM_BREAKER_FAILURES, reset_after=UPSTREAM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.trips = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_after:
+                    return False
+                self.state = "half_open"
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def retry_in(self):
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_after - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """An attempt ended without a verdict (e.g. cancelled); let another probe through."""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self._failures, "trips": self.trips}
+
+
+class _HostPool:
+    """LIFO stack of idle keep-alive connections to one scheme://host:port."""
+
+    def __init__(self, scheme, netloc, size):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get(self, timeout, fresh=False):
+        """(connection, reused); reused connections idle longer than UPSTREAM_KEEPALIVE are dropped."""
+        if not fresh:
+            now = time.monotonic()
+            with self._lock:
+                while self._idle:
+                    conn, released_at = self._idle.pop()
+                    if now - released_at < UPSTREAM_KEEPALIVE:
+                        conn.timeout = timeout
+                        if conn.sock is not None:
+                            conn.sock.settimeout(timeout)
+                        return conn, True
+                    conn.close()
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.netloc, timeout=timeout, context=_ssl_context), False
+        return http.client.HTTPConnection(self.netloc, timeout=timeout), False
+
+    def put(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def idle(self):
+        with self._lock:
+            return len(self._idle)
+
+
+class Upstream:
+    """One logical upstream service (pools are per host, so the base URL may be repointed)."""
+
+    def __init__(self, name, timeout=10.0, retries=UPSTREAM_RETRIES, pool_size=UPSTREAM_POOL_SIZE,
+                 breaker=None, retry_budget=None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_budget = retry_budget or RetryBudget()
+        self.latency = LatencyHistogram()
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "ok": 0, "failures": 0, "http_errors": 0, "short_circuited": 0,
+                          "retries": 0, "retry_budget_exhausted": 0,
+                          "connections_opened": 0, "connections_reused": 0}
+        _registry[name] = self
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._counters[key] += n
+
+    def _pool(self, scheme, netloc):
+        key = (scheme, netloc)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.setdefault(key, _HostPool(scheme, netloc, self.pool_size))
+        return pool
+
+    @contextlib.contextmanager
+    def attempt(self):
+        """Guard one network attempt: short-circuit while open, time it and feed the breaker.
+
+        Any exception from the block counts as an upstream failure, except non-retryable HTTP
+        errors (e.g. 403 for a bad API key), which prove the service itself is up.
+        """
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError(f"{self.name}: circuit open, retrying in {self.breaker.retry_in():.0f}s")
+        start = time.monotonic()
+        try:
+            yield
+        except UpstreamHTTPError as e:
+            if e.status in _RETRYABLE_STATUS:
+                self.breaker.record_failure()
+                self._count("failures")
+            else:
+                self.breaker.record_success()
+                self._count("http_errors")
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            self._count("failures")
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        else:
+            self.breaker.record_success()
+            self._count("ok")
+        finally:
+            self.latency.observe(time.monotonic() - start)
+
+    def get(self, url, timeout=None):
+        """GET url and return the (decompressed) body bytes.
+
+        Raises CircuitOpenError while the breaker is open, UpstreamHTTPError for non-2xx replies and
+        UpstreamError for network failures. Connection errors, timeouts and 429/5xx replies are
+        retried with full-jitter exponential backoff while the retry budget allows.
+        """
+        timeout = timeout or self.timeout
+        self._count("requests")
+        self.retry_budget.deposit()
+        tries = 0
+        while True:
+            try:
+                with self.attempt():
+                    return self._request(url, timeout)
+            except CircuitOpenError:
+                raise
+            except UpstreamError as e:
+                if isinstance(e, UpstreamHTTPError) and e.status not in _RETRYABLE_STATUS:
+                    raise
+                if tries >= self.retries:
+                    raise
+                if not self.retry_budget.try_spend():
+                    self._count("retry_budget_exhausted")
+                    raise
+            tries += 1
+            self._count("retries")
+            time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** tries)))
+
+    def get_json(self, url, timeout=None):
+        return json.loads(self.get(url, timeout))
+
+    def _request(self, url, timeout):
+        parts = urllib.parse.urlsplit(url)
+        pool = self._pool(parts.scheme, parts.netloc)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        fresh = False
+        while True:
+            conn, reused = pool.get(timeout, fresh)
+            try:
+                conn.request("GET", path, headers=_HEADERS)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if reused and isinstance(e, _STALE_ERRORS):
+                    fresh = True
+                    continue
+                raise UpstreamError(f"{self.name}: {e!r}") from e
+            self._count("connections_reused" if reused else "connections_opened")
+            if resp.will_close:
+                conn.close()
+            else:
+                pool.put(conn)
+            if not 200 <= resp.status < 300:
+                raise UpstreamHTTPError(self.name, resp.status)
+            if resp.getheader("Content-Encoding", "").lower() == "gzip":
+                body = gzip.decompress(body)
+            return body
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._counters)
+            pools = list(self._pools.values())
+        out["breaker"] = self.breaker.snapshot()
+        out["retry_budget"] = round(self.retry_budget.balance, 2)
+        out["idle_connections"] = {p.netloc: p.idle() for p in pools}
+        out["latency_seconds"] = self.latency.snapshot()
+        return out
+
+
+def upstream_stats():
+    return {name: upstream.stats() for name, upstream in _registry.items()}
@@ -1,22 +1,73 @@
 # Real-time weather via Open-Meteo (free, no API key)
 # https://open-meteo.com/en/docs
 
+import asyncio
+import math
 import os
-import urllib.request
-import urllib.error
 import json
+import threading
+from collections import Counter
 
-OPEN_METEO_BASE = "https://api.open-meteo.com/v1"
+from services.cache import TTLCache
+from services.cache_backends import shared_cache
+from services.forecast import DAILY_VARS, HOURLY_VARS, parse_forecast
+from services.metrics import stage
+from services.upstream import Upstream
+
+# OPEN_METEO_BASE can point at a local stand-in (tests.standins) for load tests
+OPEN_METEO_BASE = os.environ.get("OPEN_METEO_BASE", "https://api.open-meteo.com/v1")
 DEFAULT_LAT = 28.6139   # Delhi
 DEFAULT_LON = 77.2090
 
+# Forecast cache: coordinates are snapped to a grid (degrees) so nearby farms share one entry.
+# Fresh for TTL seconds, then served stale (while refreshing in background) for STALE more seconds.
+WEATHER_CACHE_GRID = float(os.environ.get("WEATHER_CACHE_GRID", "0.1"))
+WEATHER_CACHE_TTL = float(os.environ.get("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_STALE = float(os.environ.get("WEATHER_CACHE_STALE", "3600"))
+# Forecast horizon requested from Open-Meteo (it serves up to 16 days)
+WEATHER_FORECAST_DAYS = min(max(int(os.environ.get("WEATHER_FORECAST_DAYS", "7")), 1), 16)
+
+_open_meteo = Upstream("open-meteo", timeout=10)
+_shared_forecasts = shared_cache("weather")
+_refresh_listeners = []
+
+
+def on_forecast_refresh(callback):
+    """Register callback(cell, previous, forecast) run whenever a cell gets a newly fetched forecast.
+
+    `previous` is the forecast held before (None if none); callbacks must be quick and not raise.
+    A forecast another worker fetched (read from the shared cache tier) counts as newly fetched.
+    """
+    _refresh_listeners.append(callback)
+
+
+def _refreshed(cell, forecast):
+    if _refresh_listeners:
+        previous = _forecast_cache.peek(cell)
+        for callback in list(_refresh_listeners):
+            callback(cell, previous, forecast)
+
+
+_forecast_cache = TTLCache(
+    ttl=WEATHER_CACHE_TTL,
+    stale_ttl=WEATHER_CACHE_STALE,
+    max_entries=int(os.environ.get("WEATHER_CACHE_MAX_ENTRIES", "5000")),
+    max_bytes=int(os.environ.get("WEATHER_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    sizeof=lambda forecast: forecast.nbytes,
+    # Per-worker copies only need the shared tier when other workers can read it
+    shared=_shared_forecasts if _shared_forecasts.shared else None,
+    on_load=_refreshed,
+)
+
 
 def _get_url(lat, lon):
     return (
         f"{OPEN_METEO_BASE}/forecast?"
         f"latitude={lat}&longitude={lon}"
         "&current=temperature_2m,relative_humidity_2m,precipitation,weather_code,wind_speed_10m"
-        "&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,weather_code"
+        f"&hourly={','.join(HOURLY_VARS)}"
+        f"&daily={','.join(DAILY_VARS)}"
+        f"&forecast_days={WEATHER_FORECAST_DAYS}"
         "&timezone=Asia/Kolkata"
     )
 
@@ -38,35 +89,273 @@ def _wmo_code_to_label(code):
     return "cloudy"
 
 
+def coordinate(value):
+    """float(value) for a latitude or longitude; raises ValueError for NaN and infinities."""
+    try:
+        value = float(value)
+    except OverflowError:  # an integer too large for a float
+        raise ValueError("Coordinates must be finite numbers") from None
+    if not math.isfinite(value):
+        raise ValueError("Coordinates must be finite numbers")
+    return value
+
+
+def snap_to_grid(lat, lon, step=None):
+    """Snap coordinates to the nearest node of the cache grid; raises ValueError if not finite."""
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise ValueError("Coordinates must be finite numbers")
+    step = step or WEATHER_CACHE_GRID
+    return (round(round(lat / step) * step, 4), round(round(lon / step) * step, 4))
+
+
+# Requests per grid cell since the last decay; the prefetch scheduler refreshes busy cells first
+_cell_demand = Counter()
+# Cells kept fresh without requests, e.g. those with weather alert subscribers; not decayed
+_watched_cells = Counter()
+_demand_lock = threading.Lock()
+
+
+def _note_demand(cell):
+    with _demand_lock:
+        _cell_demand[cell] += 1
+
+
+def cell_demand():
+    with _demand_lock:
+        return dict(_cell_demand)
+
+
+def watch_cell(cell):
+    """Ask the prefetch scheduler to keep `cell` fresh until a matching unwatch_cell (counted)."""
+    with _demand_lock:
+        _watched_cells[cell] += 1
+
+
+def unwatch_cell(cell):
+    with _demand_lock:
+        _watched_cells[cell] -= 1
+        if _watched_cells[cell] <= 0:
+            del _watched_cells[cell]
+
+
+def watched_cells():
+    with _demand_lock:
+        return list(_watched_cells)
+
+
+def decay_cell_demand(factor=0.5):
+    """Scale request counts down so priority follows recent rather than all-time volume."""
+    with _demand_lock:
+        for cell, n in list(_cell_demand.items()):
+            n = int(n * factor)
+            if n:
+                _cell_demand[cell] = n
+            else:
+                del _cell_demand[cell]
+
+
+def grid_cell(lat=None, lon=None):
+    """Cache grid cell for coordinates; missing coordinates mean the configured default location."""
+    lat = coordinate(lat or os.environ.get("WEATHER_LAT", DEFAULT_LAT))
+    lon = coordinate(lon or os.environ.get("WEATHER_LON", DEFAULT_LON))
+    return snap_to_grid(lat, lon)
+
+
+def get_forecast(lat=None, lon=None, note_demand=True):
+    """Cached Forecast (NumPy arrays) for the grid cell; raises OSError/ValueError if unavailable.
+
+    With the upstream down, the last forecast held for the cell is returned instead of raising.
+    The returned object is shared: treat its arrays as read-only. Pass note_demand=False when the
+    request already counted towards the cell's demand (e.g. through fetch_weather).
+    """
+    cell = grid_cell(lat, lon)
+    if note_demand:
+        _note_demand(cell)
+    try:
+        with stage("cache.weather"):
+            return _forecast_cache.get_or_load(cell, lambda: _fetch_forecast(*cell))
+    except (OSError, json.JSONDecodeError):
+        forecast = _forecast_cache.peek(cell)
+        if forecast is None:
+            raise
+        return forecast
+
+
 def fetch_weather(lat=None, lon=None):
-    lat = float(lat or os.environ.get("WEATHER_LAT", DEFAULT_LAT))
-    lon = float(lon or os.environ.get("WEATHER_LON", DEFAULT_LON))
-    url = _get_url(lat, lon)
+    cell = grid_cell(lat, lon)
+    _note_demand(cell)
     try:
-        with urllib.request.urlopen(url, timeout=10) as resp:
-            data = json.loads(resp.read().decode())
-    except (urllib.error.URLError, json.JSONDecodeError, OSError) as e:
-        return {"error": str(e), "current": None, "daily": None}
+        with stage("cache.weather"):
+            forecast = _forecast_cache.get_or_load(cell, lambda: _fetch_forecast(*cell))
+    except (OSError, json.JSONDecodeError) as e:
+        return _last_known(cell, e)
+    # to_dict() builds fresh dicts, so callers may annotate the result (e.g. condition_label)
+    return forecast.to_dict()
+
+
+def _last_known(cell, error):
+    """Upstream failed or its circuit is open: the last forecast held for the cell, flagged stale."""
+    forecast = _forecast_cache.peek(cell)
+    if forecast is None:
+        return {"error": str(error), "current": None, "daily": None}
+    data = forecast.to_dict()
+    data["stale"] = True
+    return data
+
+
+def weather_cache_stats():
+    return _forecast_cache.stats()
+
+
+def _fetch_forecast(lat, lon):
+    with stage("upstream.open-meteo"):
+        data = _open_meteo.get_json(_get_url(lat, lon))
+    return _normalize_forecast(data, lat, lon)
+
+
+def fetch_forecasts(cells, timeout=30):
+    """Forecasts for many grid cells in one Open-Meteo multi-location request, in `cells` order.
+
+    Bypasses the cache (the prefetch scheduler stores the results itself).
+    """
+    cells = list(cells)
+    url = _get_url(",".join(str(lat) for lat, _ in cells), ",".join(str(lon) for _, lon in cells))
+    with stage("upstream.open-meteo"):
+        data = _open_meteo.get_json(url, timeout=timeout)
+    # A single location comes back as an object, several as a list in request order
+    items = data if isinstance(data, list) else [data]
+    if len(items) != len(cells):
+        raise ValueError(f"Open-Meteo returned {len(items)} forecasts for {len(cells)} locations")
+    return [_normalize_forecast(item, lat, lon) for item, (lat, lon) in zip(items, cells)]
+
+
+def store_forecast(cell, forecast):
+    _refreshed(cell, forecast)
+    _forecast_cache.set(cell, forecast)
+
+
+def store_forecasts(items):
+    """store_forecast for several (cell, forecast) pairs, written to the shared tier in one batch."""
+    items = list(items)
+    for cell, forecast in items:
+        _refreshed(cell, forecast)
+    _forecast_cache.set_many(items)
+
+
+def get_forecasts(cells, batch_size=50, limiter=None):
+    """Forecasts for many grid cells (bulk jobs): fresh cached ones as held, the rest from the shared
+    tier or fetched in multi-location requests of batch_size, then cached.
+
+    limiter.acquire(n) (e.g. weather_prefetch.RateLimiter) is called before each upstream request.
+    Returns {cell: Forecast, or the error if neither a fetch nor an older cached forecast worked}.
+    """
+    out, missing = {}, []
+    for cell in dict.fromkeys(cells):
+        value, state = _forecast_cache.lookup(cell)
+        if state == "fresh":
+            out[cell] = value
+        else:
+            missing.append(cell)
+    _forecast_cache.record("hits", len(out))
+    shared = adopt_shared_forecasts(missing) if missing else {}
+    out.update(shared)
+    missing = [cell for cell in missing if cell not in shared]
+    for i in range(0, len(missing), batch_size):
+        batch = missing[i:i + batch_size]
+        if limiter is not None:
+            limiter.acquire(len(batch))
+        try:
+            forecasts = fetch_forecasts(batch)
+        except (OSError, ValueError) as e:
+            _forecast_cache.record("load_errors")
+            for cell in batch:
+                out[cell] = _forecast_cache.peek(cell) or e
+            continue
+        _forecast_cache.record("misses", len(batch))
+        store_forecasts(zip(batch, forecasts))
+        out.update(zip(batch, forecasts))
+    return out
+
+
+def adopt_shared_forecasts(cells, max_age=WEATHER_CACHE_TTL):
+    """Cache the cells' forecasts another worker put in the shared tier, if younger than max_age.
+
+    They keep their original age. Returns {cell: Forecast} for the cells taken ({} without a shared tier).
+    """
+    out = {}
+    for cell, (forecast, age) in _forecast_cache.shared_lookup_many(cells).items():
+        if age < max_age:
+            _refreshed(cell, forecast)
+            _forecast_cache.set(cell, forecast, age=age)
+            out[cell] = forecast
+    _forecast_cache.record("shared_hits", len(out))
+    return out
+
+
+def forecast_age(cell):
+    """Seconds since the cell's forecast was fetched, or None if it is not cached."""
+    return _forecast_cache.age(cell)
+
+
+# ---------- Async path (ASGI serving mode) ----------
+
+# cell -> asyncio.Task; single-flight for the async path (the thread path coalesces in TTLCache)
+_async_inflight = {}
+
+
+async def fetch_weather_async(lat=None, lon=None):
+    """Async counterpart of fetch_weather sharing the same forecast cache."""
+    cell = grid_cell(lat, lon)
+    _note_demand(cell)
+    value, state = _forecast_cache.lookup(cell)
+    if state == "fresh":
+        _forecast_cache.record("hits")
+        return value.to_dict()
+    task = _async_inflight.get(cell)
+    if task is None:
+        task = _async_inflight[cell] = asyncio.ensure_future(_refresh_async(cell))
+        task.add_done_callback(lambda _t: _async_inflight.pop(cell, None))
+        _forecast_cache.record("refreshes" if state == "stale" else "misses")
+    elif state is None:
+        _forecast_cache.record("coalesced")
+    if state == "stale":
+        _forecast_cache.record("stale")
+        return value.to_dict()
+    try:
+        forecast = await asyncio.shield(task)
+    except Exception as e:
+        return _last_known(cell, e)
+    return forecast.to_dict()
+
+
+async def _refresh_async(cell):
+    # Imported here so the synchronous app does not need httpx installed
+    from services.http_async import get_json
+    if _forecast_cache.shared is not None:
+        held = await asyncio.to_thread(_forecast_cache.shared_lookup, cell)
+        if held is not None:
+            _refreshed(cell, held[0])
+            _forecast_cache.record("shared_hits")
+            _forecast_cache.set(cell, held[0], age=held[1])
+            return held[0]
+    try:
+        forecast = _normalize_forecast(await get_json(_get_url(*cell), timeout=10, upstream=_open_meteo), *cell)
+    except Exception:
+        _forecast_cache.record("load_errors")
+        raise
+    _refreshed(cell, forecast)
+    _forecast_cache.set(cell, forecast)
+    return forecast
+
 
+def _normalize_forecast(data, lat, lon):
     current = data.get("current") or {}
-    daily = data.get("daily") or {}
     weather_code = current.get("weather_code")
-    return {
-        "current": {
-            "temperature": current.get("temperature_2m"),
-            "humidity": current.get("relative_humidity_2m"),
-            "precipitation": current.get("precipitation"),
-            "wind_speed": current.get("wind_speed_10m"),
-            "weather_code": weather_code,
-            "condition": _wmo_code_to_label(weather_code),
-        },
-        "daily": {
-            "time": daily.get("time", [])[:3],
-            "temperature_2m_max": daily.get("temperature_2m_max", [])[:3],
-            "temperature_2m_min": daily.get("temperature_2m_min", [])[:3],
-            "precipitation_sum": daily.get("precipitation_sum", [])[:3],
-            "weather_code": daily.get("weather_code", [])[:3],
-        },
-        "lat": lat,
-        "lon": lon,
-    }
+    return parse_forecast(data, lat, lon, {
+        "temperature": current.get("temperature_2m"),
+        "humidity": current.get("relative_humidity_2m"),
+        "precipitation": current.get("precipitation"),
+        "wind_speed": current.get("wind_speed_10m"),
+        "weather_code": weather_code,
+        "condition": _wmo_code_to_label(weather_code),
+    })
@@ -0,0 +1,234 @@
+# Region-wide weather prefetch: keeps registered and busy grid cells warm in the forecast cache
+# Cells come from a configured list, cells watched for alerts (weather.watch_cell) and the most
+# requested cells. Each pass refreshes the cells whose forecast is due, busiest first, in Open-Meteo
+# multi-location batches spread under a rate limit.
+#
+# Every worker runs a scheduler, but with a shared cache tier (CACHE_BACKEND=shm/resp) only the
+# holder of the "prefetch" lease runs full passes, so Open-Meteo traffic and WEATHER_PREFETCH_RATE
+# do not scale with the worker count. The others refresh only the cells of their own (watched or
+# busy) that are still stale at follow_after, by when the holder has refreshed every cell it
+# tracks. Before each batch, forecasts another worker already stored in the shared tier are taken
+# instead of fetched. With the per-process memory backend every worker keeps its own cache warm.
+
+import csv
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from services.cache_backends import shared_cache
+from services.upstream import CircuitOpenError
+from services.weather import (
+    WEATHER_CACHE_TTL,
+    adopt_shared_forecasts,
+    cell_demand,
+    decay_cell_demand,
+    fetch_forecasts,
+    forecast_age,
+    snap_to_grid,
+    store_forecasts,
+    watched_cells,
+)
+
+PREFETCH_BATCH = int(os.environ.get("WEATHER_PREFETCH_BATCH", "50"))          # locations per request
+# Locations per minute; Open-Meteo's free tier allows 600 calls/min and bills per location
+PREFETCH_RATE = float(os.environ.get("WEATHER_PREFETCH_RATE", "400"))
+PREFETCH_TOP = int(os.environ.get("WEATHER_PREFETCH_TOP", "1000"))            # busiest cells added to the list
+# Refresh once a forecast is this fraction of WEATHER_CACHE_TTL old, so users never see it expire
+PREFETCH_REFRESH_AT = float(os.environ.get("WEATHER_PREFETCH_REFRESH_AT", "0.8"))
+
+_leases = shared_cache("weather-prefetch")
+
+
+def load_cells(path):
+    """Grid cells from a CSV (lat,lon columns, header optional) or JSON list of [lat, lon] / {lat, lon}."""
+    cells = []
+    with open(path, encoding="utf-8") as f:
+        if str(path).endswith(".json"):
+            for item in json.load(f):
+                lat, lon = (item["lat"], item["lon"]) if isinstance(item, dict) else item[:2]
+                cells.append((float(lat), float(lon)))
+        else:
+            for row in csv.reader(f):
+                try:
+                    cells.append((float(row[0]), float(row[1])))
+                except (IndexError, ValueError):
+                    continue  # header or blank line
+    return list(dict.fromkeys(snap_to_grid(lat, lon) for lat, lon in cells))
+
+
+class RateLimiter:
+    """Token bucket in locations; acquire(n) blocks until n locations may be requested."""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.capacity = max(float(burst), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def acquire(self, n):
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= n:
+                self._tokens -= n
+                return waited
+            delay = (n - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class PrefetchScheduler:
+    def __init__(self, cells=(), batch_size=PREFETCH_BATCH, rate_per_minute=PREFETCH_RATE,
+                 top_n=PREFETCH_TOP, refresh_at=PREFETCH_REFRESH_AT):
+        self.cells = list(dict.fromkeys(cells))
+        self.batch_size = max(1, batch_size)
+        self.top_n = top_n
+        self.refresh_after = WEATHER_CACHE_TTL * refresh_at
+        # Non-holders refresh later: halfway between the holder's refresh and expiry
+        self.follow_after = (self.refresh_after + WEATHER_CACHE_TTL) / 2
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = 600.0   # start() sets it from the interval
+        self._limiter = RateLimiter(rate_per_minute, burst=self.batch_size)
+        self._errors = {}       # cell -> last error message
+        self._tracked = set(self.cells)  # candidates of the latest pass
+        self._lock = threading.Lock()
+        self._stats = {"passes": 0, "follower_passes": 0, "batches": 0, "locations": 0, "adopted": 0,
+                       "errors": 0, "rate_limited_seconds": 0.0, "last_pass": None}
+
+    def _candidates(self):
+        demand = cell_demand()
+        busiest = sorted(demand, key=demand.get, reverse=True)[:self.top_n]
+        return list(dict.fromkeys(self.cells + watched_cells() + busiest)), demand
+
+    def leads(self):
+        """Whether this worker holds the prefetch lease (always, when the cache tier is per-process)."""
+        return not _leases.shared or _leases.lease("prefetch", self.owner, self.lease_seconds)
+
+    def due_cells(self, refresh_after=None):
+        """Cells whose forecast is missing or older than refresh_after, busiest first, then oldest."""
+        if refresh_after is None:
+            refresh_after = self.refresh_after
+        cells, demand = self._candidates()
+        with self._lock:
+            self._tracked = set(cells)
+            self._errors = {c: e for c, e in self._errors.items() if c in self._tracked}
+        due = []
+        for cell in cells:
+            age = forecast_age(cell)
+            if age is None or age >= refresh_after:
+                due.append((-demand.get(cell, 0), -(age if age is not None else float("inf")), cell))
+        due.sort()
+        return [cell for _, _, cell in due]
+
+    def run_once(self):
+        """One prefetch pass; returns a summary of what was refreshed."""
+        started = time.monotonic()
+        leader = self.leads()
+        refresh_after = self.refresh_after if leader else self.follow_after
+        due = self.due_cells(refresh_after)
+        refreshed = failed = adopted = 0
+        for i in range(0, len(due), self.batch_size):
+            batch = due[i:i + self.batch_size]
+            held = adopt_shared_forecasts(batch, max_age=refresh_after)
+            if held:
+                adopted += len(held)
+                batch = [cell for cell in batch if cell not in held]
+                with self._lock:
+                    self._stats["adopted"] += len(held)
+                    for cell in held:
+                        self._errors.pop(cell, None)
+                if not batch:
+                    continue
+            waited = self._limiter.acquire(len(batch))
+            try:
+                forecasts = fetch_forecasts(batch)
+            except (OSError, ValueError) as e:
+                failed += len(batch)
+                with self._lock:
+                    self._stats["errors"] += 1
+                    self._stats["rate_limited_seconds"] += waited
+                    self._errors.update((cell, str(e)) for cell in batch)
+                if isinstance(e, CircuitOpenError):
+                    break  # upstream is down; the next pass retries
+                continue
+            store_forecasts(zip(batch, forecasts))
+            refreshed += len(batch)
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["locations"] += len(batch)
+                self._stats["rate_limited_seconds"] += waited
+                for cell in batch:
+                    self._errors.pop(cell, None)
+        decay_cell_demand()
+        summary = {"leader": leader, "due": len(due), "refreshed": refreshed, "adopted": adopted,
+                   "failed": failed, "seconds": round(time.monotonic() - started, 3)}
+        with self._lock:
+            self._stats["passes" if leader else "follower_passes"] += 1
+            self._stats["last_pass"] = dict(summary, at=time.time())
+        return summary
+
+    def start(self, interval):
+        """Run a pass every `interval` seconds in a daemon thread."""
+        # Outlives a slow, rate-limited pass, so the lease only moves when its holder stops
+        self.lease_seconds = 2 * interval + 600
+
+        def loop():
+            while True:
+                started = time.monotonic()
+                try:
+                    self.run_once()
+                except Exception:  # keep the scheduler alive; errors are counted per batch
+                    pass
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+        thread = threading.Thread(target=loop, name="weather-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self, worst=10):
+        """Counters plus refresh lag (forecast age) across tracked cells and the most lagging cells."""
+        with self._lock:
+            out = dict(self._stats)
+            out["rate_limited_seconds"] = round(out["rate_limited_seconds"], 3)
+            tracked = list(self._tracked)
+            errors = dict(self._errors)
+        ages = {cell: forecast_age(cell) for cell in tracked}
+        known = sorted(a for a in ages.values() if a is not None)
+        out["cells_configured"] = len(self.cells)
+        out["cells_tracked"] = len(tracked)
+        out["cells_missing"] = len(tracked) - len(known)
+        out["cells_expired"] = sum(1 for a in known if a >= WEATHER_CACHE_TTL)
+        if known:
+            out["lag_seconds"] = {"p50": round(known[len(known) // 2], 1),
+                                  "p95": round(known[min(len(known) - 1, int(len(known) * 0.95))], 1),
+                                  "max": round(known[-1], 1)}
+        laggards = sorted(tracked, key=lambda c: -(ages[c] if ages[c] is not None else float("inf")))[:worst]
+        out["worst_cells"] = [
+            {"cell": list(cell), "lag_seconds": round(ages[cell], 1) if ages[cell] is not None else None,
+             "error": errors.get(cell)}
+            for cell in laggards
+        ]
+        return out
+
+
+_scheduler = None
+
+
+def start_prefetch_scheduler(interval, cells_path=""):
+    """Start the process-wide scheduler (configured cells from cells_path, if given)."""
+    global _scheduler
+    cells = load_cells(cells_path) if cells_path else []
+    _scheduler = PrefetchScheduler(cells)
+    _scheduler.start(interval)
+    return _scheduler
+
+
+def prefetch_stats():
+    if _scheduler is None:
+        return {"enabled": False}
+    return dict(_scheduler.stats(), enabled=True)
@@ -156,6 +156,21 @@
     if (loading) el.innerHTML = '<p class="dashboard-loading">' + msg + '</p>';
   }
 
+  function renderError(el, message) {
+    if (!el) return;
+    el.innerHTML = '<p class="dashboard-error">' + (window.i18n ? window.i18n.t('messages.error', 'common') : 'Error') + ': ' + message + '</p>';
+  }
+
+  // Render one section of the /api/dashboard payload; sections that failed server-side carry {error: ...}
+  function renderSection(section, el, render) {
+    if (!el) return;
+    if (!section || (section.error && render !== renderWeather)) {
+      renderError(el, (section && section.error) || 'unavailable');
+      return;
+    }
+    render(section, el);
+  }
+
   function loadDashboard() {
     var weatherEl = document.getElementById('dashboard-weather');
     var mandiEl = document.getElementById('dashboard-mandi');
@@ -163,61 +178,25 @@
     var advisoryEl = document.getElementById('dashboard-advisory');
     var soilEl = document.getElementById('dashboard-soil');
     var satelliteEl = document.getElementById('dashboard-satellite');
+    var els = [weatherEl, mandiEl, schemesEl, advisoryEl, soilEl, satelliteEl];
 
-    if (weatherEl) {
-      setLoading(weatherEl, true);
-      get('/api/weather').then(function (data) {
-        renderWeather(data, weatherEl);
-      }).catch(function (err) {
-        try { sessionStorage.removeItem('weatherAlertShown'); } catch (e) {}
-        if (weatherEl) weatherEl.innerHTML = '<p class="dashboard-error">' + (window.i18n ? window.i18n.t('messages.error', 'common') : 'Error') + ': ' + err.message + '</p>';
-      });
-    }
-
-    if (mandiEl) {
-      setLoading(mandiEl, true);
-      get('/api/mandi?limit=10').then(function (data) {
-        renderMandi(data, mandiEl);
-      }).catch(function (err) {
-        if (mandiEl) mandiEl.innerHTML = '<p class="dashboard-error">' + (window.i18n ? window.i18n.t('messages.error', 'common') : 'Error') + ': ' + err.message + '</p>';
-      });
-    }
-
-    if (schemesEl) {
-      setLoading(schemesEl, true);
-      get('/api/schemes').then(function (data) {
-        renderSchemes(data, schemesEl);
-      }).catch(function (err) {
-        if (schemesEl) schemesEl.innerHTML = '<p class="dashboard-error">' + (window.i18n ? window.i18n.t('messages.error', 'common') : 'Error') + ': ' + err.message + '</p>';
-      });
-    }
-
-    if (advisoryEl) {
-      setLoading(advisoryEl, true);
-      get('/api/advisory').then(function (data) {
-        renderAdvisory(data, advisoryEl);
-      }).catch(function (err) {
-        if (advisoryEl) advisoryEl.innerHTML = '<p class="dashboard-error">' + (window.i18n ? window.i18n.t('messages.error', 'common') : 'Error') + ': ' + err.message + '</p>';
-      });
-    }
-
-    if (soilEl) {
-      setLoading(soilEl, true);
-      get('/api/soil').then(function (data) {
-        renderSoil(data, soilEl);
-      }).catch(function (err) {
-        if (soilEl) soilEl.innerHTML = '<p class="dashboard-error">' + (window.i18n ? window.i18n.t('messages.error', 'common') : 'Error') + ': ' + err.message + '</p>';
-      });
-    }
+    els.forEach(function (el) { setLoading(el, true); });
 
-    if (satelliteEl) {
-      setLoading(satelliteEl, true);
-      get('/api/satellite').then(function (data) {
-        renderSatellite(data, satelliteEl);
-      }).catch(function (err) {
-        if (satelliteEl) satelliteEl.innerHTML = '<p class="dashboard-error">' + (window.i18n ? window.i18n.t('messages.error', 'common') : 'Error') + ': ' + err.message + '</p>';
-      });
-    }
+    // One round trip: the server fetches every source concurrently and shares the weather result
+    get('/api/dashboard?limit=10').then(function (data) {
+      if (data.weather && data.weather.error) {
+        try { sessionStorage.removeItem('weatherAlertShown'); } catch (e) {}
+      }
+      renderSection(data.weather, weatherEl, renderWeather);
+      renderSection(data.mandi, mandiEl, renderMandi);
+      renderSection(data.schemes, schemesEl, renderSchemes);
+      renderSection(data.advisory, advisoryEl, renderAdvisory);
+      renderSection(data.soil, soilEl, renderSoil);
+      renderSection(data.satellite, satelliteEl, renderSatellite);
+    }).catch(function (err) {
+      try { sessionStorage.removeItem('weatherAlertShown'); } catch (e) {}
+      els.forEach(function (el) { renderError(el, err.message); });
+    });
   }
 
   if (typeof document !== 'undefined') {
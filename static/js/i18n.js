@@ -32,6 +32,7 @@ class TranslationManager {
     this.translations = {};
     this.loadedModules = new Set();
     this.baseUrl = (typeof window !== 'undefined' && window.__LOCALE_BASE__) || '/locales';
+    this.versions = (typeof window !== 'undefined' && window.__LOCALE_VERSIONS__) || {};
   }
 
   async setLanguage(langCode) {
@@ -65,7 +66,30 @@ class TranslationManager {
     }
   }
 
+  // One request for every module of the language; versioned URLs are cached by the browser for a year
+  async loadBundle() {
+    const lang = this.currentLanguage;
+    const version = this.versions[lang];
+    const url = `${this.baseUrl}/${lang}.json` + (version ? `?v=${version}` : '');
+    try {
+      const res = await fetch(url);
+      if (!res.ok) throw new Error(res.statusText);
+      const bundle = await res.json();
+      for (const module of Object.keys(bundle)) {
+        this.translations[module] = bundle[module];
+        this.loadedModules.add(`${lang}:${module}`);
+      }
+      return true;
+    } catch (err) {
+      console.warn(`i18n: Failed to load bundle for ${lang}`, err);
+      return false;
+    }
+  }
+
   async loadModules(modules) {
+    if (modules.some(m => !this.loadedModules.has(`${this.currentLanguage}:${m}`))) {
+      await this.loadBundle();
+    }
     for (const module of modules) {
       const cacheKey = `${this.currentLanguage}:${module}`;
       if (this.loadedModules.has(cacheKey)) continue;
@@ -0,0 +1,254 @@
+# Local stand-ins for upstream APIs (data.gov.in, ...) and for a Redis-protocol cache server, so
+# sync, the shared cache tier, tests, benchmarks and load tests run offline
+# Each server runs in a daemon thread on 127.0.0.1 and returns its base URL.
+
+import datetime
+import fnmatch
+import json
+import math
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+
+from services.cache_backends import RespError, read_reply
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections under load-test concurrency
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients timing out mid-reply (latency injection) are expected; keep the output clean
+        pass
+
+
+def _serve(handler_cls):
+    server = _Server(("127.0.0.1", 0), handler_cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY keep-alive clients stall
+    # ~40 ms per request on Nagle + delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_data_gov_in(records, latency=0.0, error_rate=0.0, seed=0):
+    """data.gov.in resource API stand-in serving `records` (raw portal-format dicts).
+
+    Supports offset/limit paging and filters[<field>]=value; latency and error injection work as
+    in start_open_meteo. Returns (server, base_url); point DATA_GOV_IN_BASE (or
+    sync_mandi(base_url=...)) at base_url.
+    """
+    rng = random.Random(seed)
+
+    class Handler(_QuietHandler):
+        requests_seen = []
+
+        def do_GET(self):
+            parsed = urllib.parse.urlparse(self.path)
+            qs = dict(urllib.parse.parse_qsl(parsed.query))
+            Handler.requests_seen.append(qs)
+            if server.latency:
+                time.sleep(server.latency)
+            if rng.random() < server.error_rate:
+                self._send_json({"error": "injected"}, status=503)
+                return
+            if not qs.get("api-key"):
+                self._send_json({"error": "key required"}, status=403)
+                return
+            rows = records
+            for k, v in qs.items():
+                if k.startswith("filters[") and k.endswith("]"):
+                    field = k[len("filters["):-1]
+                    rows = [r for r in rows if str(r.get(field)) == v]
+            offset = int(qs.get("offset", 0))
+            limit = int(qs.get("limit", 10))
+            self._send_json({"total": len(rows), "count": len(rows[offset:offset + limit]),
+                             "records": rows[offset:offset + limit]})
+
+    server = _serve(Handler)
+    server.requests_seen = Handler.requests_seen
+    server.latency = latency
+    server.error_rate = error_rate
+    return server, f"http://127.0.0.1:{server.server_address[1]}/resource"
+
+
+def _forecast_payload(lat, lon, seed, days=7):
+    rng = random.Random(seed)
+    first = datetime.date(2026, 10, 1)
+    dates = [(first + datetime.timedelta(days=d)).isoformat() for d in range(days)]
+    hours = [f"{d}T{h:02d}:00" for d in dates for h in range(24)]
+    # Diurnal temperature cycle peaking mid-afternoon, showers on some afternoons
+    temps = [round(rng.uniform(16, 24) + 12 * max(0.0, math.sin(math.pi * ((i % 24) - 6) / 14)), 1)
+             for i in range(len(hours))]
+    return {
+        "latitude": lat, "longitude": lon,
+        "current": {
+            "temperature_2m": round(rng.uniform(18, 38), 1),
+            "relative_humidity_2m": rng.randint(20, 95),
+            "precipitation": round(rng.uniform(0, 5), 1),
+            "weather_code": rng.choice([0, 1, 2, 3, 61, 63, 95]),
+            "wind_speed_10m": round(rng.uniform(0, 30), 1),
+        },
+        "hourly": {
+            "time": hours,
+            "temperature_2m": temps,
+            "relative_humidity_2m": [rng.randint(30, 95) for _ in hours],
+            "precipitation": [round(rng.uniform(0, 4), 1) if rng.random() < 0.08 else 0.0 for _ in hours],
+            "wind_speed_10m": [round(rng.uniform(0, 22), 1) for _ in hours],
+        },
+        "daily": {
+            "time": dates,
+            "temperature_2m_max": [max(temps[d * 24:(d + 1) * 24]) for d in range(days)],
+            "temperature_2m_min": [min(temps[d * 24:(d + 1) * 24]) for d in range(days)],
+            "precipitation_sum": [round(rng.uniform(0, 20), 1) for _ in dates],
+            "weather_code": [rng.choice([0, 1, 3, 61, 95]) for _ in dates],
+            "et0_fao_evapotranspiration": [round(rng.uniform(2, 6), 2) for _ in dates],
+        },
+    }
+
+
+def start_open_meteo(latency=0.0, error_rate=0.0, seed=0):
+    """Open-Meteo /v1/forecast stand-in (including multi-location requests). Each request sleeps
+    `latency` seconds and fails with HTTP 500 with probability `error_rate`. With
+    server.drop_keepalive set, connections are closed after each reply without a Connection: close
+    header, as an upstream dropping idle keep-alive connections does. Counts requests in
+    server.hits and locations in server.locations. Returns (server, base_url) for OPEN_METEO_BASE."""
+    rng = random.Random(seed)
+
+    class Handler(_QuietHandler):
+        def do_GET(self):
+            parsed = urllib.parse.urlparse(self.path)
+            qs = dict(urllib.parse.parse_qsl(parsed.query))
+            server.hits += 1
+            if server.latency:
+                time.sleep(server.latency)
+            if rng.random() < server.error_rate:
+                self._send_json({"error": True, "reason": "injected"}, status=500)
+                return
+            # Comma-separated coordinates request several locations; the reply is then a list
+            lats = [float(v) for v in qs.get("latitude", "0").split(",")]
+            lons = [float(v) for v in qs.get("longitude", "0").split(",")]
+            days = int(qs.get("forecast_days", 7))
+            server.locations += len(lats)
+            payloads = [_forecast_payload(lat, lon, seed=(lat, lon).__hash__(), days=days)
+                        for lat, lon in zip(lats, lons)]
+            self._send_json(payloads if len(payloads) > 1 else payloads[0])
+            if server.drop_keepalive:
+                self.close_connection = True
+
+    server = _serve(Handler)
+    # Adjustable while running
+    server.latency = latency
+    server.error_rate = error_rate
+    server.drop_keepalive = False
+    server.hits = 0
+    server.locations = 0
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def _resp_encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_resp_encode(v) for v in value)
+    if value == b"OK" or value == b"PONG":
+        return b"+%s\r\n" % value
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def start_resp_server():
+    """In-process Redis-protocol server: GET, MGET, SET [EX|PX|NX], DEL, SCAN, DBSIZE, FLUSHDB, PING.
+
+    Enough for services.cache_backends.RespBackend. Counts commands and connections in
+    server.commands / server.connections. Returns (server, url) for CACHE_URL.
+    """
+    store = {}      # key -> (expires_at or None, value)
+    lock = threading.Lock()
+
+    def alive(key, now):
+        entry = store.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= now:
+            del store[key]
+            return None
+        return entry
+
+    def run(args):
+        name = args[0].upper()
+        now = time.time()
+        with lock:
+            server.commands += 1
+            if name == b"GET":
+                entry = alive(args[1], now)
+                return entry[1] if entry else None
+            if name == b"MGET":
+                return [(alive(k, now) or (None, None))[1] for k in args[1:]]
+            if name == b"SET":
+                expires, opts = None, [a.upper() for a in args[3:]]
+                for i, opt in enumerate(opts):
+                    if opt in (b"EX", b"PX"):
+                        expires = now + int(args[4 + i]) / (1 if opt == b"EX" else 1000)
+                if b"NX" in opts and alive(args[1], now):
+                    return None
+                store[args[1]] = (expires, args[2])
+                return b"OK"
+            if name in (b"DEL", b"UNLINK"):
+                return sum(store.pop(k, None) is not None for k in args[1:])
+            if name == b"SCAN":
+                pattern = args[args.index(b"MATCH") + 1].decode() if b"MATCH" in args else "*"
+                return [b"0", [k for k in list(store) if alive(k, now) and fnmatch.fnmatchcase(k.decode(), pattern)]]
+            if name == b"DBSIZE":
+                return sum(1 for k in list(store) if alive(k, now))
+            if name == b"FLUSHDB":
+                store.clear()
+                return b"OK"
+            if name in (b"PING", b"SELECT", b"AUTH"):
+                return b"PONG" if name == b"PING" else b"OK"
+        return RespError(f"ERR unknown command '{name.decode()}'")
+
+    class Handler(StreamRequestHandler):
+        def handle(self):
+            server.connections += 1
+            while True:
+                try:
+                    args = read_reply(self.rfile)
+                except (OSError, ValueError):
+                    return
+                if not isinstance(args, list) or not args:
+                    self.wfile.write(_resp_encode(RespError("ERR protocol error")))
+                    return
+                self.wfile.write(_resp_encode(run(args)))
+
+    class Server(ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+        request_queue_size = 1024
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.commands = 0
+    server.connections = 0
+    server.store = store
+    return server, f"redis://127.0.0.1:{server.server_address[1]}/0"
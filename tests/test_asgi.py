@@ -0,0 +1,69 @@
+# Natively async routes (asgi.py): request metrics and Server-Timing, as the Flask routes record them
+# Run: python -m pytest -q
+
+import asyncio
+
+import pytest
+
+import asgi
+from services import metrics
+
+
+def _call(path, query=b''):
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query, 'headers': []}
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0.05)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    return sent[0]['status'], dict(sent[0]['headers'])
+
+
+def _count(endpoint, status):
+    return sum(r['count'] for r in metrics.snapshot()['requests']
+               if (r['endpoint'], r['status']) == (endpoint, status))
+
+
+@pytest.fixture
+def weather_route(monkeypatch):
+    async def handler(req):
+        with metrics.stage('upstream.test'):
+            await asyncio.sleep(0.01)
+        return {'ok': True}
+    monkeypatch.setitem(asgi.ASYNC_ROUTES, '/api/weather', handler)
+
+
+@pytest.mark.skipif(not asgi.METRICS_ENABLED, reason='METRICS_ENABLED=0')
+def test_native_route_is_instrumented(weather_route):
+    before = _count('/api/weather', 200)
+    status, headers = _call('/api/weather')
+    assert status == 200
+    assert _count('/api/weather', 200) == before + 1
+    timing = headers[b'server-timing'].decode()
+    assert 'upstream.test;dur=' in timing and 'total;dur=' in timing
+
+
+@pytest.mark.skipif(not asgi.METRICS_ENABLED, reason='METRICS_ENABLED=0')
+def test_failed_native_route_counts_as_500(monkeypatch):
+    async def handler(req):
+        raise RuntimeError('boom')
+    monkeypatch.setitem(asgi.ASYNC_ROUTES, '/api/mandi', handler)
+    before = _count('/api/mandi', 500)
+    with pytest.raises(RuntimeError):
+        _call('/api/mandi')
+    assert _count('/api/mandi', 500) == before + 1
+
+
+@pytest.mark.skipif(not asgi.METRICS_ENABLED, reason='METRICS_ENABLED=0')
+def test_event_stream_is_instrumented_when_opened():
+    before = (_count('/api/events', 200), _count('/api/events', 400))
+    status, headers = _call('/api/events', b'commodities=Wheat')
+    assert status == 200 and b'server-timing' in headers
+    status, headers = _call('/api/events')
+    assert status == 400 and b'server-timing' in headers
+    assert (_count('/api/events', 200), _count('/api/events', 400)) == (before[0] + 1, before[1] + 1)
@@ -0,0 +1,188 @@
+# Shared cache tier (services.cache_backends) against the in-process Redis-protocol stand-in
+# Run: python -m pytest -q
+
+import os
+import socket
+import time
+
+import numpy as np
+import pytest
+
+from services.cache_backends import MemoryBackend, RespBackend, SharedCache, SharedDirBackend, make_backend
+from tests.standins import start_resp_server
+
+
+@pytest.fixture
+def resp_server():
+    server, url = start_resp_server()
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def test_get_and_mget(resp_server):
+    server, url = resp_server
+    backend = RespBackend(url, prefix="t:")
+    backend.set("a", b"1", 60)
+    backend.set("b", b"\x00\r\n2", 60)
+    assert backend.get("a") == b"1"
+    assert backend.get("missing") is None
+    assert server.store[b"t:a"][1] == b"1"
+
+    before = backend.stats()["round_trips"]
+    assert backend.get_many(["a", "missing", "b"]) == [b"1", None, b"\x00\r\n2"]
+    assert backend.stats()["round_trips"] == before + 1   # one MGET
+
+
+def test_get_many_splits_into_batches(resp_server):
+    _, url = resp_server
+    backend = RespBackend(url, prefix="t:")
+    backend.BATCH = 2
+    backend.set_many([(str(i), str(i).encode()) for i in range(5)], 60)
+    assert backend.get_many([str(i) for i in range(5)]) == [str(i).encode() for i in range(5)]
+
+
+def test_set_many_is_pipelined_with_px_expiry(resp_server):
+    server, url = resp_server
+    backend = RespBackend(url, prefix="t:")
+    backend.get("warm-up")   # connect first so only the writes are counted
+    round_trips, commands = backend.stats()["round_trips"], server.commands
+    backend.set_many([("x", b"1"), ("y", b"2"), ("z", b"3")], 0.2)
+    assert backend.stats()["round_trips"] == round_trips + 1
+    assert server.commands == commands + 3
+
+    expires = server.store[b"t:x"][0]
+    assert 0 < expires - time.time() <= 0.2
+    assert backend.get_many(["x", "y", "z"]) == [b"1", b"2", b"3"]
+    time.sleep(0.25)
+    assert backend.get_many(["x", "y", "z"]) == [None, None, None]
+
+
+def test_clear_only_deletes_own_prefix(resp_server):
+    server, url = resp_server
+    mine, other = RespBackend(url, prefix="mine:"), RespBackend(url, prefix="other:")
+    mine.set_many([("a", b"1"), ("b", b"2")], 60)
+    other.set("a", b"3", 60)
+    mine.clear()
+    assert mine.get_many(["a", "b"]) == [None, None]
+    assert other.get("a") == b"3"
+    assert list(server.store) == [b"other:a"]
+
+
+def test_server_down_gives_misses_and_backs_off():
+    backend = RespBackend(_closed_port_url(), timeout=0.2, retry_after=60)
+    assert backend.get("a") is None
+    assert backend.get_many(["a", "b"]) == [None, None]
+    backend.set("a", b"1", 60)
+    backend.set_many([("a", b"1")], 60)
+    backend.clear()
+    stats = backend.stats()
+    assert stats["errors"] == 1          # later calls did not retry the server
+    assert stats["connects"] == 0
+    assert stats["available"] is False
+
+
+def test_server_back_after_retry_window(resp_server):
+    _, url = resp_server
+    backend = RespBackend(url, prefix="t:", retry_after=0.05)
+    backend._down_until = time.monotonic() + 0.05
+    assert backend.get("a") is None
+    backend.set("a", b"1", 60)           # skipped: still backing off
+    time.sleep(0.06)
+    assert backend.get("a") is None
+    backend.set("a", b"1", 60)
+    assert backend.get("a") == b"1"
+
+
+def test_shared_cache_round_trip(resp_server):
+    server, url = resp_server
+    cache = SharedCache(RespBackend(url, prefix="t:"), "weather")
+    assert cache.shared
+    forecast = {"cell": (28.6, 77.2), "temp": np.arange(24, dtype=np.float32)}
+    cache.set("a", forecast, 60)
+    cache.set_many([("b", [1, 2]), ("c", "text")], 60)
+    assert b"t:weather:a" in server.store
+
+    got = cache.get("a")
+    assert got["cell"] == (28.6, 77.2)
+    np.testing.assert_array_equal(got["temp"], forecast["temp"])
+    assert cache.get_many(["b", "c", "missing"]) == {"b": [1, 2], "c": "text"}
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stored"]) == (3, 2, 3)
+
+
+def test_shared_cache_undecodable_entry_is_a_miss(resp_server):
+    server, url = resp_server
+    cache = SharedCache(RespBackend(url, prefix="t:"), "mandi")
+    server.store[b"t:mandi:bad"] = (None, b"not a pickle")
+    assert cache.get("bad") is None
+    assert cache.get_many(["bad"]) == {}
+    stats = cache.stats()
+    assert stats["errors"] == 2 and stats["hits"] == 0
+
+
+def test_shared_cache_with_server_down():
+    cache = SharedCache(RespBackend(_closed_port_url(), timeout=0.2, retry_after=60), "weather")
+    cache.set("a", 1, 60)
+    assert cache.get("a") is None
+    assert cache.get_many(["a", "b"]) == {}
+
+
+def test_shared_dir_is_private(tmp_path):
+    directory = tmp_path / "cache"
+    backend = SharedDirBackend(str(directory), 1024 * 1024)
+    assert os.stat(directory).st_mode & 0o077 == 0
+    backend.set("k", b"v", 60)
+    assert backend.get("k") == b"v"
+
+
+def test_shared_dir_refuses_writable_or_linked_directory(tmp_path):
+    open_dir = tmp_path / "open"
+    open_dir.mkdir()
+    os.chmod(open_dir, 0o777)
+    with pytest.raises(PermissionError):
+        SharedDirBackend(str(open_dir), 1024)
+    assert isinstance(make_backend("shm", str(open_dir), 1024), MemoryBackend)
+
+    private = tmp_path / "private"
+    private.mkdir(mode=0o700)
+    link = tmp_path / "link"
+    link.symlink_to(private)
+    with pytest.raises(PermissionError):
+        SharedDirBackend(str(link), 1024)
+
+
+@pytest.mark.parametrize("kind", ["memory", "shm", "resp"])
+def test_add_only_sets_absent_or_expired_keys(kind, tmp_path, resp_server):
+    backend = {"memory": lambda: MemoryBackend(1024),
+               "shm": lambda: SharedDirBackend(str(tmp_path / "shm"), 1024),
+               "resp": lambda: RespBackend(resp_server[1], prefix="t:")}[kind]()
+    assert backend.add("k", b"1", 0.1) is True
+    assert backend.add("k", b"2", 60) is False
+    assert backend.get("k") == b"1"
+    time.sleep(0.15)
+    assert backend.add("k", b"3", 60) is True
+    assert backend.get("k") == b"3"
+
+
+def test_lease_is_exclusive_until_it_expires(tmp_path):
+    leases = SharedCache(SharedDirBackend(str(tmp_path / "shm"), 1024), "jobs")
+    assert leases.lease("prefetch", "a", 0.1)
+    assert not leases.lease("prefetch", "b", 0.1)
+    assert leases.lease("prefetch", "a", 0.1)          # renewal
+    time.sleep(0.15)                                    # a stopped renewing
+    assert leases.lease("prefetch", "b", 60)
+    assert not leases.lease("prefetch", "a", 60)
+
+
+def test_lease_with_server_down_is_held():
+    leases = SharedCache(RespBackend(_closed_port_url(), timeout=0.2, retry_after=60), "jobs")
+    assert leases.lease("prefetch", "a", 60) and leases.lease("prefetch", "b", 60)
@@ -0,0 +1,138 @@
+# Live events (services.events): subscription parsing, the broker's fan-out and the mandi poller
+# against a store synced from the data.gov.in stand-in
+# Run: python -m pytest -q
+
+import asyncio
+import datetime
+import json
+import sqlite3
+
+import pytest
+
+from services import events, mandi_store
+from services.events import EventBroker, parse_subscription
+from services.upstream import Upstream
+from services.weather import grid_cell, watched_cells
+from tests.standins import start_data_gov_in
+
+DAY = datetime.date(2026, 10, 10)
+
+
+def _record(day, market="Khanna", modal=2200):
+    return {"state": "Punjab", "district": "Ludhiana", "market": market, "commodity": "Wheat",
+            "variety": "Dara", "grade": "FAQ", "arrival_date": day.strftime("%d/%m/%Y"),
+            "min_price": modal - 100, "max_price": modal + 100, "modal_price": modal}
+
+
+def _frames(sub):
+    out = []
+    while not sub.queue.empty():
+        frame = sub.queue.get_nowait()
+        event, data = frame.decode().splitlines()[1:3]
+        out.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return out
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = EventBroker(max_clients=3, heartbeat=60)
+    monkeypatch.setattr(events, "broker", broker)
+    monkeypatch.setattr(events, "_start_mandi_watch", lambda: None)   # tests poll by hand
+    monkeypatch.setattr(events, "_mandi_seen", [None, None])
+    return broker
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    records = [_record(DAY - datetime.timedelta(days=1)), _record(DAY, market="Jagraon")]
+    server, base = start_data_gov_in(records)
+    monkeypatch.setattr(mandi_store, "_data_gov_in", Upstream("data.gov.in-test", timeout=2, retries=0))
+    path = str(tmp_path / "mandi.db")
+
+    def sync(today):
+        return mandi_store.sync_mandi(api_key="k", base_url=base, resource_id="r", path=path, today=today)
+    sync(DAY)
+    yield path, records, sync
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_subscription():
+    assert parse_subscription({"commodities": " Wheat, ,Onion ", "markets": "Khanna"}) == (
+        ["Wheat", "Onion"], ["Khanna"], [], None)
+    assert parse_subscription({"lat": "28.61", "lon": "77.21"})[3] == grid_cell(28.61, 77.21)
+    with pytest.raises(ValueError):
+        parse_subscription({"markets": "Khanna"})                 # neither commodities nor a location
+    with pytest.raises(ValueError):
+        parse_subscription({"commodities": ",".join(["Wheat"] * (events.MAX_SUBSCRIPTIONS + 1))})
+    with pytest.raises(ValueError):
+        parse_subscription({"lat": "nan", "lon": "77.2"})
+
+
+def test_broker_routes_price_moves_by_commodity_and_market(broker):
+    move = {"commodity": "Wheat", "state": "Punjab", "market": "Khanna", "change_pct": 8.0}
+
+    async def main():
+        wheat = broker.subscribe("en", ["wheat"])
+        jagraon_only = broker.subscribe("en", ["Wheat"], markets=["Jagraon"])
+        onion = broker.subscribe("en", ["Onion"])
+        assert broker.subscribe("en", ["Rice"]) is None          # max_clients
+        assert broker.publish_price_move(move) == 1
+        await asyncio.sleep(0)                                    # let the loop run the delivery
+        assert [event for event, _ in _frames(wheat)] == ["price_move"]
+        assert _frames(jagraon_only) == [] and _frames(onion) == []
+
+        broker.unsubscribe(wheat)
+        assert broker.publish_price_move(move) == 0
+        assert broker.stats()["clients"] == 2
+    asyncio.run(main())
+
+
+def test_broker_watches_subscribed_cells(broker):
+    cell = grid_cell(30.9, 75.85)
+
+    async def main():
+        first = broker.subscribe("en", cell=cell)
+        second = broker.subscribe("en", cell=cell)
+        assert cell in watched_cells() and broker.has_cell_subscribers(cell)
+        assert broker.publish_weather_alert(cell, {"cell": list(cell), "condition": "stormy"}) == 2
+        broker.unsubscribe(first)
+        assert cell in watched_cells()
+        broker.unsubscribe(second)
+        assert cell not in watched_cells() and not broker.has_cell_subscribers(cell)
+    asyncio.run(main())
+
+
+def test_poll_publishes_moves_once_per_sync(broker, store):
+    path, records, sync = store
+
+    async def main():
+        sub = broker.subscribe("en", ["Wheat"])
+        assert events.poll_mandi_changes(path) == 0               # baseline
+        records.append(_record(DAY + datetime.timedelta(days=1), modal=2600))
+        sync(DAY + datetime.timedelta(days=1))
+        assert events.poll_mandi_changes(path) == 1
+        assert events.poll_mandi_changes(path) == 0               # nothing new since
+        await asyncio.sleep(0)
+        [(event, data)] = _frames(sub)
+        assert (event, data["market"], data["change_pct"]) == ("price_move", "Khanna", 18.18)
+    asyncio.run(main())
+
+
+def test_failed_poll_keeps_the_moves_for_the_next_one(broker, store, monkeypatch):
+    path, records, sync = store
+
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    async def main():
+        broker.subscribe("en", ["Wheat"])
+        events.poll_mandi_changes(path)
+        records.append(_record(DAY + datetime.timedelta(days=1), modal=2600))
+        sync(DAY + datetime.timedelta(days=1))
+        with monkeypatch.context() as m:
+            m.setattr(events, "price_moves", locked)
+            with pytest.raises(sqlite3.OperationalError):
+                events.poll_mandi_changes(path)
+        assert events.poll_mandi_changes(path) == 1
+    asyncio.run(main())
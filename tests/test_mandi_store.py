@@ -0,0 +1,111 @@
+# Mandi store sync (services.mandi_store) against the data.gov.in stand-in
+# Run: python -m pytest -q
+
+import datetime
+import json
+import threading
+import time
+
+import pytest
+
+from services import mandi_store
+from services.upstream import Upstream
+from tests.standins import start_data_gov_in
+
+DAY = datetime.date(2026, 10, 10)
+
+
+def _record(day, market="Khanna", commodity="Wheat", modal=2200):
+    return {"state": "Punjab", "district": "Ludhiana", "market": market, "commodity": commodity,
+            "variety": "Dara", "grade": "FAQ", "arrival_date": day.strftime("%d/%m/%Y"),
+            "min_price": modal - 100, "max_price": modal + 100, "modal_price": modal}
+
+
+@pytest.fixture
+def portal(monkeypatch):
+    records = [_record(DAY - datetime.timedelta(days=1)), _record(DAY, market="Jagraon")]
+    server, base = start_data_gov_in(records)
+    # A private upstream, so one test's failures cannot open the shared breaker for the next
+    monkeypatch.setattr(mandi_store, "_data_gov_in", Upstream("data.gov.in-test", timeout=2, retries=0))
+    yield server, base, records
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "mandi.db")
+
+
+def _sync(base, db, today=DAY, page_size=500):
+    return mandi_store.sync_mandi(api_key="k", base_url=base, resource_id="r", page_size=page_size,
+                                  path=db, today=today)
+
+
+def test_first_sync_pages_everything_and_sets_watermark(portal, db):
+    server, base, _ = portal
+    out = _sync(base, db, page_size=1)
+    assert out == {"synced": 2, "pages": 3, "watermark": DAY.isoformat()}
+    assert all("filters[arrival_date]" not in qs for qs in server.requests_seen)
+    status = mandi_store.store_status(db)
+    assert status["rows"] == 2          # seed rows replaced by real data
+    assert status["watermark"] == DAY.isoformat()
+    assert status["last_sync"]["synced"] == 2
+
+
+def test_incremental_sync_requests_dates_from_watermark(portal, db):
+    server, base, records = portal
+    _sync(base, db)
+    version = mandi_store.data_version(db)
+    records.append(_record(DAY + datetime.timedelta(days=2), modal=2600))
+    server.requests_seen.clear()
+
+    out = _sync(base, db, today=DAY + datetime.timedelta(days=2))
+    dates = [qs["filters[arrival_date]"] for qs in server.requests_seen]
+    assert dates == ["10/10/2026", "11/10/2026", "12/10/2026"]   # the watermark day is re-read
+    assert out["synced"] == 2 and out["watermark"] == "2026-10-12"
+    assert mandi_store.data_version(db) > version
+    assert mandi_store.sync_marker(db) == (mandi_store.data_version(db), "2026-10-12")
+
+    moves = mandi_store.price_moves("2026-10-10", 5, path=db)
+    assert [(m["market"], m["change_pct"]) for m in moves] == [("Khanna", 18.18)]
+
+
+def test_failed_sync_keeps_watermark(portal, db):
+    server, base, _ = portal
+    _sync(base, db)
+    server.error_rate = 1.0
+    out = _sync(base, db, today=DAY + datetime.timedelta(days=1))
+    assert out["synced"] == 0 and "503" in out["error"]
+    assert mandi_store.store_status(db)["watermark"] == DAY.isoformat()
+
+
+def test_sync_lease_is_exclusive_until_it_expires(db):
+    assert mandi_store._take_sync_lease("a", 60, db)
+    assert not mandi_store._take_sync_lease("b", 60, db)
+    assert mandi_store._take_sync_lease("a", 60, db)          # renewal
+    assert mandi_store.store_status(db)["sync_owner"] == "a"
+
+    mandi_store._set_state(mandi_store._connect(db), "sync_lease",
+                           json.dumps({"owner": "a", "until": time.time() - 1}))
+    assert mandi_store._take_sync_lease("b", 60, db)          # a stopped renewing
+    assert not mandi_store._take_sync_lease("a", 60, db)
+
+
+def test_background_sync_survives_errors(monkeypatch, db):
+    calls = []
+
+    def flaky_sync(**kwargs):
+        calls.append(kwargs)
+        raise KeyError("malformed page")
+
+    monkeypatch.setattr(mandi_store, "sync_mandi", flaky_sync)
+    stop = threading.Event()
+    thread = mandi_store.start_background_sync(0.01, stop=stop, path=db)
+    deadline = time.time() + 2
+    while len(calls) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    stop.set()
+    thread.join(1)
+    assert len(calls) >= 3
+    assert not thread.is_alive()
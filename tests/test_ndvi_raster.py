@@ -0,0 +1,43 @@
+# Zonal statistics on a small tiled NDVI raster (services.ndvi_raster)
+# Run: python -m pytest -q
+
+import numpy as np
+import pytest
+
+from services.ndvi_raster import NdviRaster, write_tiled_raster
+
+
+@pytest.fixture
+def raster(tmp_path):
+    # 4x4 pixels of 1 degree from 70E, 30N; NDVI = (row * 4 + col) / 100
+    array = np.arange(16, dtype=np.int16).reshape(4, 4)
+    write_tiled_raster(tmp_path / "ndvi.json", array, west=70.0, north=30.0, pixel_width=1.0,
+                       pixel_height=1.0, tile_size=2, scale=0.01)
+    return NdviRaster(tmp_path / "ndvi.json")
+
+
+def _square(x0, y0, x1, y1):
+    return [[(x0, y0), (x1, y0), (x1, y1), (x0, y1)]]
+
+
+def test_zonal_stats_over_pixel_centres(raster):
+    out = raster.zonal_stats(_square(70.0, 28.0, 72.0, 30.0))    # the 2x2 north-west pixels
+    assert (out["pixels"], out["valid_pixels"]) == (4, 4)
+    assert out["mean"] == pytest.approx((0 + 1 + 4 + 5) / 400)
+
+
+def test_sub_pixel_polygon_uses_the_pixel_under_its_first_vertex(raster):
+    out = raster.zonal_stats(_square(71.1, 28.1, 71.2, 28.2))
+    assert out["pixels"] == 1 and out["mean"] == pytest.approx(0.05)
+
+
+@pytest.mark.parametrize("square", [
+    _square(69.9, 28.1, 70.1, 28.2),     # first vertex west of the raster
+    _square(71.1, 25.9, 71.2, 26.1),     # first vertex south of it
+])
+def test_sub_pixel_polygon_grazing_the_edge_has_no_pixels(raster, square):
+    assert raster.zonal_stats(square) == {"pixels": 0, "valid_pixels": 0}
+
+
+def test_polygon_off_the_raster(raster):
+    assert raster.zonal_stats(_square(80.0, 10.0, 81.0, 11.0)) is None
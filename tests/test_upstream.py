@@ -0,0 +1,137 @@
+# Shared upstream client (services.upstream) against the Open-Meteo stand-in's error and latency profiles
+# Run: python -m pytest -q
+
+import time
+
+import pytest
+
+from services.upstream import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyHistogram,
+    RetryBudget,
+    Upstream,
+    UpstreamError,
+    UpstreamHTTPError,
+)
+from tests.standins import start_open_meteo
+
+
+@pytest.fixture
+def meteo():
+    server, base = start_open_meteo()
+    yield server, f"{base}/forecast?latitude=28.6&longitude=77.2"
+    server.shutdown()
+    server.server_close()
+
+
+def test_healthy_calls_reuse_one_connection(meteo):
+    server, url = meteo
+    client = Upstream("test-healthy", timeout=2)
+    for _ in range(3):
+        assert "current" in client.get_json(url)
+    stats = client.stats()
+    assert (stats["ok"], stats["connections_opened"], stats["connections_reused"]) == (3, 1, 2)
+    assert stats["latency_seconds"]["count"] == 3
+
+
+def test_breaker_opens_then_half_opens(meteo):
+    server, url = meteo
+    server.error_rate = 1.0
+    client = Upstream("test-breaker", timeout=2, retries=0,
+                      breaker=CircuitBreaker(failure_threshold=3, reset_after=0.2))
+    for _ in range(3):
+        with pytest.raises(UpstreamHTTPError):
+            client.get(url)
+    hits = server.hits
+    with pytest.raises(CircuitOpenError):
+        client.get(url)
+    assert server.hits == hits                       # short-circuited without a request
+    assert client.stats()["breaker"] == {"state": "open", "consecutive_failures": 3, "trips": 1}
+
+    # After reset_after one probe goes through; a failure re-opens the circuit at once
+    time.sleep(0.25)
+    with pytest.raises(UpstreamHTTPError):
+        client.get(url)
+    assert client.breaker.state == "open" and client.breaker.trips == 2
+    with pytest.raises(CircuitOpenError):
+        client.get(url)
+
+    # A successful probe closes it
+    time.sleep(0.25)
+    server.error_rate = 0.0
+    assert "current" in client.get_json(url)
+    assert client.breaker.state == "closed"
+    assert client.stats()["short_circuited"] == 2
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.0)
+    breaker.record_failure()
+    assert breaker.allow() is True
+    assert breaker.state == "half_open"
+    assert breaker.allow() is False                  # the probe is still in flight
+    breaker.record_success()
+    assert breaker.allow() is True
+
+
+def test_retry_budget_exhaustion(meteo):
+    server, url = meteo
+    server.error_rate = 1.0
+    client = Upstream("test-budget", timeout=2, retries=5,
+                      breaker=CircuitBreaker(failure_threshold=100),
+                      retry_budget=RetryBudget(ratio=0.0, min_per_sec=0.0, cap=1.0))
+    with pytest.raises(UpstreamHTTPError):
+        client.get(url)
+    stats = client.stats()
+    assert server.hits == 2                          # the first try and the one retry the budget allowed
+    assert (stats["retries"], stats["retry_budget_exhausted"]) == (1, 1)
+    with pytest.raises(UpstreamHTTPError):
+        client.get(url)
+    assert server.hits == 3                          # budget empty: no retry at all
+    assert client.stats()["retry_budget_exhausted"] == 2
+
+
+def test_retries_recover_a_flaky_upstream(meteo):
+    server, url = meteo
+    server.error_rate = 0.5
+    client = Upstream("test-flaky", timeout=2, retries=10,
+                      breaker=CircuitBreaker(failure_threshold=100),
+                      retry_budget=RetryBudget(ratio=1.0, cap=100.0))
+    for _ in range(5):
+        assert "current" in client.get_json(url)
+    assert client.stats()["retries"] == server.hits - 5
+
+
+def test_slow_upstream_times_out(meteo):
+    server, url = meteo
+    server.latency = 0.5
+    client = Upstream("test-slow", timeout=0.1, retries=0)
+    with pytest.raises(UpstreamError):
+        client.get(url)
+    stats = client.stats()
+    assert stats["failures"] == 1
+    assert stats["latency_seconds"]["count"] == 1
+
+
+def test_dropped_pooled_connection_is_retried_on_a_fresh_one(meteo):
+    server, url = meteo
+    server.drop_keepalive = True
+    client = Upstream("test-stale", timeout=2, retries=0)
+    assert "current" in client.get_json(url)
+    assert list(client.stats()["idle_connections"].values()) == [1]   # pooled, though the server closed it
+    time.sleep(0.05)                                 # let the server close its end
+    assert "current" in client.get_json(url)
+    stats = client.stats()
+    assert (stats["ok"], stats["failures"], stats["retries"]) == (2, 0, 0)
+    assert stats["connections_opened"] == 2
+
+
+def test_latency_quantiles():
+    hist = LatencyHistogram(buckets=(0.1, 0.2, 0.4))
+    assert hist.quantile(0.5) is None
+    for seconds in (0.05, 0.15, 0.15, 0.3):
+        hist.observe(seconds)
+    assert hist.quantile(0.5) == pytest.approx(0.15)
+    snap = hist.snapshot()
+    assert snap["count"] == 4 and snap["buckets"]["+Inf"] == 4
@@ -0,0 +1,63 @@
+# Weather prefetch (services.weather_prefetch) across workers sharing a cache tier, against the
+# Open-Meteo stand-in
+# Run: python -m pytest -q
+
+import pytest
+
+from services import weather, weather_prefetch
+from services.cache_backends import SharedCache, SharedDirBackend
+from services.weather_prefetch import PrefetchScheduler
+from tests.standins import start_open_meteo
+
+CELLS = [(28.6, 77.2), (30.9, 75.85), (19.1, 72.9)]
+
+
+@pytest.fixture
+def meteo(monkeypatch):
+    server, base = start_open_meteo()
+    monkeypatch.setattr(weather, "OPEN_METEO_BASE", base)
+    weather._forecast_cache.clear()
+    yield server
+    weather._forecast_cache.clear()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def shared_tier(monkeypatch, tmp_path):
+    backend = SharedDirBackend(str(tmp_path / "shm"), 16 * 1024 * 1024)
+    monkeypatch.setattr(weather._forecast_cache, "shared", SharedCache(backend, "weather"))
+    monkeypatch.setattr(weather_prefetch, "_leases", SharedCache(backend, "weather-prefetch"))
+
+
+def _scheduler():
+    return PrefetchScheduler(CELLS, batch_size=2, rate_per_minute=10 ** 9)
+
+
+def test_per_process_tier_every_worker_leads(meteo):
+    first, second = _scheduler(), _scheduler()
+    assert first.leads() and second.leads()
+    assert first.run_once()["refreshed"] == len(CELLS)
+    assert meteo.locations == len(CELLS)
+
+
+def test_one_worker_leads_and_the_others_take_its_forecasts(meteo, shared_tier):
+    leader, follower = _scheduler(), _scheduler()
+    out = leader.run_once()
+    assert (out["leader"], out["refreshed"]) == (True, len(CELLS))
+    assert meteo.locations == len(CELLS)
+
+    weather._forecast_cache.clear()     # the follower's own, still empty, per-process cache
+    out = follower.run_once()
+    assert (out["leader"], out["due"], out["refreshed"], out["adopted"]) == (False, len(CELLS), 0, len(CELLS))
+    assert meteo.locations == len(CELLS)  # nothing fetched twice
+    assert all(weather.forecast_age(cell) is not None for cell in CELLS)
+    assert follower.stats()["follower_passes"] == 1
+
+
+def test_follower_refreshes_cells_only_it_tracks(meteo, shared_tier):
+    leader = _scheduler()
+    assert leader.leads()
+    follower = PrefetchScheduler([(12.97, 77.59)], rate_per_minute=10 ** 9)
+    out = follower.run_once()
+    assert (out["leader"], out["refreshed"]) == (False, 1)
@@ -1,13 +1,73 @@
 # Server-side translation helpers for API responses and templates
 
+import hashlib
 import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
 from pathlib import Path
 
 from config import LANGUAGE_CODES, DEFAULT_LANGUAGE, LOCALES_DIR, TRANSLATION_MODULES
+from services.cache_backends import shared_cache
+from services.metrics import timed
 
-# In-memory cache: lang -> { module -> dict }
+_log = logging.getLogger(__name__)
+
+# In-memory cache: lang -> { module -> dict } (raw locale JSON, input to the compiled index)
 _translation_cache = {}
 
+# Compiled index: (lang, module, dotted key) -> str or _Template, with the
+# DEFAULT_LANGUAGE fallback already applied per key. One dict lookup per t() call.
+# Rebuilds never mutate the live dict: a new one is built and the global rebound,
+# so readers see either the old or the new index, never a half-built one.
+_index = {}
+_compiled_langs = set()
+_compile_lock = threading.Lock()
+
+# Per-language bookkeeping: file mtimes (for change detection), load timing and size
+_lang_mtimes = {}
+_lang_stats = {}
+# Callbacks run with the language code after it is (re)compiled, e.g. to drop derived caches
+_reload_listeners = []
+
+_PLACEHOLDER_RE = re.compile(r'\{(\w+)\}')
+
+# Compiled languages are also kept in the shared cache tier (when other workers can read it), keyed
+# by a hash of their source files, so a worker starting up unpickles instead of parsing and compiling
+_shared_compiled = shared_cache('translations')
+_SHARED_TTL = 7 * 86400
+# Part of the shared key: bump when _compile_language's output changes shape
+_COMPILED_FORMAT = 1
+
+
+class _Template:
+    """Translation string with {name} placeholders, split once into literal/name pieces."""
+    __slots__ = ('text', 'parts')
+
+    def __init__(self, text):
+        self.text = text
+        pieces = _PLACEHOLDER_RE.split(text)
+        # pieces alternate literal, name, literal, name, ..., literal
+        self.parts = tuple(
+            (sys.intern(pieces[i]), pieces[i + 1] if i + 1 < len(pieces) else None)
+            for i in range(0, len(pieces), 2)
+        )
+
+    def render(self, values):
+        if not values:
+            return self.text
+        out = []
+        for literal, name in self.parts:
+            out.append(literal)
+            if name is not None:
+                v = values.get(name)
+                out.append('{' + name + '}' if v is None and name not in values else str(v))
+        return ''.join(out)
+
+
 # Pest/disease names: English -> { lang -> local name }
 PEST_TRANSLATIONS = {
     'Pink Bollworm': {
@@ -36,41 +96,192 @@ TREATMENT_TRANSLATIONS = {
 }
 
 
-def _load_module(lang: str, module: str) -> dict:
-    if lang not in _translation_cache:
-        _translation_cache[lang] = {}
-    if module in _translation_cache[lang]:
-        return _translation_cache[lang][module]
+def _read_module(lang: str, module: str) -> dict:
     path = LOCALES_DIR / lang / f'{module}.json'
-    out = {}
     if path.is_file():
         try:
             with open(path, 'r', encoding='utf-8') as f:
-                out = json.load(f)
+                return json.load(f)
         except (json.JSONDecodeError, OSError):
             pass
-    _translation_cache[lang][module] = out
+    return {}
+
+
+def _load_module(lang: str, module: str) -> dict:
+    modules = _translation_cache.get(lang)
+    if modules is None:
+        modules = _translation_cache[lang] = {}
+    if module in modules:
+        return modules[module]
+    out = modules[module] = _read_module(lang, module)
+    return out
+
+
+def get_locale_data(lang: str, module: str) -> dict:
+    """Raw locale JSON for one module (as in LOCALES_DIR, no fallback applied)."""
+    return _load_module(lang, module)
+
+
+def _module_mtimes(lang: str) -> dict:
+    out = {}
+    for module in TRANSLATION_MODULES:
+        try:
+            out[module] = os.stat(LOCALES_DIR / lang / f'{module}.json').st_mtime_ns
+        except OSError:
+            out[module] = None
     return out
 
 
+def _flatten(data: dict, prefix: str, out: dict) -> None:
+    for k, v in data.items():
+        path = prefix + k
+        if isinstance(v, dict):
+            _flatten(v, path + '.', out)
+        elif isinstance(v, str):
+            out[path] = v
+
+
+def _compile_language(lang: str) -> dict:
+    """All (lang, module, key) entries of one language, falling back per key to DEFAULT_LANGUAGE."""
+    entries = {}
+    for module in TRANSLATION_MODULES:
+        flat = {}
+        if lang != DEFAULT_LANGUAGE:
+            _flatten(_load_module(DEFAULT_LANGUAGE, module), '', flat)
+        _flatten(_load_module(lang, module), '', flat)
+        for key, text in flat.items():
+            value = _Template(text) if _PLACEHOLDER_RE.search(text) else sys.intern(text)
+            entries[(lang, sys.intern(module), sys.intern(key))] = value
+    return entries
+
+
+def _source_digest(lang: str) -> str:
+    """Hash of the locale files a language compiles from (its own and DEFAULT_LANGUAGE's)."""
+    h = hashlib.sha1(str(_COMPILED_FORMAT).encode())
+    for code in dict.fromkeys((lang, DEFAULT_LANGUAGE)):
+        for module in TRANSLATION_MODULES:
+            try:
+                h.update((LOCALES_DIR / code / f'{module}.json').read_bytes())
+            except OSError:
+                pass
+            h.update(b'\0')
+    return f'{lang}:{h.hexdigest()[:20]}'
+
+
+def _entries_size(entries: dict) -> int:
+    size = sys.getsizeof(entries)
+    for k, v in entries.items():
+        size += sys.getsizeof(k) + sys.getsizeof(k[2])
+        size += sys.getsizeof(v.text if v.__class__ is _Template else v)
+    return size
+
+
+def _install(langs, reload=False) -> None:
+    """(Re)compile langs and swap them into the index. Caller holds _compile_lock."""
+    global _index
+    compiled = {}
+    mtimes = {lang: _module_mtimes(lang) for lang in langs}
+    if reload:
+        # Fresh raw modules first (fallback compilation reads DEFAULT_LANGUAGE's), swapped in whole
+        for lang in langs:
+            _translation_cache[lang] = {m: _read_module(lang, m) for m in TRANSLATION_MODULES}
+    keys = {lang: _source_digest(lang) for lang in langs} if _shared_compiled.shared else {}
+    held = _shared_compiled.get_many(keys.values()) if keys else {}
+    to_share = []
+    for lang in langs:
+        started = time.perf_counter()
+        entries = held.get(keys.get(lang))
+        if entries is None:
+            entries = _compile_language(lang)
+            if keys:
+                to_share.append((keys[lang], entries))
+        compiled[lang] = entries
+        prev = _lang_stats.get(lang, {})
+        _lang_mtimes[lang] = mtimes[lang]
+        _lang_stats[lang] = {
+            'entries': len(entries),
+            'bytes': _entries_size(entries),
+            'load_ms': round((time.perf_counter() - started) * 1000, 3),
+            'loaded_at': time.time(),
+            'reloads': prev.get('reloads', -1) + 1,
+            'source': 'shared' if keys.get(lang) in held else 'compiled',
+        }
+    if to_share:
+        _shared_compiled.set_many(to_share, _SHARED_TTL)
+    new_index = {k: v for k, v in _index.items() if k[0] not in compiled}
+    for entries in compiled.values():
+        new_index.update(entries)
+    _index = new_index
+    _compiled_langs.update(compiled)
+    for lang in compiled:
+        for callback in _reload_listeners:
+            callback(lang)
+
+
+def build_translation_index(langs=None) -> None:
+    """Compile the lookup index for the given languages (default: all 15, i.e. boot warm-up)."""
+    with _compile_lock:
+        # DEFAULT_LANGUAGE is always compiled too, so its files are watched for fallback changes
+        pending = [lang for lang in {DEFAULT_LANGUAGE, *(langs or LANGUAGE_CODES)} if lang not in _compiled_langs]
+        if pending:
+            _install(pending)
+
+
+def reload_changed_locales() -> list:
+    """Recompile languages whose locale files changed since they were loaded. Returns their codes.
+
+    A change to DEFAULT_LANGUAGE recompiles every loaded language, since they all fall back to it.
+    """
+    with _compile_lock:
+        changed = [lang for lang in _compiled_langs if _module_mtimes(lang) != _lang_mtimes.get(lang)]
+        if DEFAULT_LANGUAGE in changed:
+            changed = list(_compiled_langs)
+        if changed:
+            _install(changed, reload=True)
+    return changed
+
+
+def start_locale_watcher(interval: float) -> threading.Thread:
+    """Poll LOCALES_DIR every `interval` seconds and hot-swap languages whose files changed."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                reload_changed_locales()
+            except Exception:
+                # A half-saved or malformed locale file must not stop the watcher; retry next poll
+                _log.exception('locale reload failed')
+
+    thread = threading.Thread(target=loop, name='locale-watcher', daemon=True)
+    thread.start()
+    return thread
+
+
+def on_locale_reload(callback) -> None:
+    """Register callback(lang), called after a language is compiled or recompiled."""
+    _reload_listeners.append(callback)
+
+
+def translation_stats() -> dict:
+    """Per-language entry count, approximate memory (bytes), load time and reload count."""
+    return {lang: dict(st) for lang, st in _lang_stats.items()}
+
+
+@timed('translation')
 def get_translation(lang: str, module: str, key: str, **interpolations) -> str:
     """Get translation for key (dot-separated) with optional {name} interpolation."""
-    if lang not in LANGUAGE_CODES:
-        lang = DEFAULT_LANGUAGE
-    data = _load_module(lang, module)
-    if not data:
-        data = _load_module(DEFAULT_LANGUAGE, module)
-    keys = key.split('.')
-    value = data
-    for k in keys:
-        value = (value or {}).get(k)
+    value = _index.get((lang, module, key))
+    if value is None:
+        if lang not in _compiled_langs:
+            if lang not in LANGUAGE_CODES:
+                lang = DEFAULT_LANGUAGE
+            build_translation_index([lang])
+            value = _index.get((lang, module, key))
         if value is None:
             return key
-    if not isinstance(value, str):
-        return key
-    for k, v in interpolations.items():
-        value = value.replace('{' + k + '}', str(v))
-    return value
+    if value.__class__ is str:
+        return value
+    return value.render(interpolations)
 
 
 def get_chatbot_template(lang: str, template_key: str, **kwargs) -> str: